@@ -1,9 +1,12 @@
 from django.contrib import admin, messages
-from django.core.mail import send_mail
-from django.conf import settings
 from django import forms
-from django.shortcuts import render
 from django.db import transaction
+from django.db.models import Value
+from django.shortcuts import render
+from apps.users.auth_cache import invalidate_user
+from apps.users.models import User
+from utils.postgres import ArrayAppend
+from .jobs import notify_status
 from .models import Agency
 
 
@@ -34,53 +37,34 @@ class AgencyAdmin(admin.ModelAdmin):
     actions = ['approve_agencies', 'reject_agencies']
 
 
-    def _approve_agency(self, agency):
-        agency.status = "approved"
-        agency.reason_rejected = None
-        agency.verified = True
-        agency.save(update_fields=["status", "reason_rejected", "verified"])
-
-        # --- Update user role ---
-        user = agency.user
-        roles = user.roles or []
-
-        if getattr(user, "PROVIDER", None) is None:
-            print("⚠ WARNING: user.PROVIDER does not exist")
-        else:
-            if user.PROVIDER not in roles:
-                user.roles = roles + [user.PROVIDER]
-                user.save(update_fields=["roles"])
-
-        # Send email
-        recipient = agency.email_agency or (agency.user.email if agency.user else None)
-        if recipient:
-            def send_mail_async():
-                send_mail(
-                    subject="Agency Registration Approved",
-                    message=f"Dear {agency.agency_name}, your registration has been approved.",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[recipient],
-                    fail_silently=False,
-                )
-            transaction.on_commit(send_mail_async)
-
-    def _reject_agency(self, agency, reason):
-        agency.status = "rejected"
-        agency.reason_rejected = reason
-        agency.verified = False
-        agency.save(update_fields=["status", "reason_rejected", "verified"])
-
-        recipient = agency.email_agency or (agency.user.email if agency.user else None)
-        if recipient:
-            def send_mail_async():
-                send_mail(
-                    subject="Agency Registration Rejected",
-                    message=f"Dear {agency.agency_name}, your registration was rejected.\nReason: {reason}",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[recipient],
-                    fail_silently=False,
-                )
-            transaction.on_commit(send_mail_async)
+    def _approve(self, agency_ids):
+        """Duyệt các agency: 1 UPDATE agency + 1 UPDATE roles user, mail gửi theo lô trong job nền."""
+        rows = list(Agency.objects.filter(pk__in=agency_ids).values_list("pk", "user_id"))
+        agency_ids = [agency_id for agency_id, _ in rows]
+        user_ids = [user_id for _, user_id in rows]
+        with transaction.atomic():
+            count = Agency.objects.filter(pk__in=agency_ids).update(
+                status="approved", reason_rejected=None, verified=True
+            )
+            # --- Update user role ---
+            User.objects.filter(pk__in=user_ids).exclude(
+                roles__contains=[User.PROVIDER]
+            ).update(roles=ArrayAppend("roles", Value(User.PROVIDER), output_field=User._meta.get_field("roles")))
+            # update() không qua signal -> tự bỏ claim roles cũ trong token của các user này
+            transaction.on_commit(lambda: [invalidate_user(user_id) for user_id in user_ids])
+
+            # Send email (apps/agencies/jobs.py)
+            notify_status(agency_ids, "approved")
+        return count
+
+    def _reject(self, agency_ids, reason):
+        agency_ids = list(agency_ids)
+        with transaction.atomic():
+            count = Agency.objects.filter(pk__in=agency_ids).update(
+                status="rejected", reason_rejected=reason, verified=False
+            )
+            notify_status(agency_ids, "rejected", reason)
+        return count
 
 
     def save_model(self, request, obj, form, change):
@@ -94,17 +78,17 @@ class AgencyAdmin(admin.ModelAdmin):
             return
 
         if obj.status == "approved":
-            self._approve_agency(obj)
+            self._approve([obj.pk])
+            obj.reason_rejected, obj.verified = None, True
 
         elif obj.status == "rejected":
-            self._reject_agency(obj, obj.reason_rejected or "")
+            self._reject([obj.pk], obj.reason_rejected or "")
+            obj.verified = False
 
 
     def approve_agencies(self, request, queryset):
-        for agency in queryset:
-            self._approve_agency(agency)
-
-        self.message_user(request, f"{queryset.count()} agencies approved.")
+        count = self._approve(queryset.values_list("pk", flat=True))
+        self.message_user(request, f"{count} agencies approved.")
     approve_agencies.short_description = "Approve selected agencies"
 
 
@@ -113,10 +97,8 @@ class AgencyAdmin(admin.ModelAdmin):
             form = RejectForm(request.POST)
             if form.is_valid():
                 reason = form.cleaned_data["reason"]
-                for agency in queryset:
-                    self._reject_agency(agency, reason)
-
-                self.message_user(request, f"{queryset.count()} agencies rejected.")
+                count = self._reject(queryset.values_list("pk", flat=True), reason)
+                self.message_user(request, f"{count} agencies rejected.")
                 return None
         else:
             form = RejectForm(initial={'_selected_action': queryset.values_list('agency_id', flat=True)})
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from apps.jobs.queue import enqueue, job, retry_delay
+from utils.images import build_variants
+from utils.mail import PartialSendError, batch_timeout, chunked, send_batch
+from .models import Agency
+
+STATUS_EMAILS = {
+    "approved": (
+        "Agency Registration Approved",
+        "Dear {name}, your registration has been approved.",
+    ),
+    "rejected": (
+        "Agency Registration Rejected",
+        "Dear {name}, your registration was rejected.\nReason: {reason}",
+    ),
+}
+
+
+def notify_status(agency_ids, status, reason=""):
+    """Xếp job gửi mail duyệt / từ chối, mỗi job 1 lô EMAIL_BATCH_SIZE agency."""
+    for ids in chunked((str(pk) for pk in agency_ids), settings.EMAIL_BATCH_SIZE):
+        enqueue("agencies.send_status_emails", agency_ids=ids, status=status, reason=reason)
+
+
+# khoá job đủ lâu cho cả lô (mặc định JOB_LOCK_TIMEOUT có thể ngắn hơn) -> không bị lấy lại, gửi trùng
+@job("agencies.send_status_emails", timeout=batch_timeout())
+def send_status_emails(agency_ids, status, reason=""):
+    subject, body = STATUS_EMAILS[status]
+    ids, messages = [], []
+    agencies = Agency.objects.filter(pk__in=agency_ids).select_related("user").only(
+        "agency_name", "email_agency", "user__email"
+    )
+    for agency in agencies:
+        recipient = agency.email_agency or agency.user.email
+        if recipient:
+            ids.append(str(agency.pk))
+            messages.append(EmailMessage(
+                subject=subject,
+                body=body.format(name=agency.agency_name, reason=reason),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient],
+            ))
+    try:
+        send_batch(messages)
+    except PartialSendError as e:
+        if not e.sent:
+            raise e.error   # chưa gửi được mail nào -> để queue thử lại cả job
+        # retry cả job sẽ gửi lại các mail đầu lô -> xếp job mới chỉ cho phần chưa gửi
+        enqueue(
+            "agencies.send_status_emails", delay=retry_delay(1),
+            agency_ids=ids[e.sent:], status=status, reason=reason,
+        )
+
+
+@job("agencies.build_avatar_variants")
+def build_avatar_variants(agency_id):
+    build_variants(Agency, agency_id, "avatar", target="avatar_variants")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:24
+
+import django.contrib.postgres.indexes
+import utils.postgres
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0006_remove_agency_uniq_agency_legal_id_not_null_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        # hàm immutable_unaccent + pg_trgm được tạo ở đây
+        ('tours', '0010_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agency',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(utils.postgres.ImmutableUnaccent('agency_name'), name='gin_trgm_ops'), name='agency_name_trgm'),
+        ),
+    ]
@@ -3,19 +3,28 @@ from django.conf import settings
 import uuid, os
 from django.core.exceptions import ValidationError
 from django.db.models import Q
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from utils.postgres import ImmutableUnaccent
+from utils.presigned import UploadSpec
+
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp"]
+AVATAR_MAX_SIZE = 2 * 1024 * 1024
+LICENSE_MAX_SIZE = 10 * 1024 * 1024
+LICENSE_EXTENSIONS = [".pdf", ".jpg", ".jpeg", ".png"]
+LEGAL_ID_MAX_SIZE = 5 * 1024 * 1024
 
 
 def validate_avatar(file):
-    if file.size > 2 * 1024 * 1024:
+    if file.size > AVATAR_MAX_SIZE:
         raise ValidationError("Avatar tối đa 2MB.")
-    if os.path.splitext(file.name)[1].lower() not in [".jpg", ".jpeg", ".png", ".webp"]:
+    if os.path.splitext(file.name)[1].lower() not in IMAGE_EXTENSIONS:
         raise ValidationError("Avatar phải là ảnh (jpg, png, webp).")
 
 
 def validate_license(file):
-    if file.size > 10 * 1024 * 1024:
+    if file.size > LICENSE_MAX_SIZE:
         raise ValidationError("License tối đa 10MB.")
-    if os.path.splitext(file.name)[1].lower() not in [".pdf", ".jpg", ".jpeg", ".png"]:
+    if os.path.splitext(file.name)[1].lower() not in LICENSE_EXTENSIONS:
         raise ValidationError("License chỉ nhận pdf/jpg/png.")
 
 
@@ -30,9 +39,9 @@ def agency_avatar_upload_to(instance, filename):
 
 
 def validate_legal_id(file):
-    if file.size > 5 * 1024 * 1024:
+    if file.size > LEGAL_ID_MAX_SIZE:
         raise ValidationError("CCCD/CMND tối đa 5MB.")
-    if os.path.splitext(file.name)[1].lower() not in [".jpg", ".jpeg", ".png", ".webp"]:
+    if os.path.splitext(file.name)[1].lower() not in IMAGE_EXTENSIONS:
         raise ValidationError("CCCD/CMND phải là ảnh (jpg, png, webp).")
 
 
@@ -41,6 +50,15 @@ def agency_legal_id_upload_to(instance, filename):
     return f"agencies/{instance.agency_id}/legal_id/{base}_{uuid.uuid4().hex}{ext}"
 
 
+# file hồ sơ agency upload thẳng lên S3 (presigned POST), cùng giới hạn với validator ở trên
+AGENCY_UPLOADS = {
+    "avatar": UploadSpec("avatar", AVATAR_MAX_SIZE, IMAGE_EXTENSIONS, [validate_avatar]),
+    "license_file": UploadSpec("license_file", LICENSE_MAX_SIZE, LICENSE_EXTENSIONS, [validate_license]),
+    "legal_id_front": UploadSpec("legal_id_front", LEGAL_ID_MAX_SIZE, IMAGE_EXTENSIONS, [validate_legal_id]),
+    "legal_id_back": UploadSpec("legal_id_back", LEGAL_ID_MAX_SIZE, IMAGE_EXTENSIONS, [validate_legal_id]),
+}
+
+
 class Agency(models.Model):
     agency_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(
@@ -68,6 +86,7 @@ class Agency(models.Model):
         null=True,
         validators=[validate_avatar],
     )
+    avatar_variants = models.JSONField(default=dict, blank=True)   # {variant: key} WebP thu nhỏ
 
     AGENCY_TYPE_CHOICES = [
         ("business", "Business"),
@@ -113,9 +132,16 @@ class Agency(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # field của agency hiện trong chi tiết tour public (tours/serializers.py)
+    TOUR_DETAIL_FIELDS = ("agency_name", "email_agency", "hotline")
+
     class Meta:
         db_table = "agencies_agency"
         ordering = ["-created_at"]
+        indexes = [
+            # trigram (không dấu) cho filter ?agency= ở danh sách tour
+            GinIndex(OpClass(ImmutableUnaccent("agency_name"), name="gin_trgm_ops"), name="agency_name_trgm"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["tax_code"],
@@ -138,5 +164,13 @@ class Agency(models.Model):
             ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # giá trị đang lưu trong DB -> signal tours biết thông tin hiện ở chi tiết tour có đổi không
+        if all(name in field_names for name in cls.TOUR_DETAIL_FIELDS):
+            instance._db_tour_detail = {name: getattr(instance, name) for name in cls.TOUR_DETAIL_FIELDS}
+        return instance
+
     def __str__(self):
         return f"{self.agency_name} (Owner: {self.user.username})"
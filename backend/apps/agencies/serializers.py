@@ -5,12 +5,52 @@ import logging
 from rest_framework import serializers
 from django.core.files.base import ContentFile
 
-from .models import Agency
+from apps.jobs.queue import enqueue
+from apps.users.profiles import request_profiles
+from utils.images import variant_urls
+from utils.media import media_url
+from utils.presigned import StagedUploadField, attach_upload
+from utils.uploads import delete_files
+from .models import AGENCY_UPLOADS, Agency
 
 logger = logging.getLogger(__name__)
 
+STAGED_KEY_FIELDS = ["avatar_key", "license_file_key", "legal_id_front_key", "legal_id_back_key"]
 
-class AgencyApplySerializer(serializers.ModelSerializer):
+
+class StagedDocumentsMixin:
+    """
+    File hồ sơ gửi qua server (multipart) hoặc key của file đã upload thẳng lên S3
+    (presigned POST, xem AgencyUploadPresignView): avatar_key, license_file_key ...
+    """
+
+    def _staged_errors(self, attrs):
+        return {
+            f"{name}_key": [f"Chỉ gửi {name} hoặc {name}_key."]
+            for name in AGENCY_UPLOADS
+            if attrs.get(name) and attrs.get(f"{name}_key")
+        }
+
+    def _pop_staged(self, validated_data):
+        return {name: validated_data.pop(f"{name}_key", None) for name in AGENCY_UPLOADS}
+
+    def _attach_staged(self, agency, staged):
+        # copy từ vùng tạm sang key theo upload_to của field
+        for name, upload in staged.items():
+            if upload:
+                attach_upload(getattr(agency, name), upload)
+
+    def _save_with_staged(self, agency, staged):
+        uploads = [upload for upload in staged.values() if upload]
+        try:
+            agency.save()
+        except BaseException:
+            delete_files([getattr(agency, name).name for name, upload in staged.items() if upload])
+            raise
+        delete_files([upload.key for upload in uploads])
+
+
+class AgencyApplySerializer(StagedDocumentsMixin, serializers.ModelSerializer):
     avatar = serializers.ImageField(
         required=False,
         write_only=True,
@@ -21,7 +61,7 @@ class AgencyApplySerializer(serializers.ModelSerializer):
     )
 
     license_file = serializers.FileField(
-        required=True,
+        required=False,
         write_only=True,
         error_messages={
             "required": "Vui lòng tải lên giấy phép kinh doanh.",
@@ -31,7 +71,7 @@ class AgencyApplySerializer(serializers.ModelSerializer):
     )
 
     legal_id_front = serializers.ImageField(
-        required=True,
+        required=False,
         write_only=True,
         error_messages={
             "required": "Vui lòng tải lên ảnh CCCD/CMND mặt trước.",
@@ -41,7 +81,7 @@ class AgencyApplySerializer(serializers.ModelSerializer):
     )
 
     legal_id_back = serializers.ImageField(
-        required=True,
+        required=False,
         write_only=True,
         error_messages={
             "required": "Vui lòng tải lên ảnh CCCD/CMND mặt sau.",
@@ -49,8 +89,13 @@ class AgencyApplySerializer(serializers.ModelSerializer):
             "empty": "Ảnh CCCD/CMND mặt sau không hợp lệ.",
         },
     )
+    avatar_key = StagedUploadField(AGENCY_UPLOADS["avatar"], required=False, write_only=True)
+    license_file_key = StagedUploadField(AGENCY_UPLOADS["license_file"], required=False, write_only=True)
+    legal_id_front_key = StagedUploadField(AGENCY_UPLOADS["legal_id_front"], required=False, write_only=True)
+    legal_id_back_key = StagedUploadField(AGENCY_UPLOADS["legal_id_back"], required=False, write_only=True)
 
     avatar_url = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = serializers.SerializerMethodField(read_only=True)
     license_url = serializers.SerializerMethodField(read_only=True)
 
     agency_name = serializers.CharField(
@@ -153,7 +198,9 @@ class AgencyApplySerializer(serializers.ModelSerializer):
             "license_file",
             "legal_id_front",
             "legal_id_back",
+            *STAGED_KEY_FIELDS,
             "avatar_url",
+            "avatar_variants",
             "license_url",
             "verified",
             "status",
@@ -162,10 +209,13 @@ class AgencyApplySerializer(serializers.ModelSerializer):
         read_only_fields = ["agency_id", "verified", "status", "created_at"]
 
     def get_avatar_url(self, obj):
-        return obj.avatar.url if obj.avatar else None
+        return media_url(obj.avatar)
+
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar_variants)
 
     def get_license_url(self, obj):
-        return obj.license_file.url if obj.license_file else None
+        return media_url(obj.license_file)
 
     def _save_file_unique(self, fieldfile, fileobj):
         name, ext = os.path.splitext(getattr(fileobj, "name", "upload"))
@@ -180,9 +230,7 @@ class AgencyApplySerializer(serializers.ModelSerializer):
         fieldfile.save(safe_name, ContentFile(data), save=False)
 
     def validate(self, attrs):
-        user = self.context["request"].user
-
-        if Agency.objects.filter(user=user).exists():
+        if request_profiles(self.context["request"]).agency_id is not None:
             raise serializers.ValidationError(
                 {"non_field_errors": ["Bạn đã đăng ký đại lý rồi. Không thể đăng ký lại."]}
             )
@@ -194,7 +242,12 @@ class AgencyApplySerializer(serializers.ModelSerializer):
         license_number = attrs.get("license_number")
         legal_id_number = attrs.get("legal_id_number")
 
-        errors = {}
+        errors = self._staged_errors(attrs)
+
+        # giấy tờ bắt buộc: file hoặc key đã upload thẳng lên S3
+        for name in ("license_file", "legal_id_front", "legal_id_back"):
+            if not attrs.get(name) and not attrs.get(f"{name}_key"):
+                errors[name] = [self.fields[name].error_messages["required"]]
 
         if agency_type == "business" and not tax_code:
             errors["tax_code"] = ["Mã số thuế là bắt buộc đối với doanh nghiệp."]
@@ -226,6 +279,7 @@ class AgencyApplySerializer(serializers.ModelSerializer):
         license_file = validated_data.pop("license_file", None)
         legal_id_front = validated_data.pop("legal_id_front", None)
         legal_id_back = validated_data.pop("legal_id_back", None)
+        staged = self._pop_staged(validated_data)
 
         agency = Agency(
             user=user,
@@ -236,6 +290,7 @@ class AgencyApplySerializer(serializers.ModelSerializer):
 
         if avatar_file:
             self._save_file_unique(agency.avatar, avatar_file)
+            agency.avatar_variants = {}
 
         if license_file:
             self._save_file_unique(agency.license_file, license_file)
@@ -246,10 +301,16 @@ class AgencyApplySerializer(serializers.ModelSerializer):
         if legal_id_back:
             self._save_file_unique(agency.legal_id_back, legal_id_back)
 
-        agency.save()
+        self._attach_staged(agency, staged)
+        if staged["avatar"]:
+            agency.avatar_variants = {}
+
+        self._save_with_staged(agency, staged)
+        if avatar_file or staged["avatar"]:
+            enqueue("agencies.build_avatar_variants", key=f"variants:avatar:{agency.pk}", agency_id=agency.pk)
         return agency
     
-class AgencyUpdateSerializer(serializers.ModelSerializer):
+class AgencyUpdateSerializer(StagedDocumentsMixin, serializers.ModelSerializer):
     email_agency = serializers.EmailField(required=False, allow_null=True, allow_blank=True, validators=[])
     hotline = serializers.CharField(required=False, allow_null=True, allow_blank=True, validators=[])
     license_number = serializers.CharField(required=False, allow_null=True, allow_blank=True, validators=[])
@@ -260,6 +321,10 @@ class AgencyUpdateSerializer(serializers.ModelSerializer):
     license_file = serializers.FileField(required=False, write_only=True)
     legal_id_front = serializers.ImageField(required=False, write_only=True)
     legal_id_back = serializers.ImageField(required=False, write_only=True)
+    avatar_key = StagedUploadField(AGENCY_UPLOADS["avatar"], required=False, write_only=True)
+    license_file_key = StagedUploadField(AGENCY_UPLOADS["license_file"], required=False, write_only=True)
+    legal_id_front_key = StagedUploadField(AGENCY_UPLOADS["legal_id_front"], required=False, write_only=True)
+    legal_id_back_key = StagedUploadField(AGENCY_UPLOADS["legal_id_back"], required=False, write_only=True)
 
     class Meta:
         model = Agency
@@ -282,6 +347,7 @@ class AgencyUpdateSerializer(serializers.ModelSerializer):
             "license_file",
             "legal_id_front",
             "legal_id_back",
+            *STAGED_KEY_FIELDS,
             "verified",
             "status",
             "reason_rejected",
@@ -308,7 +374,7 @@ class AgencyUpdateSerializer(serializers.ModelSerializer):
         agency_type = attrs.get("agency_type", agency.agency_type)
         tax_code = attrs.get("tax_code", agency.tax_code)
 
-        errors = {}
+        errors = self._staged_errors(attrs)
 
         if agency_type == "business" and not tax_code:
             errors["tax_code"] = ["Mã số thuế là bắt buộc đối với doanh nghiệp."]
@@ -348,6 +414,7 @@ class AgencyUpdateSerializer(serializers.ModelSerializer):
         license_file = validated_data.pop("license_file", None)
         legal_id_front = validated_data.pop("legal_id_front", None)
         legal_id_back = validated_data.pop("legal_id_back", None)
+        staged = self._pop_staged(validated_data)
 
         # update text fields
         for k, v in validated_data.items():
@@ -356,24 +423,31 @@ class AgencyUpdateSerializer(serializers.ModelSerializer):
         # update files nếu có gửi lên
         if avatar_file:
             self._save_file_unique(instance.avatar, avatar_file)
+            instance.avatar_variants = {}
         if license_file:
             self._save_file_unique(instance.license_file, license_file)
         if legal_id_front:
             self._save_file_unique(instance.legal_id_front, legal_id_front)
         if legal_id_back:
             self._save_file_unique(instance.legal_id_back, legal_id_back)
+        self._attach_staged(instance, staged)
+        if staged["avatar"]:
+            instance.avatar_variants = {}
 
         # nếu đang rejected mà user sửa/nộp lại => đưa về pending, clear reason
         if instance.status == "rejected":
             instance.status = "pending"
             instance.reason_rejected = None
 
-        instance.save()
+        self._save_with_staged(instance, staged)
+        if avatar_file or staged["avatar"]:
+            enqueue("agencies.build_avatar_variants", key=f"variants:avatar:{instance.pk}", agency_id=instance.pk)
         return instance
 
 
 class AgencySerializer(serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField(read_only=True)
+    avatar_variants = serializers.SerializerMethodField(read_only=True)
     license_url = serializers.SerializerMethodField(read_only=True)
     legal_id_front_url = serializers.SerializerMethodField(read_only=True)
     legal_id_back_url = serializers.SerializerMethodField(read_only=True)
@@ -396,6 +470,7 @@ class AgencySerializer(serializers.ModelSerializer):
             "bank_account_number",
             "bank_account_holder",
             "avatar_url",
+            "avatar_variants",
             "license_url",
             "legal_id_front_url",
             "legal_id_back_url",
@@ -415,13 +490,16 @@ class AgencySerializer(serializers.ModelSerializer):
         ]
 
     def get_avatar_url(self, obj):
-        return obj.avatar.url if obj.avatar else None
+        return media_url(obj.avatar)
+
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar_variants)
 
     def get_license_url(self, obj):
-        return obj.license_file.url if obj.license_file else None
+        return media_url(obj.license_file)
 
     def get_legal_id_front_url(self, obj):
-        return obj.legal_id_front.url if obj.legal_id_front else None
+        return media_url(obj.legal_id_front)
 
     def get_legal_id_back_url(self, obj):
-        return obj.legal_id_back.url if obj.legal_id_back else None
+        return media_url(obj.legal_id_back)
@@ -1,3 +1,140 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.tours.tests import (
+    S3_TEST_STORAGES, auth_client, direct_upload, make_agency, make_user, mock_aws, png, start_s3_mock,
+)
+from apps.jobs.models import Job
+from apps.jobs.queue import run_pending
+from apps.users.models import User
+from .models import Agency
+
+
+class AgencyQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+
+    def test_profile(self):
+        # user (JWT) + agency
+        with self.assertNumQueries(2):
+            res = auth_client(self.agency.user).get(reverse("agency_me"))
+        self.assertEqual(res.data["data"]["agency_id"], str(self.agency.agency_id))
+
+
+@skipUnless(mock_aws, "cần moto")
+@override_settings(STORAGES=S3_TEST_STORAGES)
+class AgencyDirectUploadTests(TestCase):
+    def setUp(self):
+        start_s3_mock(self)
+        self.user = make_user("applicant")
+        self.client = auth_client(self.user)
+
+    def upload(self, field, name, body):
+        res = self.client.post(
+            reverse("agency_upload_presign"),
+            {"files": [{"field": field, "name": name, "size": len(body)}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 200, res.data)
+        return direct_upload(self, res.data["data"]["uploads"][0], body)
+
+    def apply(self, **documents):
+        data = {
+            "agency_name": "Du Lịch S3", "agency_type": "individual", "license_number": "LIC-S3",
+            "legal_representative_name": "Trần Văn B", "legal_id_number": "ID-S3",
+            "bank_name": "VCB", "bank_account_number": "999", "bank_account_holder": "TRAN VAN B",
+            **documents,
+        }
+        return self.client.post(reverse("agency_register"), data, format="json")
+
+    def test_apply_with_uploaded_keys(self):
+        image = png("id.png").read()
+        res = self.apply(
+            license_file_key=self.upload("license_file", "license.pdf", b"%PDF-1.7\n..."),
+            legal_id_front_key=self.upload("legal_id_front", "front.png", image),
+            legal_id_back_key=self.upload("legal_id_back", "back.png", image),
+        )
+        self.assertEqual(res.status_code, 201, res.data)
+
+        agency = Agency.objects.get(user=self.user)
+        self.assertTrue(agency.license_file.name.startswith(f"agencies/{agency.agency_id}/license/"))
+        self.assertTrue(default_storage.exists(agency.legal_id_back.name))
+
+    def test_apply_requires_documents_and_checks_content(self):
+        res = self.apply(license_file_key=self.upload("license_file", "license.pdf", b"MZ not a pdf"))
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("license_file_key", res.data["errors"])
+
+        res = self.apply()
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(set(res.data["errors"]), {"license_file", "legal_id_front", "legal_id_back"})
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_BATCH_SIZE=2, EMAIL_RATE_LIMIT=0)
+class AgencyAdminActionTests(TestCase):
+    def setUp(self):
+        self.agencies = [make_agency(f"pending{i}", status="pending", verified=False) for i in range(3)]
+        self.admin = site._registry[Agency]
+        self.request = RequestFactory().post("/")
+        self.admin.message_user = lambda *args, **kwargs: None
+
+    def test_approve_is_bulk_and_emails_in_batches(self):
+        # SELECT id + 2 UPDATE + 2 INSERT job (lô 2 + 1) + SAVEPOINT / RELEASE, không gửi mail trong request
+        with self.assertNumQueries(7):
+            self.admin.approve_agencies(self.request, Agency.objects.all())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(set(Agency.objects.values_list("status", "verified")), {("approved", True)})
+        for user in User.objects.filter(agency_profile__in=self.agencies):
+            self.assertEqual(user.roles, [User.CUSTOMER, User.PROVIDER])
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox), [f"pending{i}@example.com" for i in range(3)]
+        )
+        self.assertEqual(mail.outbox[0].subject, "Agency Registration Approved")
+
+        # duyệt lại không thêm role trùng
+        self.admin.approve_agencies(self.request, Agency.objects.all())
+        self.assertEqual(User.objects.get(username="pending0").roles, [User.CUSTOMER, User.PROVIDER])
+
+    def test_partial_send_failure_does_not_resend(self):
+        self.admin.approve_agencies(self.request, Agency.objects.all())
+        original = mail.get_connection().__class__.send_messages
+        calls = []
+
+        def flaky_send(backend, messages):
+            calls.append(messages[0].to[0])
+            if len(calls) == 2:
+                raise ConnectionError("SMTP rớt mạng")
+            return original(backend, messages)
+
+        with mock.patch.object(mail.get_connection().__class__, "send_messages", flaky_send):
+            run_pending()
+            Job.objects.filter(state=Job.QUEUED).update(run_at=timezone.now())
+            run_pending()
+
+        # mỗi agency nhận đúng 1 mail, mail lỗi được gửi lại ở job sau
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox), [f"pending{i}@example.com" for i in range(3)]
+        )
+        self.assertEqual(len(calls), 4)
+        self.assertFalse(Job.objects.exclude(state=Job.DONE).exists())
+
+    def test_reject_with_reason(self):
+        request = RequestFactory().post("/", {"apply": "1", "reason": "Thiếu giấy phép", "_selected_action": [
+            str(a.pk) for a in self.agencies
+        ]})
+        self.assertIsNone(self.admin.reject_agencies(request, Agency.objects.all()))
+        self.assertEqual(set(Agency.objects.values_list("status", "reason_rejected")), {("rejected", "Thiếu giấy phép")})
+
+        run_pending()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn("Reason: Thiếu giấy phép", mail.outbox[0].body)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import AgencyApplyView, MyAgencyView
+from .views import AgencyApplyView, AgencyUploadPresignView, MyAgencyView
 
 urlpatterns = [
     path('register/', AgencyApplyView.as_view(), name='agency_register'),
-    path('profile/', MyAgencyView.as_view(), name='agency_me')
+    path('profile/', MyAgencyView.as_view(), name='agency_me'),
+    path('uploads/presign/', AgencyUploadPresignView.as_view(), name='agency_upload_presign'),
 ]
@@ -3,10 +3,12 @@ import logging
 from django.db import IntegrityError
 from rest_framework import generics, permissions, status
 from rest_framework.exceptions import NotFound, ValidationError
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
 
-from .models import Agency
+from apps.users.profiles import request_profiles
+from utils.presigned import PresignUploadView
+from .models import AGENCY_UPLOADS
 from .serializers import AgencyApplySerializer, AgencySerializer,AgencyUpdateSerializer
   
 logger = logging.getLogger(__name__)
@@ -15,7 +17,8 @@ logger = logging.getLogger(__name__)
 class AgencyApplyView(generics.CreateAPIView):
     serializer_class = AgencyApplySerializer
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = (MultiPartParser, FormParser)
+    # JSON: file đã upload thẳng lên S3, gửi <field>_key
+    parser_classes = (MultiPartParser, FormParser, JSONParser)
 
     def create(self, request, *args, **kwargs):
         try:
@@ -79,13 +82,14 @@ class AgencyApplyView(generics.CreateAPIView):
 
 class MyAgencyView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = (MultiPartParser, FormParser)
+    # JSON: file đã upload thẳng lên S3, gửi <field>_key
+    parser_classes = (MultiPartParser, FormParser, JSONParser)
 
     def get_object(self):
-        try:
-            return Agency.objects.get(user=self.request.user)
-        except Agency.DoesNotExist:
+        agency = request_profiles(self.request).agency
+        if agency is None:
             raise NotFound(detail="Bạn chưa đăng ký Agency.")
+        return agency
 
     def get_serializer_class(self):
         # GET -> serializer đọc
@@ -141,3 +145,8 @@ class MyAgencyView(generics.RetrieveUpdateAPIView):
             },
             status=status.HTTP_200_OK,
         )
+
+
+# API Xin presigned POST để upload avatar / giấy phép / CCCD thẳng lên S3
+class AgencyUploadPresignView(PresignUploadView):
+    upload_specs = AGENCY_UPLOADS
@@ -1,9 +1,10 @@
-from decimal import Decimal
 from rest_framework import serializers
 from django.utils import timezone
 from .models import Booking
 from ..tours.models import Tour
-from ..customers.models import Customer
+from ..users.profiles import request_profiles
+from utils.fastpath import FastRowSerializer
+from utils.media import media_url
 
 class BookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,7 +38,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
             })
         
         # Ko được đặt tour của chính mình
-        if tour.agency and tour.agency.user_id == request.user.user_id:
+        if tour.agency_id and tour.agency_id == request_profiles(request).agency_id:
             raise serializers.ValidationError({
                 "tour": "Bạn không thể đặt tour của chính mình."
             })
@@ -61,8 +62,8 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         request = self.context["request"]
 
-        customer = Customer.objects.filter(user= request.user).first()
-        if not customer:
+        customer_id = request_profiles(request).customer_id
+        if not customer_id:
             raise serializers.ValidationError({
                 "detail": "Tài khoản này chưa có hồ sơ Customer."
             })
@@ -71,18 +72,11 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         adults =int(validated_data['num_adults'])
         children = int(validated_data.get("num_children", 0))
 
-        total = (
-            Decimal(tour.adult_price or 0) * Decimal(adults)
-            + Decimal(tour.children_price or 0) * Decimal(children)
-        )
-
-        # áp dụng discount nếu có
-        discount = Decimal(tour.discount or 0)
-        if discount > 0:
-            total = total * (Decimal("100") - discount) / Decimal("100")
+        # giá sau giảm lấy từ cột generated của tour (cùng giá hiển thị / filter)
+        total = tour.final_adult_price * adults + tour.final_children_price * children
         
         return Booking.objects.create(
-            customer=customer,
+            customer_id=customer_id,
             status=Booking.PENDING,
             total_price=total,
             **validated_data
@@ -161,7 +155,7 @@ class CustomerBookingDetailSerializer(serializers.ModelSerializer):
             return None
 
         try:
-            url = thumb_obj.thumbnail.url
+            url = media_url(thumb_obj.thumbnail)
         except Exception:
             return None
 
@@ -191,7 +185,12 @@ class AgencyBookingListSerializer(serializers.ModelSerializer):
             "total_price",
         ]
         read_only_fields = fields
-       
+
+
+class AgencyBookingListFastSerializer(FastRowSerializer):
+    """AgencyBookingListSerializer bản đọc .values() cho AgencyBookingListView."""
+    serializer_class = AgencyBookingListSerializer
+
 
 # Chi tiêt 1 booking bên đại lý
 class AgencyBookingDetailSerializer(serializers.ModelSerializer):
@@ -273,7 +272,7 @@ class AgencyBookingDetailSerializer(serializers.ModelSerializer):
             return ""
 
         try:
-            url = image.url
+            url = media_url(image)
         except Exception:
             return ""
 
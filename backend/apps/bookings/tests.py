@@ -1,3 +1,107 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.customers.models import Customer
+from apps.tours.tests import auth_client, fast_and_slow, make_agency, make_tour, make_tour_with_media, make_user
+from apps.users.authentication import add_profile_claims, profile_claims
+from .models import Booking
+
+
+def make_booking(customer, tour, **kwargs):
+    defaults = {
+        "travel_date": timezone.localdate() + timedelta(days=7),
+        "num_adults": 2,
+        "num_children": 0,
+        "total_price": tour.adult_price * 2,
+    }
+    defaults.update(kwargs)
+    return Booking.objects.create(customer=customer, tour=tour, **defaults)
+
+
+class BookingQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+        cls.customer_user = make_user("khach", full_name="Trần Thị B")
+        cls.customer = Customer.objects.get(user=cls.customer_user)
+        cls.bookings = [
+            make_booking(cls.customer, make_tour_with_media(cls.agency, name=f"Tour {i}"))
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.customer_client = auth_client(self.customer_user)
+        self.agency_client = auth_client(self.agency.user)
+
+    def test_my_list(self):
+        # user (JWT) + customer + exists + booking JOIN tour
+        with self.assertNumQueries(4):
+            res = self.customer_client.get(reverse("booking_list_customer"))
+        self.assertEqual(len(res.data["data"]), 3)
+
+    def test_my_detail(self):
+        url = reverse("booking_detail_customer", args=[self.bookings[0].booking_id])
+        # user (JWT) + customer + booking JOIN tour/thumbnail/customer/user
+        with self.assertNumQueries(3):
+            res = self.customer_client.get(url)
+        self.assertEqual(res.data["data"]["customer_name"], "Trần Thị B")
+
+    def test_agency_list(self):
+        # user (JWT) + agency + booking JOIN tour/customer/user
+        with self.assertNumQueries(3):
+            res = self.agency_client.get(reverse("booking_list_agency"))
+        self.assertEqual(len(res.data["data"]), 3)
+
+    def test_agency_list_fast_path_identical(self):
+        url = reverse("booking_list_agency")
+        self.assertEqual(*fast_and_slow(self.agency_client, url))
+        self.assertEqual(*fast_and_slow(self.agency_client, url, {"status": "pending"}))
+
+    def test_agency_detail(self):
+        url = reverse("booking_detail_agency", args=[self.bookings[0].booking_id])
+        # user (JWT) + agency + booking JOIN tour/thumbnail/customer/user
+        with self.assertNumQueries(3):
+            res = self.agency_client.get(url)
+        self.assertTrue(res.data["data"]["thumbnail_url"].endswith("thumb.png"))
+
+    def test_profiles_from_token_claims(self):
+        def claims_client(user):
+            client = APIClient()
+            token = add_profile_claims(RefreshToken.for_user(user), profile_claims(user.pk)).access_token
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            return client
+
+        customer_client, agency_client = claims_client(self.customer_user), claims_client(self.agency.user)
+        # customer_id / agency_id lấy từ token: không query user, customer, agency
+        with self.assertNumQueries(2):
+            res = customer_client.get(reverse("booking_list_customer"))
+        self.assertEqual(len(res.data["data"]), 3)
+
+        with self.assertNumQueries(1):
+            res = agency_client.get(reverse("booking_list_agency"))
+        self.assertEqual(len(res.data["data"]), 3)
+
+        url = reverse("booking_update_status", args=[self.bookings[0].booking_id])
+        with self.assertNumQueries(2):   # booking JOIN tour/agency + UPDATE
+            res = agency_client.patch(url, {"status": Booking.PAID_WAITING}, format="json")
+        self.assertEqual(res.status_code, 200, res.data)
+
 
-# Create your tests here.
+class BookingTotalTests(TestCase):
+    def test_total_uses_final_prices(self):
+        tour = make_tour(make_agency(), adult_price=1000000, children_price=333333, discount=10)
+        user = make_user("khach")
+        res = auth_client(user).post(reverse("booking_create"), {
+            "tour": str(tour.tour_id),
+            "travel_date": str(timezone.localdate() + timedelta(days=3)),
+            "num_adults": 2,
+            "num_children": 1,
+        }, format="json")
+        self.assertEqual(res.status_code, 201, res.data)
+        # 2 * 900000.00 + 1 * 299999.70
+        self.assertEqual(res.data["data"]["total_price"], "2099999.70")
@@ -7,9 +7,9 @@ from rest_framework.response import Response
 
 from .models import Booking
 
-from .serializers import BookingCreateSerializer, AgencyBookingListSerializer,  AgencyBookingDetailSerializer, BookingStatusUpdateSerializer,CustomerBookingListSerializer,CustomerBookingDetailSerializer
-from ..agencies.models import Agency
-from ..customers.models import Customer
+from .serializers import BookingCreateSerializer, AgencyBookingListSerializer, AgencyBookingListFastSerializer,  AgencyBookingDetailSerializer, BookingStatusUpdateSerializer,CustomerBookingListSerializer,CustomerBookingDetailSerializer
+from ..users.profiles import request_profiles
+from utils.fastpath import FastListViewMixin
 
 # API Tạo booking tour
 class CreateBookingView(generics.CreateAPIView):
@@ -43,14 +43,13 @@ class MyBookingListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        customer = Customer.objects.filter(user=user).first()
-        if not customer:
+        customer_id = request_profiles(self.request).customer_id
+        if not customer_id:
             raise PermissionDenied("Chỉ Customer mới xem được danh sách đặt tour của mình.")
 
         return (
             Booking.objects
-            .filter(customer=customer)
+            .filter(customer_id=customer_id)
             .select_related("tour")
             .order_by("-booking_date")
         )
@@ -78,15 +77,14 @@ class MyBookingDetailView(generics.RetrieveAPIView):
     lookup_field = "booking_id"
 
     def get_queryset(self):
-        user = self.request.user
-        customer = Customer.objects.filter(user=user).first()
-        if not customer:
+        customer_id = request_profiles(self.request).customer_id
+        if not customer_id:
             raise PermissionDenied("Chỉ tài khoản Customer mới xem được chi tiết booking.")
 
         return (
             Booking.objects
-            .filter(customer=customer)
-            .select_related("tour")
+            .filter(customer_id=customer_id)
+            .select_related("tour__thumbnail", "customer__user")
         )
 
     def retrieve(self, request, *args, **kwargs):
@@ -106,19 +104,19 @@ class MyBookingDetailView(generics.RetrieveAPIView):
 
 
 # API Agency xem danh sách các booking 
-class AgencyBookingListView(generics.ListAPIView):
+class AgencyBookingListView(FastListViewMixin, generics.ListAPIView):
     serializer_class = AgencyBookingListSerializer
+    fast_serializer_class = AgencyBookingListFastSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        agency = Agency.objects.filter(user=user).first()
-        if not agency:
+        agency_id = request_profiles(self.request).agency_id
+        if not agency_id:
             raise PermissionDenied("Chỉ tài khoản Agency mới xem được danh sách đơn của mình.")
         
         qs=(
             Booking.objects
-            .filter(tour__agency=agency)
+            .filter(tour__agency_id=agency_id)
             .select_related("tour", "customer__user")
             .order_by("-booking_date")
         )
@@ -131,9 +129,13 @@ class AgencyBookingListView(generics.ListAPIView):
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        if self.use_fast_path():
+            fast = self.get_fast_serializer()
+            data = fast.serialize(fast.values(queryset))
+        else:
+            data = self.get_serializer(queryset, many=True).data
 
-        if not serializer.data:
+        if not data:
             return Response(
                 {"data": [], "message": "Chưa có booking nào."},
                 status=status.HTTP_200_OK
@@ -141,7 +143,7 @@ class AgencyBookingListView(generics.ListAPIView):
         
 
         return Response(
-            {"data": serializer.data, "message": "Lấy danh sách đơn đặt tour thành công."},
+            {"data": data, "message": "Lấy danh sách đơn đặt tour thành công."},
             status=status.HTTP_200_OK
         )
     
@@ -152,15 +154,14 @@ class AgencyBookingDetailView(generics.RetrieveAPIView):
     lookup_field = "booking_id"
 
     def get_queryset(self):
-        user = self.request.user
-        agency = Agency.objects.filter(user=user).first()
-        if not agency:
+        agency_id = request_profiles(self.request).agency_id
+        if not agency_id:
             raise PermissionDenied("Chỉ tài khoản Agency mới xem được chi tiết booking.")
 
         return (
             Booking.objects
-            .filter(tour__agency=agency)
-            .select_related("tour", "customer__user")
+            .filter(tour__agency_id=agency_id)
+            .select_related("tour__thumbnail", "customer__user")
         )
 
     def retrieve(self, request, *args, **kwargs):
@@ -187,8 +188,8 @@ class AgencyUpdateBookingStatusView(generics.UpdateAPIView):
     def patch(self, request, *args, **kwargs):
         booking = self.get_object()
 
-        agency = Agency.objects.filter(user=request.user).first()
-        if not agency or booking.tour.agency_id != agency.agency_id:
+        agency_id = request_profiles(request).agency_id
+        if not agency_id or booking.tour.agency_id != agency_id:
             raise PermissionDenied("Bạn không có quyền cập nhật đơn này.")
 
         serializer = self.get_serializer(booking, data=request.data, partial=True)
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from .models import Message
 from ..customers.models import Customer
 from ..agencies.models import Agency
+from ..users.profiles import request_profiles
 
 User = get_user_model()
 
@@ -30,8 +31,9 @@ class MessageSendSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"receiver_id": "Không thể gửi tin nhắn cho chính mình."})
 
         # Chỉ cho phép chat giữa Customer và Agency
-        is_sender_customer = Customer.objects.filter(user=sender).exists()
-        is_sender_agency = Agency.objects.filter(user=sender).exists()
+        sender_profiles = request_profiles(self.context["request"])
+        is_sender_customer = sender_profiles.customer_id is not None
+        is_sender_agency = sender_profiles.agency_id is not None
         is_receiver_customer = Customer.objects.filter(user=receiver).exists()
         is_receiver_agency = Agency.objects.filter(user=receiver).exists()
 
@@ -81,8 +83,8 @@ class ConversationListSerializer(serializers.Serializer):
     last_message_time = serializers.DateTimeField()
 
 class MessageSerializer(serializers.ModelSerializer):
-    sender_id = serializers.UUIDField(source="sender.user_id", read_only=True)
-    receiver_id = serializers.UUIDField(source="receiver.user_id", read_only=True)
+    sender_id = serializers.UUIDField(read_only=True)
+    receiver_id = serializers.UUIDField(read_only=True)
 
     class Meta:
         model = Message
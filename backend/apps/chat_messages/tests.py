@@ -1,3 +1,45 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.tours.tests import auth_client, make_user
+from .models import Message
+
+
+class MessageQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("khach")
+        cls.partners = [make_user(f"agency{i}", full_name=f"Agency {i}") for i in range(3)]
+        for partner in cls.partners:
+            Message.objects.create(sender=cls.user, receiver=partner, content="Xin chào")
+            Message.objects.create(sender=partner, receiver=cls.user, content="Chào bạn")
+
+    def setUp(self):
+        self.client = auth_client(self.user)
+
+    def test_conversation_list(self):
+        # user (JWT) + tin nhắn cuối theo partner
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("conversation_list"))
+        self.assertEqual(len(res.data["data"]), 3)
+        self.assertEqual(
+            {row["last_message"] for row in res.data["data"]}, {"Chào bạn"}
+        )
+
+    def test_conversation_detail(self):
+        url = reverse("conversation_detail", args=[self.partners[0].user_id])
+        # user (JWT) + receiver + messages
+        with self.assertNumQueries(3):
+            res = self.client.get(url)
+        self.assertEqual(len(res.data["data"]), 2)
+
+    def test_conversation_by_receiver(self):
+        # user (JWT) + receiver exists + exists + messages JOIN sender/receiver
+        with self.assertNumQueries(4):
+            res = self.client.get(reverse("conversation"), {"receiver_id": self.partners[0].user_id})
+        self.assertEqual(len(res.data["data"]), 2)
+
+    def test_recent_threads(self):
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("recent_threads"))
+        self.assertEqual(len(res.data["data"]), 3)
@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .serializers import MessageSendSerializer, ConversationListSerializer, MessageListSerializer, RecentThreadSerializer, MessageSerializer
-from django.db.models import Q, Max
+from django.db.models import Case, F, Q, When
 from .models import Message
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -151,47 +151,30 @@ class ConversationListView(generics.ListAPIView):
     def list(self, request, *args, **kwargs):
         user = request.user
 
-        # Lấy list sender/receiver + thời gian tin nhắn cuối
-        partners = (
+        # Tin nhắn cuối với từng partner: DISTINCT ON (partner) trong 1 query
+        last_msgs = (
             Message.objects
             .filter(Q(sender=user) | Q(receiver=user))
-            .values("sender_id", "receiver_id")
-            .annotate(last_time=Max("created_at"))
-            .order_by("-last_time")
+            .annotate(
+                partner_id=Case(
+                    When(sender=user, then=F("receiver_id")),
+                    default=F("sender_id"),
+                )
+            )
+            .select_related("sender", "receiver")
+            .order_by("partner_id", "-created_at")
+            .distinct("partner_id")
         )
 
         conversations = []
-        added = set()
-
-        for p in partners:
+        for msg in sorted(last_msgs, key=lambda m: m.created_at, reverse=True):
             # Xác định ai là receiver (partner)
-            partner_id = (
-                p["receiver_id"] if p["sender_id"] == user.user_id else p["sender_id"]
-            )
-
-            if partner_id in added:
-                continue
-            added.add(partner_id)
-
-            partner = User.objects.filter(user_id=partner_id).first()
-            if not partner:
-                continue
-
-            # Lấy tin nhắn cuối cùng giữa user & partner
-            last_msg = (
-                Message.objects.filter(
-                    (Q(sender=user) & Q(receiver=partner)) |
-                    (Q(sender=partner) & Q(receiver=user))
-                )
-                .order_by("-created_at")
-                .first()
-            )
-
+            partner = msg.receiver if msg.sender_id == user.user_id else msg.sender
             conversations.append({
                 "receiver_id": partner.user_id,
                 "receiver_name": partner.full_name,
-                "last_message": last_msg.content if last_msg else "",
-                "last_message_time": last_msg.created_at if last_msg else None,
+                "last_message": msg.content,
+                "last_message_time": msg.created_at,
             })
 
         serializer = self.get_serializer(conversations, many=True)
@@ -208,17 +191,12 @@ class ConversationDetailView(generics.ListAPIView):
         user = self.request.user
         receiver_id = self.kwargs.get("receiver_id")
 
-        # Validate receiver có tồn tại không
-        receiver = User.objects.filter(user_id=receiver_id).first()
-        if not receiver:
-            return Message.objects.none()
-
-        # lấy tất cả tin nhắn giữa user & receiver
+        # lấy tất cả tin nhắn giữa user & receiver (receiver đã kiểm tra trong list())
         return (
             Message.objects
             .filter(
-                Q(sender=user, receiver=receiver) |
-                Q(sender=receiver, receiver=user)
+                Q(sender=user, receiver_id=receiver_id) |
+                Q(sender_id=receiver_id, receiver=user)
             )
             .order_by("created_at")
         )
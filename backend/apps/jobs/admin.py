@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'name', 'state', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('state', 'name')
+    search_fields = ('name', 'key')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
+    actions = ['requeue_jobs']
+
+    def requeue_jobs(self, request, queryset):
+        count = 0
+        for job in queryset.exclude(state=Job.RUNNING):
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(
+                        state=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, last_error=""
+                    )
+                count += 1
+            except IntegrityError:
+                # đã có job cùng key đang chờ
+                pass
+        self.message_user(request, f"{count} jobs requeued.")
+    requeue_jobs.short_description = "Requeue selected jobs"
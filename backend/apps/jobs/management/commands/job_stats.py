@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.jobs.queue import job_stats
+
+
+class Command(BaseCommand):
+    help = "Độ sâu hàng đợi job và độ trễ (chờ / chạy) trong 1 giờ gần nhất."
+
+    def handle(self, *args, **options):
+        stats = job_stats()
+        if not stats:
+            self.stdout.write("Không có job.")
+            return
+
+        self.stdout.write(
+            f"{'job':32} {'queued':>7} {'ready':>6} {'running':>8} {'dead':>5} "
+            f"{'oldest(s)':>10} {'done/1h':>8} {'wait(ms)':>9} {'run(ms)':>8}"
+        )
+        for name, s in sorted(stats.items()):
+            self.stdout.write(
+                f"{name:32} {s['queued']:>7} {s['ready']:>6} {s['running']:>8} {s['dead']:>5} "
+                f"{_fmt(s['oldest_ready_seconds']):>10} {s['done']:>8} "
+                f"{_fmt(s['avg_wait_ms']):>9} {_fmt(s['avg_run_ms']):>8}"
+            )
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.1f}"
@@ -0,0 +1,33 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from apps.jobs.queue import run_pending, work
+
+
+class Command(BaseCommand):
+    help = "Worker chạy job nền (bảng jobs_job). Chạy nhiều process / --concurrency để tăng thông lượng."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Số thread xử lý job.")
+        parser.add_argument("--poll-interval", type=float, default=None, help="Giây nghỉ khi hết job.")
+        parser.add_argument("--once", action="store_true", help="Chạy hết job đã tới hạn rồi thoát.")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Đã chạy {count} job."))
+            return
+
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            # chạy nốt job đang dở rồi thoát
+            self.stdout.write("Đang dừng worker ...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+        self.stdout.write(f"Worker job: {options['concurrency']} thread.")
+        work(options["concurrency"], options["poll_interval"], stop)
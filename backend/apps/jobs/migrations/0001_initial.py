@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:09
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('job_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('payload', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('key', models.CharField(blank=True, max_length=200, null=True)),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('dead', 'Dead')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'jobs_job',
+                'ordering': ['run_at'],
+                'indexes': [models.Index(condition=models.Q(('state', 'queued')), fields=['run_at'], name='jobs_job_ready_idx'), models.Index(condition=models.Q(('state', 'running')), fields=['locked_until'], name='jobs_job_running_idx'), models.Index(fields=['state', 'name'], name='jobs_job_state_184aee_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('state', 'queued')), fields=('key',), name='uniq_job_key_queued')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Việc nền (gửi mail, gọi cổng thanh toán, tính lại rating ...) chạy bởi lệnh run_jobs."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    DEAD = "dead"   # hết số lần thử, chờ xử lý tay (admin: chạy lại)
+    STATE_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (DEAD, "Dead"),
+    ]
+
+    job_id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)                  # tên handler đã đăng ký (@job)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)   # kwargs của handler
+    # job cùng key đang chờ -> không tạo thêm (vd: tính lại rating của 1 tour)
+    key = models.CharField(max_length=200, blank=True, null=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)      # chưa tới giờ thì worker bỏ qua (retry backoff)
+    locked_until = models.DateTimeField(blank=True, null=True)   # worker chết -> hết hạn thì job được lấy lại
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'jobs_job'
+        ordering = ['run_at']
+        indexes = [
+            # worker: job đang chờ theo run_at / job running hết hạn khoá
+            models.Index(fields=['run_at'], condition=Q(state="queued"), name='jobs_job_ready_idx'),
+            models.Index(fields=['locked_until'], condition=Q(state="running"), name='jobs_job_running_idx'),
+            models.Index(fields=['state', 'name']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(state="queued"), name='uniq_job_key_queued'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.job_id} ({self.state})"
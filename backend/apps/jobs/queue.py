@@ -0,0 +1,274 @@
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+class JobTimeout(Exception):
+    """Job RUNNING quá locked_until: worker chết / bị kill / treo giữa chừng."""
+
+
+class JobHandler:
+    def __init__(self, name, func, max_attempts, on_dead, timeout):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+        self.on_dead = on_dead
+        self.timeout = timeout
+
+
+def job(name, max_attempts=None, on_dead=None, timeout=None):
+    """
+    Đăng ký handler cho job `name` (đặt trong apps/<app>/jobs.py để được autodiscover).
+    Handler nhận payload dạng kwargs và tự quản transaction. Raise -> thử lại với backoff;
+    hết max_attempts -> DEAD, gọi on_dead(**payload) (vd: đánh dấu payment thất bại).
+    timeout: số giây giữ khoá khi chạy (mặc định JOB_LOCK_TIMEOUT), phải lớn hơn thời gian chạy
+    lâu nhất của handler: quá hạn thì worker khác lấy lại job.
+    """
+    def decorator(func):
+        _handlers[name] = JobHandler(
+            name, func, max_attempts or settings.JOB_MAX_ATTEMPTS, on_dead, timeout or settings.JOB_LOCK_TIMEOUT
+        )
+        return func
+    return decorator
+
+
+def _lock_timeout(name):
+    handler = _handlers.get(name)
+    return handler.timeout if handler is not None else settings.JOB_LOCK_TIMEOUT
+
+
+def _claimed(job):
+    # worker còn giữ job: chưa bị lấy lại (lấy lại thì attempts tăng) / chưa bị chuyển trạng thái
+    return Job.objects.filter(pk=job.pk, state=Job.RUNNING, attempts=job.attempts)
+
+
+def enqueue(name, key=None, delay=None, **payload):
+    """
+    Thêm job trong transaction hiện tại: rollback thì job cũng mất, worker chỉ thấy sau khi commit.
+    key: đã có job cùng key đang chờ thì không thêm (job đó chưa chạy nên vẫn thấy dữ liệu mới).
+    """
+    handler = _handlers[name]
+    Job.objects.bulk_create(
+        [
+            Job(
+                name=name,
+                payload=payload,
+                key=key,
+                max_attempts=handler.max_attempts,
+                run_at=timezone.now() + (delay or timedelta()),
+            )
+        ],
+        ignore_conflicts=bool(key),
+    )
+
+
+def retry_delay(attempts):
+    # 10s, 20s, 40s ... tối đa JOB_RETRY_BACKOFF_MAX, ±20% để các job lỗi cùng lúc không dồn lại
+    base = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=base * random.uniform(0.8, 1.2))
+
+
+def claim(limit=1):
+    """
+    Lấy tối đa `limit` job tới hạn (cả job RUNNING quá locked_until do worker chết) bằng
+    SELECT ... FOR UPDATE SKIP LOCKED: nhiều worker chạy song song không lấy trùng job.
+    Job làm chết worker ở lần thử cuối (attempts >= max_attempts) không chạy lại mà chuyển DEAD.
+    Khoá (locked_until) theo timeout của từng handler.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(state=Job.QUEUED, run_at__lte=now) | Q(state=Job.RUNNING, locked_until__lt=now))
+            .order_by("run_at")[:limit]
+        )
+        exhausted = [j for j in jobs if j.state == Job.RUNNING and j.attempts >= j.max_attempts]
+        jobs = [j for j in jobs if j not in exhausted]
+        # 1 UPDATE cho mỗi timeout khác nhau (thường chỉ 1)
+        groups = {}
+        for j in exhausted + jobs:
+            j.locked_until = now + timedelta(seconds=_lock_timeout(j.name))
+            groups.setdefault((j in jobs, j.locked_until), []).append(j.pk)
+        for (run, locked_until), pks in groups.items():
+            if run:
+                Job.objects.filter(pk__in=pks).update(
+                    state=Job.RUNNING, attempts=F("attempts") + 1, started_at=now, locked_until=locked_until
+                )
+            else:
+                # giữ khoá tới lúc _fail ghi DEAD, worker khác không lấy lại
+                Job.objects.filter(pk__in=pks).update(locked_until=locked_until)
+
+    for j in exhausted:
+        _fail(j, _handlers.get(j.name), JobTimeout(
+            f"Quá {_lock_timeout(j.name)}s chưa xong ở lần thử {j.attempts}/{j.max_attempts} (worker chết / treo)."
+        ))
+    if exhausted and not jobs:
+        return claim(limit)   # chỉ toàn job hết lượt -> lấy tiếp job chạy được
+    for j in jobs:
+        j.state, j.attempts, j.started_at = Job.RUNNING, j.attempts + 1, now
+    return jobs
+
+
+def run_job(job):
+    """Chạy 1 job đã claim. Trả True nếu thành công."""
+    handler = _handlers.get(job.name)
+    start = time.monotonic()
+    try:
+        if handler is None:
+            raise LookupError(f"Chưa đăng ký handler cho job {job.name}.")
+        handler.func(**job.payload)
+    except Exception as exc:
+        _fail(job, handler, exc)
+        return False
+
+    if not _claimed(job).update(state=Job.DONE, finished_at=timezone.now(), locked_until=None, last_error=""):
+        logger.warning("job %s #%s xong nhưng đã bị worker khác lấy lại (quá timeout)", job.name, job.pk)
+        return True
+    logger.info(
+        "job %s #%s xong: chạy %.0f ms, chờ %.0f ms",
+        job.name, job.pk, (time.monotonic() - start) * 1000,
+        (job.started_at - job.run_at).total_seconds() * 1000,
+    )
+    return True
+
+
+def _fail(job, handler, exc):
+    error = "".join(traceback.format_exception(exc))[-4000:]
+    now = timezone.now()
+    if handler is None or job.attempts >= job.max_attempts:
+        if not _claimed(job).update(state=Job.DEAD, finished_at=now, locked_until=None, last_error=error):
+            logger.warning("job %s #%s lỗi nhưng đã bị worker khác lấy lại: %s", job.name, job.pk, exc)
+            return
+        logger.error("job %s #%s DEAD sau %s lần: %s", job.name, job.pk, job.attempts, exc)
+        if handler is not None and handler.on_dead is not None:
+            try:
+                handler.on_dead(**job.payload)
+            except Exception:
+                logger.exception("on_dead của job %s #%s lỗi", job.name, job.pk)
+        return
+
+    try:
+        with transaction.atomic():
+            updated = _claimed(job).update(
+                state=Job.QUEUED, run_at=now + retry_delay(job.attempts), locked_until=None, last_error=error
+            )
+    except IntegrityError:
+        # đã có job cùng key đang chờ -> job đó chạy thay lần thử lại này
+        updated = _claimed(job).update(state=Job.DONE, finished_at=now, locked_until=None, last_error=error)
+    if updated:
+        logger.warning("job %s #%s lỗi lần %s, thử lại sau: %s", job.name, job.pk, job.attempts, exc)
+    else:
+        logger.warning("job %s #%s lỗi nhưng đã bị worker khác lấy lại: %s", job.name, job.pk, exc)
+
+
+def run_pending(limit=None):
+    """Chạy các job đã tới hạn trong thread hiện tại tới khi hết (lệnh run_jobs --once, test). Trả số job đã chạy."""
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim()
+        if not jobs:
+            break
+        for j in jobs:
+            run_job(j)
+            count += 1
+    return count
+
+
+def purge_finished(days=None):
+    """Xoá job DONE cũ hơn JOB_RETENTION_DAYS ngày (DEAD giữ lại để xem / chạy lại)."""
+    days = settings.JOB_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(state=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def work(concurrency=1, poll_interval=None, stop=None):
+    """
+    Vòng lặp worker: `concurrency` thread, mỗi thread claim + chạy từng job, hết job thì ngủ
+    poll_interval giây. Dừng khi `stop` (threading.Event) được set.
+    """
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    stop = stop or threading.Event()
+
+    def loop():
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                jobs = claim()
+                if not jobs:
+                    stop.wait(poll_interval)
+                    continue
+                for j in jobs:
+                    run_job(j)
+        except Exception:
+            logger.exception("worker job lỗi, dừng thread")
+            stop.set()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=loop, name=f"jobs-{i}", daemon=True) for i in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    next_purge = 0
+    while not stop.is_set():
+        if time.monotonic() >= next_purge:
+            close_old_connections()
+            purge_finished()
+            next_purge = time.monotonic() + 3600
+        stop.wait(1)
+    for t in threads:
+        t.join()
+    connection.close()
+
+
+def job_stats(window=timedelta(hours=1)):
+    """
+    Độ sâu hàng đợi + độ trễ theo tên job:
+    queued / ready (đã tới hạn) / running / dead, tuổi job ready cũ nhất,
+    số job xong trong `window` với thời gian chờ (run_at -> started_at) và chạy trung bình.
+    """
+    now = timezone.now()
+    stats = {}
+
+    def row(name):
+        return stats.setdefault(name, {
+            "queued": 0, "ready": 0, "running": 0, "dead": 0, "oldest_ready_seconds": None,
+            "done": 0, "avg_wait_ms": None, "avg_run_ms": None,
+        })
+
+    for r in Job.objects.exclude(state=Job.DONE).values("name", "state").annotate(n=Count("pk")):
+        row(r["name"])[r["state"]] = r["n"]
+
+    ready = Job.objects.filter(state=Job.QUEUED, run_at__lte=now).values("name").annotate(
+        n=Count("pk"), oldest=Min("run_at")
+    )
+    for r in ready:
+        stat = row(r["name"])
+        stat["ready"] = r["n"]
+        stat["oldest_ready_seconds"] = round((now - r["oldest"]).total_seconds(), 1)
+
+    done = Job.objects.filter(state=Job.DONE, finished_at__gte=now - window).values("name").annotate(
+        n=Count("pk"),
+        wait=Avg(F("started_at") - F("run_at")),
+        run=Avg(F("finished_at") - F("started_at")),
+    )
+    for r in done:
+        stat = row(r["name"])
+        stat["done"] = r["n"]
+        stat["avg_wait_ms"] = round(r["wait"].total_seconds() * 1000, 1) if r["wait"] is not None else None
+        stat["avg_run_ms"] = round(r["run"].total_seconds() * 1000, 1) if r["run"] is not None else None
+    return stats
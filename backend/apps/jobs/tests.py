@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.tours.tests import auth_client, make_user
+from .models import Job
+from .queue import claim, enqueue, job, job_stats, run_job, run_pending
+
+calls = []
+dead = []
+
+
+@job("tests.echo")
+def echo(value):
+    calls.append(value)
+
+
+@job("tests.flaky", max_attempts=2, on_dead=lambda value: dead.append(value))
+def flaky(value):
+    raise RuntimeError(f"lỗi {value}")
+
+
+@job("tests.slow", timeout=3600)
+def slow(value):
+    calls.append(value)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        dead.clear()
+
+    def test_enqueue_and_run(self):
+        enqueue("tests.echo", value=1)
+        enqueue("tests.echo", value=2)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Job.objects.filter(state=Job.DONE).count(), 2)
+
+    def test_key_coalesces_queued_jobs(self):
+        for value in range(3):
+            enqueue("tests.echo", key="echo:a", value=value)
+        self.assertEqual(Job.objects.count(), 1)
+        run_pending()
+        # job trước đã chạy -> cùng key được thêm lại
+        enqueue("tests.echo", key="echo:a", value=9)
+        self.assertEqual(Job.objects.filter(state=Job.QUEUED).count(), 1)
+
+    def test_retry_with_backoff_then_dead(self):
+        enqueue("tests.flaky", value="x")
+        run_pending()
+        j = Job.objects.get()
+        self.assertEqual((j.state, j.attempts), (Job.QUEUED, 1))
+        self.assertGreater(j.run_at, timezone.now())
+        self.assertIn("lỗi x", j.last_error)
+        self.assertEqual(run_pending(), 0)   # chưa tới giờ thử lại
+
+        Job.objects.update(run_at=timezone.now())
+        run_pending()
+        j.refresh_from_db()
+        self.assertEqual((j.state, j.attempts), (Job.DEAD, 2))
+        self.assertEqual(dead, ["x"])
+
+    def test_expired_running_job_is_reclaimed(self):
+        enqueue("tests.echo", value=1)
+        first = claim()
+        self.assertEqual(len(first), 1)
+        self.assertEqual(claim(), [])   # đang chạy, còn hạn khoá
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        again = claim()
+        self.assertEqual([j.pk for j in again], [first[0].pk])
+        self.assertEqual(again[0].attempts, 2)
+        self.assertTrue(run_job(again[0]))
+
+    def test_expired_running_job_out_of_attempts_is_dead(self):
+        # worker chết (OOM, bị kill ...) ở lần thử cuối -> không lấy lại mãi, chuyển DEAD + on_dead
+        enqueue("tests.flaky", value="oom")
+        enqueue("tests.echo", value=1)
+        Job.objects.filter(name="tests.flaky").update(
+            state=Job.RUNNING, attempts=2, locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual([j.name for j in claim()], ["tests.echo"])
+        j = Job.objects.get(name="tests.flaky")
+        self.assertEqual((j.state, j.attempts), (Job.DEAD, 2))
+        self.assertIn("JobTimeout", j.last_error)
+        self.assertEqual(dead, ["oom"])
+        self.assertEqual(claim(), [])
+
+    def test_lock_timeout_per_handler(self):
+        enqueue("tests.slow", value=1)
+        enqueue("tests.echo", value=2)
+        now = timezone.now()
+        locks = {j.name: j.locked_until - now for j in claim(limit=2)}
+        self.assertGreater(locks["tests.slow"], timedelta(minutes=59))
+        self.assertLess(locks["tests.echo"], timedelta(minutes=10))
+        self.assertEqual(
+            {j.name: j.locked_until for j in Job.objects.all()},
+            {name: now + delta for name, delta in locks.items()},
+        )
+
+    def test_reclaimed_job_not_overwritten_by_stale_worker(self):
+        enqueue("tests.flaky", value="x")
+        [first] = claim()
+        # worker đầu chạy quá timeout -> worker khác lấy lại
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [second] = claim()
+        self.assertEqual(second.attempts, 2)
+
+        # worker đầu xong (lỗi) muộn: không ghi đè trạng thái của lần chạy mới
+        self.assertFalse(run_job(first))
+        j = Job.objects.get()
+        self.assertEqual((j.state, j.attempts, j.last_error), (Job.RUNNING, 2, ""))
+        self.assertEqual(dead, [])
+
+        self.assertFalse(run_job(second))
+        self.assertEqual(Job.objects.get().state, Job.DEAD)
+        self.assertEqual(dead, ["x"])
+
+    def test_unknown_handler_is_dead(self):
+        Job.objects.create(name="tests.missing")
+        run_pending()
+        self.assertEqual(Job.objects.get().state, Job.DEAD)
+
+    def test_stats(self):
+        enqueue("tests.echo", value=1)
+        enqueue("tests.echo", value=2, delay=timedelta(hours=1))
+        stats = job_stats()["tests.echo"]
+        self.assertEqual((stats["queued"], stats["ready"], stats["done"]), (2, 1, 0))
+
+        run_pending()
+        stats = job_stats()["tests.echo"]
+        self.assertEqual((stats["queued"], stats["ready"], stats["done"]), (1, 0, 1))
+        self.assertIsNotNone(stats["avg_run_ms"])
+
+        admin = make_user("admin", is_staff=True)
+        res = auth_client(admin).get(reverse("job_stats"))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["data"]["tests.echo"]["done"], 1)
+        self.assertEqual(auth_client(make_user("khach")).get(reverse("job_stats")).status_code, 403)
@@ -0,0 +1,16 @@
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .queue import job_stats
+
+
+# API Độ sâu hàng đợi job + độ trễ (admin, cho monitoring)
+class JobStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {"data": job_stats(), "message": "Lấy thống kê job thành công."},
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,33 @@
+from apps.jobs.queue import job
+from .models import Payment
+from .utils.momo_client import create_momo_payment
+
+
+def mark_payment_failed(payment_id):
+    # hết lượt thử mà vẫn không tạo được đơn MoMo
+    Payment.objects.filter(pk=payment_id, status=Payment.PENDING, pay_url__isnull=True).update(
+        status=Payment.FAILED
+    )
+
+
+@job("payments.create_momo_order", on_dead=mark_payment_failed)
+def create_momo_order(payment_id):
+    payment = Payment.objects.filter(pk=payment_id).first()
+    # đã có link / đã thanh toán -> job chạy lại (retry, trùng) không tạo đơn mới
+    if payment is None or payment.status != Payment.PENDING or payment.pay_url:
+        return
+
+    momo_response = create_momo_payment(
+        amount=payment.amount,
+        order_info=f"Thanh toán booking {payment.booking_id}"
+    )
+    pay_url = momo_response.get("payUrl")
+    if not pay_url:
+        raise RuntimeError(
+            f"MoMo không trả payUrl: {momo_response.get('resultCode')} {momo_response.get('message')}"
+        )
+
+    payment.transaction_id = momo_response.get("orderId")
+    payment.extra_data = momo_response
+    payment.pay_url = pay_url
+    payment.save(update_fields=["transaction_id", "extra_data", "pay_url"])
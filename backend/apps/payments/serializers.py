@@ -1,7 +1,10 @@
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import serializers
 from .models import Payment
 from ..bookings.models import Booking
-from .utils.momo_client import create_momo_payment
+from ..users.profiles import request_profiles
+from apps.jobs.queue import enqueue
 class PaymentInitSerializer(serializers.ModelSerializer):
     booking_id = serializers.UUIDField(write_only=True)
 
@@ -11,11 +14,11 @@ class PaymentInitSerializer(serializers.ModelSerializer):
         read_only_fields = ["payment_id", "amount", "provider", "status", "created_at"]
 
     def validate(self, attrs):
-        user = self.context["request"].user
+        customer_id = request_profiles(self.context["request"]).customer_id
         try:
             booking = Booking.objects.select_related("customer__user").get(
                 booking_id=attrs["booking_id"],
-                customer__user=user
+                customer_id=customer_id
             )
         except Booking.DoesNotExist:
             raise serializers.ValidationError({"booking_id": "Booking không hợp lệ."})
@@ -29,31 +32,30 @@ class PaymentInitSerializer(serializers.ModelSerializer):
     def create(self, validated):
         booking = validated.pop("__booking")
 
-        # Tạo hoặc cập nhật Payment
-        payment, created = Payment.objects.get_or_create(
-            booking=booking,
-            defaults={
-                "amount": booking.total_price,
-                "provider": "momo",
-                "status": Payment.PENDING,
-            },
-        )
-
-        if not created and payment.amount != booking.total_price:
-            payment.amount = booking.total_price
-            payment.save(update_fields=["amount"])
-
-        momo_response = create_momo_payment(
-            amount=payment.amount,
-            order_info=f"Thanh toán booking {booking.booking_id}"
-        )
-
-        pay_url = momo_response.get("payUrl")
-        order_id = momo_response.get("orderId")
-
-        payment.transaction_id = order_id
-        payment.extra_data = momo_response
-        payment.pay_url = pay_url
-        payment.save(update_fields=["transaction_id", "extra_data", "pay_url"])
+        # reset + enqueue cùng 1 transaction: không có payment PENDING nào thiếu job tạo đơn
+        with transaction.atomic():
+            # Tạo hoặc cập nhật Payment
+            payment, created = Payment.objects.get_or_create(
+                booking=booking,
+                defaults={
+                    "amount": booking.total_price,
+                    "provider": "momo",
+                    "status": Payment.PENDING,
+                },
+            )
 
+            if not created:
+                # khởi tạo lại chỉ khi đơn cũ lỗi / chưa có link; đang PROCESSING (user đang trả trên
+                # trang MoMo) hoặc đã có pay_url -> trả nguyên payment. Điều kiện nằm trong WHERE
+                # nên 2 request cùng lúc không reset chồng nhau.
+                reset = Payment.objects.filter(
+                    Q(status=Payment.FAILED) | Q(status=Payment.PENDING, pay_url__isnull=True),
+                    pk=payment.pk,
+                ).update(amount=booking.total_price, status=Payment.PENDING, transaction_id=None, pay_url=None)
+                if not reset:
+                    return payment
+                payment.refresh_from_db()
+
+            # gọi MoMo trong job nền (apps/payments/jobs.py), client lấy pay_url qua API chi tiết payment
+            enqueue("payments.create_momo_order", key=f"momo:{payment.payment_id}", payment_id=payment.payment_id)
         return payment
\ No newline at end of file
@@ -1,3 +1,74 @@
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.bookings.tests import make_booking
+from apps.customers.models import Customer
+from apps.jobs.models import Job
+from apps.jobs.queue import run_pending
+from apps.tours.tests import auth_client, make_agency, make_tour, make_user
+from .models import Payment
+
+
+class MomoPaymentJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("khach")
+        cls.booking = make_booking(Customer.objects.get(user=cls.user), make_tour(make_agency()))
+
+    def setUp(self):
+        self.client = auth_client(self.user)
+
+    def init(self):
+        res = self.client.post(reverse("payment_init"), {"booking_id": str(self.booking.booking_id)}, format="json")
+        self.assertEqual(res.status_code, 202, res.data)
+        self.assertIsNone(res.data["data"]["pay_url"])
+        return res.data["data"]["payment_id"]
+
+    @mock.patch("apps.payments.jobs.create_momo_payment")
+    def test_pay_url_created_by_job(self, momo):
+        momo.return_value = {"payUrl": "https://momo.test/pay/1", "orderId": "order-1"}
+        # request không gọi MoMo
+        payment_id = self.init()
+        momo.assert_not_called()
+
+        run_pending()
+        res = self.client.get(reverse("payment_detail", args=[payment_id]))
+        self.assertEqual(res.data["data"]["pay_url"], "https://momo.test/pay/1")
+        self.assertEqual(Payment.objects.get(pk=payment_id).transaction_id, "order-1")
+        self.assertEqual(auth_client(make_user("other")).get(reverse("payment_detail", args=[payment_id])).status_code, 404)
+
+    @mock.patch("apps.payments.jobs.create_momo_payment", side_effect=ConnectionError("timeout"))
+    def test_failing_momo_marks_payment_failed_when_dead(self, momo):
+        payment_id = self.init()
+        for _ in range(Job.objects.get().max_attempts):
+            Job.objects.update(run_at=Job.objects.get().created_at)
+            run_pending()
+
+        self.assertEqual(Job.objects.get().state, Job.DEAD)
+        self.assertEqual(Payment.objects.get(pk=payment_id).status, Payment.FAILED)
+
+        # payment lỗi -> khởi tạo lại được, thêm job tạo đơn mới
+        momo.side_effect, momo.return_value = None, {"payUrl": "https://momo.test/pay/2", "orderId": "order-2"}
+        self.assertEqual(self.init(), payment_id)
+        self.assertEqual(Payment.objects.get(pk=payment_id).status, Payment.PENDING)
+        run_pending()
+        self.assertEqual(Payment.objects.get(pk=payment_id).pay_url, "https://momo.test/pay/2")
+
+    @mock.patch("apps.payments.jobs.create_momo_payment")
+    def test_reinit_keeps_processing_payment(self, momo):
+        momo.return_value = {"payUrl": "https://momo.test/pay/1", "orderId": "order-1"}
+        payment_id = self.init()
+        run_pending()
+        # user đang thanh toán trên trang MoMo
+        Payment.objects.filter(pk=payment_id).update(status=Payment.PROCESSING)
 
-# Create your tests here.
+        res = self.client.post(reverse("payment_init"), {"booking_id": str(self.booking.booking_id)}, format="json")
+        self.assertEqual(res.status_code, 202, res.data)
+        self.assertEqual(res.data["data"]["payment_id"], payment_id)
+        self.assertEqual(res.data["data"]["pay_url"], "https://momo.test/pay/1")
+        payment = Payment.objects.get(pk=payment_id)
+        self.assertEqual((payment.status, payment.transaction_id), (Payment.PROCESSING, "order-1"))
+        self.assertEqual(Job.objects.count(), 1)
+        momo.assert_called_once()
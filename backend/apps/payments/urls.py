@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import InitPaymentView, PaymentCallbackView, MomoIPNView
+from .views import InitPaymentView, PaymentCallbackView, PaymentDetailView, MomoIPNView
 
 urlpatterns = [
     path('init/', InitPaymentView.as_view(), name='payment_init'),
+    path('<uuid:payment_id>/', PaymentDetailView.as_view(), name='payment_detail'),
     path("callback/", PaymentCallbackView.as_view(), name="payment_callback"),
     path("momo/ipn/", MomoIPNView.as_view(), name="momo-ipn"),
 ]
\ No newline at end of file
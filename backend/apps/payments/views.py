@@ -5,6 +5,7 @@ from .serializers import PaymentInitSerializer
 from django.utils import timezone
 from .models import Payment
 from ..bookings.models import Booking
+from ..users.profiles import request_profiles
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import traceback, hmac, hashlib, json, logging
@@ -16,7 +17,18 @@ MOMO_ACCESS_KEY = settings.MOMO_ACCESS_KEY
 MOMO_SECRET_KEY = settings.MOMO_SECRET_KEY
 MOMO_PARTNER_CODE = settings.MOMO_PARTNER_CODE
 
-# API Khởi tạo thanh toán
+def payment_data(payment):
+    return {
+        "payment_id": str(payment.payment_id),
+        "booking_id": str(payment.booking_id),
+        "amount": str(payment.amount),
+        "status": payment.status,
+        "provider": payment.provider,
+        "pay_url": payment.pay_url,
+    }
+
+
+# API Khởi tạo thanh toán (tạo đơn MoMo chạy nền, pay_url lấy qua API chi tiết)
 class InitPaymentView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = PaymentInitSerializer
@@ -27,21 +39,12 @@ class InitPaymentView(generics.CreateAPIView):
             serializer.is_valid(raise_exception=True)
             payment = serializer.save()
 
-            data = {
-                "payment_id": str(payment.payment_id),
-                "booking_id": str(payment.booking.booking_id),
-                "amount": str(payment.amount),
-                "status": payment.status,
-                "provider": payment.provider,
-                "pay_url": payment.pay_url,
-            }
-
             return Response(
                 {
-                    "data": data,
-                    "message": "Khởi tạo thanh toán thành công."
+                    "data": payment_data(payment),
+                    "message": "Đang khởi tạo thanh toán, lấy pay_url qua API chi tiết payment."
                 },
-                status=status.HTTP_201_CREATED
+                status=status.HTTP_202_ACCEPTED
             )
 
         except Exception as e:
@@ -52,6 +55,21 @@ class InitPaymentView(generics.CreateAPIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+# API Chi tiết payment của chính khách hàng (poll pay_url sau khi khởi tạo)
+class PaymentDetailView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = "payment_id"
+
+    def get_queryset(self):
+        return Payment.objects.filter(booking__customer_id=request_profiles(self.request).customer_id)
+
+    def retrieve(self, request, *args, **kwargs):
+        payment = self.get_object()
+        return Response(
+            {"data": payment_data(payment), "message": "Lấy thông tin thanh toán thành công."},
+            status=status.HTTP_200_OK,
+        )
+
 # API Xác nhận thanh toán
 @method_decorator(csrf_exempt, name='dispatch')
 class PaymentCallbackView(APIView):
@@ -0,0 +1,86 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from apps.agencies.models import Agency
+from apps.bookings.models import Booking
+from apps.customers.models import Customer
+from apps.reviews.models import Review
+from apps.reviews.rating import apply_rating_change
+from apps.tours.models import Tour
+from apps.users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh AVG/COUNT toàn bộ review với cập nhật F() cho 1 tour có --reviews review (ms / review mới). "
+        "Dữ liệu tạo trong transaction và rollback khi xong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reviews", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        reviews, repeat = max(1, options["reviews"]), max(1, options["repeat"])
+        try:
+            with transaction.atomic():
+                tour = self._seed(reviews)
+                full_ms = self._time(lambda: self._full(tour.pk), repeat)
+                delta_ms = self._time(lambda: apply_rating_change(tour.pk, new=4), repeat)
+                raise Rollback()
+        except Rollback:
+            pass
+        self.stdout.write(
+            f"{reviews} review: AVG/COUNT {full_ms:8.2f} ms  F() {delta_ms:6.2f} ms  x{full_ms / delta_ms:.0f}"
+        )
+
+    def _seed(self, reviews):
+        suffix = time.time_ns()
+        agency = Agency.objects.create(
+            user=User.objects.create_user(username=f"bench-agency-{suffix}", email=f"a{suffix}@bench.local"),
+            agency_name="Bench", license_number=f"BENCH-{suffix}", legal_representative_name="Bench",
+            legal_id_number=f"BENCH-{suffix}", bank_name="VCB", bank_account_number="0",
+            bank_account_holder="BENCH", status="approved", verified=True,
+        )
+        customer = Customer.objects.get(
+            user=User.objects.create_user(username=f"bench-customer-{suffix}", email=f"c{suffix}@bench.local")
+        )
+        tour = Tour.objects.create(
+            agency=agency, name=f"bench-rating-{suffix}", departure_location="Hà Nội",
+            destination="Đà Nẵng", adult_price=1000000, children_price=500000, duration_days=3, region=Tour.CENTRAL,
+        )
+        travel_date = timezone.localdate() + timedelta(days=7)
+        bookings = Booking.objects.bulk_create(
+            [
+                Booking(customer=customer, tour=tour, travel_date=travel_date, num_adults=1, total_price=1000000)
+                for _ in range(reviews)
+            ],
+            batch_size=5000,
+        )
+        Review.objects.bulk_create(
+            [Review(booking=b, tour=tour, rating=i % 5 + 1) for i, b in enumerate(bookings)], batch_size=5000
+        )
+        return tour
+
+    def _full(self, tour_id):
+        # cách cũ: aggregate lại toàn bộ review của tour mỗi lần có review
+        agg = Review.objects.filter(booking__tour_id=tour_id).aggregate(avg=Avg("rating"), n=Count("pk"))
+        Tour.objects.filter(pk=tour_id).update(rating=round(agg["avg"] or 0, 2), reviews_count=agg["n"])
+
+    def _time(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
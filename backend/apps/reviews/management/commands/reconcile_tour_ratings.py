@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.reviews.rating import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = "Tính lại rating_sum / reviews_count / rating của tour từ review, chỉ ghi tour bị lệch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("tour_ids", nargs="*", help="mặc định: mọi tour")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_ratings(options["tour_ids"] or None, batch_size=max(1, options["batch_size"]))
+        for tour_id in fixed[:20]:
+            self.stdout.write(f"  {tour_id}")
+        self.stdout.write(self.style.SUCCESS(f"Đã sửa rating của {len(fixed)} tour."))
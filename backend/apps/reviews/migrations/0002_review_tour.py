@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BACKFILL_TOUR = """
+UPDATE reviews_review r
+SET tour_id = b.tour_id
+FROM bookings_booking b
+WHERE b.booking_id = r.booking_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+        ('tours', '0015_tour_rating_stars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='tour',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='tours.tour'),
+        ),
+        migrations.RunSQL(BACKFILL_TOUR, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='review',
+            name='tour',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='tours.tour'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['tour', '-created_at', '-review_id'], name='review_tour_recent_idx'),
+        ),
+    ]
@@ -10,6 +10,13 @@ class Review(models.Model):
         on_delete=models.CASCADE,
         related_name='review'
     )
+    # = booking.tour, lưu thẳng trên review để lọc / phân trang theo tour bằng index (không JOIN booking)
+    tour = models.ForeignKey(
+        'tours.Tour',
+        on_delete=models.CASCADE,
+        related_name='reviews',
+        editable=False,
+    )
     rating = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(5)]
     )
@@ -23,7 +30,21 @@ class Review(models.Model):
         indexes = [
             models.Index(fields=['rating']),
             models.Index(fields=['created_at']),
+            # review mới nhất của tour + keyset (created_at, review_id)
+            models.Index(fields=['tour', '-created_at', '-review_id'], name='review_tour_recent_idx'),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # điểm đang lưu trong DB -> signal biết rating đổi bao nhiêu khi save lại
+        instance._db_rating = instance.rating if "rating" in field_names else None
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.tour_id is None and self.booking_id is not None:
+            self.tour_id = self.booking.tour_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Review {self.review_id} - {self.rating}★"
@@ -0,0 +1,21 @@
+from ..tours.pagination import TourKeysetPagination
+
+
+class ReviewKeysetPagination(TourKeysetPagination):
+    """
+    Keyset (created_at, review_id) cho review của 1 tour, luôn bật (không trả toàn bộ review nữa).
+    Khớp index review_tour_recent_idx (tour, -created_at, -review_id).
+    """
+    page_size = 10
+    max_page_size = 50
+    ordering_fields = ("created_at",)
+    default_ordering = "-created_at"
+    tiebreaker = "review_id"
+
+    def is_enabled(self, request):
+        return True
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["message"] = "Lấy danh sách đánh giá thành công."
+        return response
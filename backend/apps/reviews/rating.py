@@ -0,0 +1,91 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+
+from ..tours.cache import bump_tour_cache
+from ..tours.listing import refresh_listing_ratings
+from ..tours.models import Tour
+from .models import Review
+
+# Tour.rating = rating_sum / reviews_count, duy trì dần theo từng review bằng F() (O(1) mỗi lần ghi),
+# không AVG/COUNT lại toàn bộ review của tour. Lệch (sửa tay DB, bulk ...) -> reconcile_ratings.
+
+# mức sao -> cột đếm trên Tour (histogram)
+STAR_FIELDS = {star: f"stars_{star}" for star in range(1, 6)}
+COUNTER_FIELDS = ["rating_sum", "reviews_count", *STAR_FIELDS.values()]
+
+
+def rating_expression(total, count):
+    """total / count làm tròn 2 số (cột Tour.rating), 0 khi chưa có review."""
+    return Coalesce(
+        Round(Cast(total, DecimalField(max_digits=12, decimal_places=2)) / NullIf(count, 0), 2),
+        Value(Decimal("0")),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def average(total, count):
+    """Như rating_expression nhưng tính trong Python."""
+    if not count:
+        return Decimal("0.00")
+    return (Decimal(total) / count).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def histogram(tour):
+    """{sao: số review} từ các cột đếm (tour là instance hoặc dict của .values())."""
+    get = tour.get if isinstance(tour, dict) else lambda field: getattr(tour, field)
+    return {star: get(field) for star, field in STAR_FIELDS.items()}
+
+
+def apply_rating_change(tour_id, old=None, new=None):
+    """
+    Review của tour đổi điểm old -> new (None: chưa có / đã xoá). Cộng dồn vào tour trong 1 UPDATE
+    (an toàn khi nhiều review ghi song song) rồi đồng bộ listing.
+    """
+    if old == new:
+        return
+    total = Greatest(F("rating_sum") + ((new or 0) - (old or 0)), 0)
+    count = Greatest(F("reviews_count") + (int(new is not None) - int(old is not None)), 0)
+    updates = {"rating_sum": total, "reviews_count": count, "rating": rating_expression(total, count)}
+    if old in STAR_FIELDS:
+        updates[STAR_FIELDS[old]] = Greatest(F(STAR_FIELDS[old]) - 1, 0)
+    if new in STAR_FIELDS:
+        updates[STAR_FIELDS[new]] = F(STAR_FIELDS[new]) + 1
+
+    if Tour.objects.filter(pk=tour_id).update(**updates):
+        refresh_listing_ratings([tour_id])
+
+
+def reconcile_ratings(tour_ids=None, batch_size=1000):
+    """Tính lại rating / các cột đếm từ review cho các tour bị lệch. Trả list tour_id đã sửa."""
+    tours = Tour.objects.all() if tour_ids is None else Tour.objects.filter(pk__in=tour_ids)
+    reviews = Review.objects.all() if tour_ids is None else Review.objects.filter(tour__in=tour_ids)
+
+    actual = {
+        row.pop("tour"): row
+        for row in reviews.order_by().values("tour").annotate(
+            rating_sum=Coalesce(Sum("rating"), 0),
+            reviews_count=Count("pk"),
+            **{field: Count("pk", filter=Q(rating=star)) for star, field in STAR_FIELDS.items()},
+        )
+    }
+
+    drifted = []
+    for tour in tours.only("rating", *COUNTER_FIELDS).iterator(chunk_size=batch_size):
+        row = actual.get(tour.pk) or dict.fromkeys(COUNTER_FIELDS, 0)
+        rating = average(row["rating_sum"], row["reviews_count"])
+        if tour.rating == rating and all(getattr(tour, f) == row[f] for f in COUNTER_FIELDS):
+            continue
+        tour.rating = rating
+        for field in COUNTER_FIELDS:
+            setattr(tour, field, row[field])
+        drifted.append(tour)
+
+    ids = [tour.pk for tour in drifted]
+    Tour.objects.bulk_update(drifted, ["rating", *COUNTER_FIELDS], batch_size=batch_size)
+    for start in range(0, len(ids), batch_size):
+        refresh_listing_ratings(ids[start:start + batch_size])
+    for tour_id in ids:
+        bump_tour_cache(tour_id)
+    return ids
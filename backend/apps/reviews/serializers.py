@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.utils import timezone
 from .models import Review
 from ..bookings.models import Booking
+from ..users.profiles import request_profiles
 
 
 # API tạo review
@@ -21,7 +22,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, attrs):
-        user = self.context["request"].user
+        customer_id = request_profiles(self.context["request"]).customer_id
 
         booking_id = attrs.get("booking_id")
         if not booking_id:
@@ -31,7 +32,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
             booking = (
                 Booking.objects
                 .select_related("customer__user", "tour")
-                .get(booking_id=booking_id, customer__user=user)
+                .get(booking_id=booking_id, customer_id=customer_id)
             )
         except Booking.DoesNotExist:
             raise serializers.ValidationError({"booking_id": "Không tìm thấy booking của bạn."})
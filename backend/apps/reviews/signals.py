@@ -1,33 +1,43 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.db.models import Avg, Count
 from .models import Review
-import logging, traceback
+from .rating import apply_rating_change, reconcile_ratings
+from ..tours.cache import bump_tour_cache
+from ..tours.models import Tour
+import logging
 
 logger = logging.getLogger(__name__)
 
-@receiver(post_save, sender=Review)
-def recompute_tour_rating(sender, instance, **kwargs):
-    try:
-        tour = getattr(getattr(instance, "booking", None), "tour", None)
-        if not tour:
-            logger.info("recompute_tour_rating: NO TOUR for review %s", instance.pk)
-            return
 
-        agg = Review.objects.filter(booking__tour=tour).aggregate(
-            avg_rating=Avg("rating"),
-            total_reviews=Count("review_id")   # <— SỬA Ở ĐÂY
-            # hoặc Count("pk") cũng được
-        )
+@receiver(post_save, sender=Review)
+def update_tour_rating(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    tour_id = instance.tour_id
 
-        logger.info("recompute_tour_rating AGG for tour %s: %s", tour.pk, agg)
+    # review đổi -> ETag danh sách review của tour đổi ngay
+    bump_tour_cache(tour_id)
 
-        tour.rating = round(agg["avg_rating"] or 0.0, 2)
-        tour.reviews_count = agg["total_reviews"] or 0
-        tour.save(update_fields=["rating", "reviews_count"])
+    old_rating = getattr(instance, "_db_rating", None)
+    if created:
+        apply_rating_change(tour_id, new=instance.rating)
+    elif update_fields is not None and "rating" not in update_fields:
+        return  # sửa / ẩn bình luận: điểm giữ nguyên
+    elif old_rating is None:
+        # instance không đọc từ DB -> không biết điểm cũ, tính lại riêng tour này
+        logger.info("update_tour_rating: unknown previous rating for review %s", instance.pk)
+        reconcile_ratings([tour_id])
+    else:
+        apply_rating_change(tour_id, old=old_rating, new=instance.rating)
+    # chỉ ghi nhận điểm mới khi đã thật sự lưu (save bỏ qua rating thì DB vẫn giữ điểm cũ)
+    instance._db_rating = instance.rating
 
-        logger.info("recompute_tour_rating DONE for tour %s", tour.pk)
 
-    except Exception:
-        logger.error("recompute_tour_rating failed:\n%s", traceback.format_exc())
+@receiver(post_delete, sender=Review)
+def remove_tour_rating(sender, instance, origin=None, **kwargs):
+    # xoá kèm theo tour (cascade) -> không còn tour để cập nhật
+    if isinstance(origin, Tour) or getattr(origin, "model", None) is Tour:
+        return
+    bump_tour_cache(instance.tour_id)
+    apply_rating_change(instance.tour_id, old=getattr(instance, "_db_rating", None) or instance.rating)
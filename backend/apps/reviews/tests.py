@@ -1,3 +1,146 @@
+import uuid
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.bookings.tests import make_booking
+from apps.customers.models import Customer
+from apps.tours.models import Tour, TourListing
+from apps.tours.tests import auth_client, make_agency, make_tour, make_user
+from .models import Review
+from .rating import histogram, reconcile_ratings
+
+
+class ReviewQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tour = make_tour(make_agency())
+        for i in range(3):
+            customer = Customer.objects.get(user=make_user(f"khach{i}"))
+            booking = make_booking(customer, cls.tour)
+            Review.objects.create(booking=booking, rating=4 + i % 2, comment="Tốt")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tour_reviews(self):
+        url = reverse("tour_reviews", args=[self.tour.tour_id])
+        # aggregate (ETag) + 1 trang review JOIN booking/customer/user
+        with self.assertNumQueries(2):
+            res = auth_client().get(url)
+        self.assertEqual(len(res.data["data"]), 3)
+        self.assertIsNone(res.data["next_cursor"])
+
+    def test_tour_reviews_cursor_pages(self):
+        url = reverse("tour_reviews", args=[self.tour.tour_id])
+        client = auth_client()
+        first = client.get(url, {"page_size": 2})
+        second = client.get(url, {"cursor": first.data["next_cursor"], "page_size": 2})
+        self.assertNotEqual(first["ETag"], second["ETag"])
+        self.assertIsNone(second.data["next_cursor"])
+        ids = [r["review_id"] for r in first.data["data"] + second.data["data"]]
+        expected = Review.objects.filter(tour=self.tour).order_by("-created_at", "-review_id")
+        self.assertEqual(ids, [str(r.pk) for r in expected])
+
+    def test_tour_reviews_empty_same_shape(self):
+        url = reverse("tour_reviews", args=[make_tour(self.tour.agency, name="Tour mới").tour_id])
+        # chỉ aggregate (ETag), không query trang
+        with self.assertNumQueries(1):
+            empty = auth_client().get(url, {"page_size": 5})
+        full = auth_client().get(reverse("tour_reviews", args=[self.tour.tour_id]), {"page_size": 5})
+        self.assertEqual(set(empty.data), set(full.data))
+        self.assertEqual(
+            (empty.data["data"], empty.data["next_cursor"], empty.data["prev_cursor"], empty.data["page_size"]),
+            ([], None, None, 5),
+        )
+
+    def test_tour_reviews_etag_only(self):
+        url = reverse("tour_reviews", args=[self.tour.tour_id])
+        res = auth_client().get(url)
+        # MAX(created_at) không đổi khi sửa / xoá review -> không dùng làm Last-Modified
+        self.assertNotIn("Last-Modified", res)
+        self.assertEqual(auth_client().get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code, 200)
+        self.assertEqual(auth_client().get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 304)
+
+    def test_summary_single_query(self):
+        Review.objects.filter(rating=5).update(is_deleted=True, comment=None)
+        url = reverse("tour_review_summary", args=[self.tour.tour_id])
+        with self.assertNumQueries(1):
+            res = auth_client().get(url, {"recent": 5})
+        data = res.data["data"]
+        self.assertEqual((data["rating"], data["reviews_count"]), (Decimal("4.33"), 3))
+        self.assertEqual(data["histogram"], {1: 0, 2: 0, 3: 0, 4: 2, 5: 1})
+        # review đã ẩn không có trong bình luận mới nhất
+        self.assertEqual([c["rating"] for c in data["recent"]], [4, 4])
+        self.assertEqual(data["recent"][0]["comment"], "Tốt")
+
+        res = auth_client().get(url, {"recent": 5}, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(auth_client().get(reverse("tour_review_summary", args=[uuid.uuid4()])).status_code, 404)
+
+
+class TourRatingTests(TestCase):
+    def setUp(self):
+        self.tour = make_tour(make_agency())
+
+    def review(self, i, rating):
+        customer = Customer.objects.get(user=make_user(f"khach{i}"))
+        return Review.objects.create(booking=make_booking(customer, self.tour), rating=rating)
+
+    def assertRating(self, rating, count, stars=None):
+        tour = Tour.objects.get(pk=self.tour.pk)
+        self.assertEqual((tour.rating, tour.reviews_count), (Decimal(rating), count))
+        if stars is not None:
+            self.assertEqual(list(histogram(tour).values()), stars)
+        listing = TourListing.objects.get(tour=self.tour)
+        self.assertEqual((listing.rating, listing.reviews_count), (Decimal(rating), count))
+
+    def test_incremental_updates(self):
+        reviews = [self.review(i, rating) for i, rating in enumerate([5, 4, 4])]
+        self.assertRating("4.33", 3, [0, 0, 0, 2, 1])
+
+        # ẩn bình luận: không đụng tour
+        review = Review.objects.select_related("booking").get(pk=reviews[0].pk)
+        review.comment, review.is_deleted = None, True
+        with self.assertNumQueries(1):
+            review.save(update_fields=["comment", "is_deleted"])
+        self.assertRating("4.33", 3)
+
+        # đổi điểm: 1 UPDATE tour + 1 UPDATE listing
+        review.rating = 2
+        with self.assertNumQueries(3):
+            review.save(update_fields=["rating"])
+        self.assertRating("3.33", 3, [0, 1, 0, 2, 0])
+
+        Review.objects.get(pk=reviews[1].pk).delete()
+        self.assertRating("3.00", 2)
+        for r in Review.objects.all():
+            r.delete()
+        self.assertRating("0", 0, [0, 0, 0, 0, 0])
+
+    def test_save_without_rating_keeps_previous_rating(self):
+        review = Review.objects.get(pk=self.review(0, 5).pk)
+        self.review(1, 3)
+        # đổi rating nhưng save chỉ lưu comment -> DB vẫn 5
+        review.rating, review.comment = 1, "Sửa bình luận"
+        review.save(update_fields=["comment"])
+        self.assertRating("4.00", 2)
+        # lần save sau tính chênh lệch từ điểm thật trong DB (5 -> 1), không lệch tổng
+        review.save()
+        self.assertRating("2.00", 2, [1, 0, 1, 0, 0])
+        self.assertEqual(reconcile_ratings(), [])
+
+    def test_reconcile_fixes_drift(self):
+        self.review(0, 5)
+        self.review(1, 3)
+        Tour.objects.filter(pk=self.tour.pk).update(rating_sum=99, reviews_count=7, rating=1)
+        self.assertEqual(reconcile_ratings(), [self.tour.pk])
+        self.assertRating("4.00", 2, [0, 0, 1, 0, 1])
+        self.assertEqual(Tour.objects.get(pk=self.tour.pk).rating_sum, 8)
 
-# Create your tests here.
+        self.assertEqual(reconcile_ratings(), [])
+        call_command("reconcile_tour_ratings", stdout=StringIO())
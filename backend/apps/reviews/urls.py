@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import CreateReviewView, TourReviewsListView, MyReviewUpdateDeleteView
+from .views import CreateReviewView, TourReviewsListView, TourReviewSummaryView, MyReviewUpdateDeleteView
 
 urlpatterns = [
     path('create/', CreateReviewView.as_view(), name='review_create'),
     path('tour/<uuid:tour_id>/', TourReviewsListView.as_view(), name='tour_reviews'),
+    path('tour/<uuid:tour_id>/summary/', TourReviewSummaryView.as_view(), name='tour_review_summary'),
     path("<uuid:review_id>/", MyReviewUpdateDeleteView.as_view(), name="my_review_update_delete"),
 ]
@@ -4,6 +4,16 @@ from .serializers import ReviewCreateSerializer, ReviewListItemSerializer, Revie
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from django.db import IntegrityError
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import Count, Max, OuterRef
+from django.db.models.functions import JSONObject
+from rest_framework.views import APIView
+from utils.conditional import make_etag, not_modified, set_validators
+from ..tours.cache import tour_version
+from ..tours.models import Tour
+from .pagination import ReviewKeysetPagination
+from .rating import STAR_FIELDS, histogram
+from ..users.profiles import request_profiles
 class CreateReviewView(generics.CreateAPIView):
     serializer_class = ReviewCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -50,29 +60,108 @@ class CreateReviewView(generics.CreateAPIView):
 class TourReviewsListView(generics.ListAPIView):
     serializer_class = ReviewListItemSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = ReviewKeysetPagination
 
     def get_queryset(self):
-        tour_id = self.kwargs["tour_id"]
         return (
-            Review.objects.filter(booking__tour__tour_id=tour_id)
+            Review.objects.filter(tour_id=self.kwargs["tour_id"])
             .select_related("booking__customer__user")
-            .order_by("-created_at")
         )
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
 
-        if not queryset.exists():
+        # ETag: số review + review mới nhất + version tour (bump khi review sửa/ẩn) + trang đang xem.
+        # Không Last-Modified: MAX(created_at) không đổi khi sửa / xoá review
+        agg = queryset.order_by().aggregate(total=Count("pk"), last_created=Max("created_at"))
+        last_created = agg["last_created"]
+        etag = make_etag(
+            "reviews",
+            self.kwargs["tour_id"],
+            tour_version(self.kwargs["tour_id"]),
+            agg["total"],
+            last_created.isoformat() if last_created else None,
+            *(request.query_params.get(p) for p in ("cursor", "page_size", "ordering")),
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        return set_validators(self._list_response(queryset, agg["total"]), etag)
+
+    def _list_response(self, queryset, total):
+        if not total:
+            # đã biết rỗng từ aggregate -> không query trang, response cùng shape (có page_size)
+            response = self.get_paginated_response(self.paginator.empty_page(self.request))
+            response.data["message"] = "Tour này chưa có đánh giá."
+            return response
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+# API tổng quan đánh giá của tour: điểm TB, tổng, histogram sao + N bình luận mới nhất (1 query)
+class TourReviewSummaryView(APIView):
+    permission_classes = [permissions.AllowAny]
+    default_recent = 3
+    max_recent = 20
+
+    def get_recent(self, request):
+        try:
+            recent = int(request.query_params.get("recent", self.default_recent))
+        except (TypeError, ValueError):
+            recent = self.default_recent
+        return min(max(recent, 1), self.max_recent)
+
+    def get(self, request, tour_id):
+        recent = self.get_recent(request)
+        comments = (
+            Review.objects.filter(tour=OuterRef("pk"), is_deleted=False)
+            .exclude(comment__isnull=True)
+            .exclude(comment="")
+            .order_by("-created_at", "-review_id")
+            .values(json=JSONObject(
+                review_id="review_id",
+                rating="rating",
+                comment="comment",
+                customer_name="booking__customer__user__full_name",
+                created_at="created_at",
+            ))[:recent]
+        )
+        summary = (
+            Tour.objects.filter(pk=tour_id)
+            .values("rating", "reviews_count", *STAR_FIELDS.values())
+            .annotate(recent=ArraySubquery(comments))
+            .first()
+        )
+        if summary is None:
             return Response(
-                {"message": "Tour này chưa có đánh giá.", "data": []},
-                status=status.HTTP_200_OK,
+                {"data": None, "message": "Không tìm thấy tour."},
+                status=status.HTTP_404_NOT_FOUND,
             )
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(
-            {"data": serializer.data, "message": "Lấy danh sách đánh giá thành công."},
-            status=status.HTTP_200_OK,
+        stars = histogram(summary)
+        etag = make_etag(
+            "reviews-summary", tour_id, tour_version(tour_id), recent, summary["reviews_count"], *stars.values()
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        data = {
+            "tour_id": str(tour_id),
+            "rating": summary["rating"],
+            "reviews_count": summary["reviews_count"],
+            "histogram": stars,
+            "recent": summary["recent"],
+        }
+        return set_validators(
+            Response({"data": data, "message": "Lấy tổng quan đánh giá thành công."}, status=status.HTTP_200_OK),
+            etag,
         )
+
+
 class MyReviewUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Review.objects.select_related("booking__customer__user")
     serializer_class = ReviewUpdateSerializer
@@ -80,7 +169,7 @@ class MyReviewUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = "review_id"
 
     def get_queryset(self):
-        return self.queryset.filter(booking__customer__user=self.request.user)
+        return self.queryset.filter(booking__customer_id=request_profiles(self.request).customer_id)
 
     # Cập nhật bình luận
     def update(self, request, *args, **kwargs):
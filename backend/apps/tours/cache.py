@@ -0,0 +1,127 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from utils.conditional import make_etag, to_timestamp
+from utils.fieldsets import SHAPE_PARAMS
+from .filters import PUBLIC_FILTER_PARAMS, filter_fingerprint
+from .models import Tour
+
+# Cache response public của tour, invalidation bằng version counter:
+# - mỗi tour có 1 version, toàn catalogue có 1 version
+# - ghi tour -> tăng version => key cũ không còn được tra tới (không cần quét/xoá key)
+
+LIST_TIMEOUT = 5 * 60
+DETAIL_TIMEOUT = 10 * 60
+FACETS_TIMEOUT = 5 * 60
+
+CATALOGUE_VERSION_KEY = "tours:ver:catalogue"
+
+# param của phân trang / sparse fieldset cũng quyết định nội dung trang
+LIST_CACHE_PARAMS = PUBLIC_FILTER_PARAMS + ("cursor", "page_size", "ordering") + SHAPE_PARAMS
+
+
+def _tour_version_key(tour_id):
+    return f"tours:ver:{tour_id}"
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # khởi tạo theo thời gian (ms) để version bị evict rồi tạo lại
+        # không bao giờ trùng với version cũ -> không đọc nhầm entry cũ
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def catalogue_version():
+    return _get_version(CATALOGUE_VERSION_KEY)
+
+
+def tour_version(tour_id):
+    return _get_version(_tour_version_key(tour_id))
+
+
+def bump_tour_cache(tour_id=None):
+    """
+    Đánh dấu cache của 1 tour (và danh sách/facets) là cũ.
+    Chạy sau khi transaction commit để request khác không cache lại dữ liệu cũ.
+    """
+    bump_tours_cache([] if tour_id is None else [tour_id])
+
+
+def bump_tours_cache(tour_ids):
+    """Như bump_tour_cache cho nhiều tour (vd: mọi tour của 1 agency)."""
+    tour_ids = list(tour_ids)
+
+    def _do():
+        for tour_id in tour_ids:
+            _bump(_tour_version_key(tour_id))
+        _bump(CATALOGUE_VERSION_KEY)
+
+    transaction.on_commit(_do)
+
+
+def public_list_key(params):
+    return f"tours:list:{catalogue_version()}:{filter_fingerprint(params, LIST_CACHE_PARAMS)}"
+
+
+def public_facets_key(params):
+    return f"tours:facets:{catalogue_version()}:{filter_fingerprint(params)}"
+
+
+def public_detail_key(tour_id, params=None):
+    shape = filter_fingerprint(params or {}, SHAPE_PARAMS)
+    return f"tours:detail:{tour_id}:{tour_version(tour_id)}:{shape}"
+
+
+# ===== Validators cho conditional GET (ETag / Last-Modified) =====
+
+def list_validators(queryset, params):
+    """
+    ETag của tập tour đã filter: COUNT + MAX(updated_at) (rẻ), kèm version catalogue
+    (ghi nhận cả thay đổi không đụng updated_at như rating, xoá tour).
+    Danh sách không có Last-Modified: MAX(updated_at) không đổi khi xoá tour / đổi rating
+    -> If-Modified-Since sẽ trả 304 cho nội dung đã khác.
+    """
+    agg = queryset.order_by().aggregate(total=Count("pk"), last_modified=Max("updated_at"))
+    last_modified = agg["last_modified"]
+    return make_etag(
+        "list",
+        catalogue_version(),
+        filter_fingerprint(params, LIST_CACHE_PARAMS),
+        agg["total"],
+        last_modified.isoformat() if last_modified else None,
+    )
+
+
+def detail_validators(tour_id, params=None):
+    """
+    ETag/Last-Modified của 1 tour từ updated_at (tour + thumbnail + agency: tên, email, hotline
+    hiện trong chi tiết). None nếu không có.
+    ETag khác nhau theo ?fields= / ?exclude= (mỗi bộ field là 1 representation).
+    """
+    row = (
+        Tour.objects.filter(is_active=True, tour_id=tour_id)
+        .values_list("updated_at", "thumbnail__updated_at", "agency__updated_at")
+        .first()
+    )
+    if row is None:
+        return None, None
+    last_modified = max(dt for dt in row if dt is not None)
+    etag = make_etag(
+        "detail", tour_id, tour_version(tour_id),
+        filter_fingerprint(params or {}, SHAPE_PARAMS),
+        *[dt and dt.isoformat() for dt in row],
+    )
+    return etag, to_timestamp(last_modified)
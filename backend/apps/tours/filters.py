@@ -0,0 +1,186 @@
+import hashlib
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+from utils.fieldsets import SHAPE_PARAMS
+from .models import Tour
+from .search import MATCH_CONTAINS, MATCH_FUZZY, match_text, search_tours
+
+# các query param ảnh hưởng tới tập tour public (dùng chung list / facets / cache key)
+PUBLIC_FILTER_PARAMS = (
+    "agency", "min_price", "max_price",
+    "departure_location", "destination",
+    "region", "category", "categories",
+    "q", "match",
+)
+
+# param dạng "a,b,c" -> thứ tự không quan trọng
+_LIST_PARAMS = ("region", "category", "categories", *SHAPE_PARAMS)
+# filter so khớp không phân biệt hoa thường -> cache key hạ chữ thường được;
+# ?fields / ?exclude là tên field (phân biệt hoa thường) thì giữ nguyên
+_CASE_INSENSITIVE_PARAMS = ("region", "category", "categories")
+
+REGION_ALIASES = {"north": Tour.NORTH, "central": Tour.CENTRAL, "south": Tour.SOUTH}
+
+# (min, max) VND theo giá sau giảm, max=None là không giới hạn; khoảng [min, max)
+PRICE_BANDS = [
+    (0, 1_000_000),
+    (1_000_000, 3_000_000),
+    (3_000_000, 5_000_000),
+    (5_000_000, 10_000_000),
+    (10_000_000, None),
+]
+
+# (min, max) ngày, tính cả 2 đầu; max=None là không giới hạn
+DURATION_BUCKETS = [
+    (1, 2),
+    (3, 4),
+    (5, 7),
+    (8, None),
+]
+
+
+def filter_public_tours(qs, params, agency_field="agency__agency_name"):
+    """
+    Pipeline filter của danh sách tour public (?agency, ?min_price, ?region, ?q ...).
+    Dùng chung cho Tour và read-model TourListing (agency_field="agency_name").
+    """
+    # ?match=fuzzy: so khớp gần đúng (trigram), mặc định: chứa chuỗi (không dấu)
+    match = MATCH_FUZZY if params.get("match") == MATCH_FUZZY else MATCH_CONTAINS
+
+    # filter agency name
+    agency = params.get("agency")
+    if agency:
+        qs = match_text(qs, agency_field, agency, match)
+
+    # filter price theo giá sau giảm (ép kiểu để chắc)
+    min_price = params.get("min_price")
+    max_price = params.get("max_price")
+
+    try:
+        if min_price not in (None, ""):
+            qs = qs.filter(final_adult_price__gte=Decimal(min_price))
+    except (ArithmeticError, ValueError, TypeError):
+        pass
+
+    try:
+        if max_price not in (None, ""):
+            qs = qs.filter(final_adult_price__lte=Decimal(max_price))
+    except (ArithmeticError, ValueError, TypeError):
+        pass
+
+    # filter departure_location / destination
+    departure_location = params.get("departure_location")
+    if departure_location:
+        qs = match_text(qs, "departure_location", departure_location, match)
+
+    destination = params.get("destination")
+    if destination:
+        qs = match_text(qs, "destination", destination, match)
+
+    # filter region
+    region_param = params.get("region")
+    if region_param:
+        raw = [p.strip().lower() for p in region_param.split(",") if p.strip()]
+
+        vals = []
+        for p in raw:
+            if p.isdigit():
+                vals.append(int(p))
+            elif p in REGION_ALIASES:
+                vals.append(REGION_ALIASES[p])
+
+        if vals:
+            qs = qs.filter(region__in=vals)
+
+    # filter categories overlap
+    cat_param = params.get("category") or params.get("categories")
+    if cat_param:
+        # giá trị category đều viết thường (Tour.CATEGORY_CHOICES), cùng cách chuẩn hoá với cache key
+        cats = [c.strip().lower() for c in cat_param.split(",") if c.strip()]
+        if cats:
+            qs = qs.filter(categories__overlap=cats)
+
+    # search q: full-text (GIN search_vector), xếp theo độ liên quan
+    q = params.get("q")
+    if q:
+        qs = search_tours(qs, q)
+        if "search_rank" in qs.query.annotations:
+            qs = qs.order_by("-search_rank", "-created_at")
+
+    return qs
+
+
+def normalize_filter_params(params, allowed=PUBLIC_FILTER_PARAMS):
+    """
+    Chuẩn hoá bộ filter để làm cache key: bỏ param rỗng / không liên quan,
+    sắp xếp key và các phần tử của param dạng danh sách.
+    """
+    items = []
+    for key in allowed:
+        value = (params.get(key) or "").strip()
+        if not value:
+            continue
+        if key in _LIST_PARAMS:
+            parts = {p.strip() for p in value.split(",") if p.strip()}
+            if key in _CASE_INSENSITIVE_PARAMS:
+                parts = {p.lower() for p in parts}
+            value = ",".join(sorted(parts))
+        items.append((key, value))
+    return items
+
+
+def filter_fingerprint(params, allowed=PUBLIC_FILTER_PARAMS):
+    raw = "&".join(f"{k}={v}" for k, v in normalize_filter_params(params, allowed))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _range_q(field, low, high, inclusive_high):
+    q = Q(**{f"{field}__gte": low})
+    if high is not None:
+        q &= Q(**{f"{field}__lte" if inclusive_high else f"{field}__lt": high})
+    return q
+
+
+def compute_facets(qs):
+    """
+    Đếm số tour theo region, category, khoảng giá, khoảng số ngày
+    trong 1 câu SELECT duy nhất (COUNT(*) FILTER (WHERE ...)).
+    """
+    aggregates = {"total": Count("pk")}
+
+    for value, _ in Tour.REGION_CHOICES:
+        aggregates[f"region_{value}"] = Count("pk", filter=Q(region=value))
+
+    # categories có tập giá trị cố định -> @> ARRAY[...] dùng được GIN index
+    for value, _ in Tour.CATEGORY_CHOICES:
+        aggregates[f"category_{value}"] = Count("pk", filter=Q(categories__contains=[value]))
+
+    for idx, (low, high) in enumerate(PRICE_BANDS):
+        aggregates[f"price_{idx}"] = Count("pk", filter=_range_q("final_adult_price", low, high, False))
+
+    for idx, (low, high) in enumerate(DURATION_BUCKETS):
+        aggregates[f"duration_{idx}"] = Count("pk", filter=_range_q("duration_days", low, high, True))
+
+    row = qs.order_by().aggregate(**aggregates)
+
+    return {
+        "total": row["total"],
+        "region": [
+            {"value": value, "label": label, "count": row[f"region_{value}"]}
+            for value, label in Tour.REGION_CHOICES
+        ],
+        "categories": [
+            {"value": value, "label": label, "count": row[f"category_{value}"]}
+            for value, label in Tour.CATEGORY_CHOICES
+        ],
+        "price": [
+            {"min": low, "max": high, "count": row[f"price_{idx}"]}
+            for idx, (low, high) in enumerate(PRICE_BANDS)
+        ],
+        "duration_days": [
+            {"min": low, "max": high, "count": row[f"duration_{idx}"]}
+            for idx, (low, high) in enumerate(DURATION_BUCKETS)
+        ],
+    }
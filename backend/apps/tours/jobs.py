@@ -0,0 +1,14 @@
+from apps.jobs.queue import job
+from utils.images import build_variants
+from .models import TourImage, TourThumbnail
+from .variants import image_variants_done, thumbnail_variants_done
+
+
+@job("tours.build_thumbnail_variants")
+def build_thumbnail_variants(tour_id):
+    build_variants(TourThumbnail, tour_id, "thumbnail", after=thumbnail_variants_done)
+
+
+@job("tours.build_image_variants")
+def build_image_variants(img_id):
+    build_variants(TourImage, img_id, "image", after=image_variants_done)
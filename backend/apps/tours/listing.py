@@ -0,0 +1,118 @@
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from utils.images import variant_urls
+from utils.media import media_url
+
+from .models import Tour, TourListing
+
+# Đồng bộ read-model TourListing từ Tour (+ agency, thumbnail).
+# Mọi đường ghi (signal, lệnh rebuild) đều đi qua refresh_tour_listings.
+
+LISTING_SYNC_FIELDS = [
+    "agency", "agency_name",
+    "name", "description", "departure_location", "destination",
+    "adult_price", "children_price", "discount",
+    "final_adult_price", "final_children_price",
+    "duration_days", "rating", "reviews_count", "region", "categories",
+    "thumbnail_url", "thumbnail_variants", "search_vector",
+    "created_at", "updated_at",
+]
+
+def _thumbnail_url(tour):
+    thumb = getattr(tour, "thumbnail", None)
+    image = getattr(thumb, "thumbnail", None) if thumb else None
+    if not image:
+        return ""
+    try:
+        return media_url(image)
+    except Exception:
+        return ""
+
+
+def _thumbnail_variants(tour):
+    thumb = getattr(tour, "thumbnail", None)
+    return variant_urls(thumb.variants) if thumb else {}
+
+
+def build_listing(tour, now=None):
+    """TourListing (chưa lưu) từ tour đã select_related agency + thumbnail."""
+    agency = tour.agency
+    return TourListing(
+        tour=tour,
+        agency=agency,
+        agency_name=agency.agency_name if agency else "",
+        name=tour.name,
+        description=tour.description,
+        departure_location=tour.departure_location,
+        destination=tour.destination,
+        adult_price=tour.adult_price,
+        children_price=tour.children_price,
+        discount=tour.discount,
+        final_adult_price=tour.final_adult_price,
+        final_children_price=tour.final_children_price,
+        duration_days=tour.duration_days,
+        rating=tour.rating,
+        reviews_count=tour.reviews_count,
+        region=tour.region,
+        categories=tour.categories,
+        thumbnail_url=_thumbnail_url(tour),
+        thumbnail_variants=_thumbnail_variants(tour),
+        search_vector=tour.search_vector,
+        created_at=tour.created_at,
+        updated_at=now or timezone.now(),
+    )
+
+
+def refresh_tour_listings(tour_ids):
+    """
+    Upsert listing cho các tour active trong `tour_ids`, xoá listing của tour
+    không còn active. 1 SELECT + 1 INSERT ... ON CONFLICT + 1 DELETE.
+    """
+    tour_ids = list(tour_ids)
+    if not tour_ids:
+        return 0
+
+    tours = list(
+        Tour.objects.filter(pk__in=tour_ids, is_active=True)
+        .select_related("agency", "thumbnail")
+    )
+    now = timezone.now()
+    if tours:
+        TourListing.objects.bulk_create(
+            [build_listing(tour, now) for tour in tours],
+            update_conflicts=True,
+            unique_fields=["tour"],
+            update_fields=LISTING_SYNC_FIELDS,
+        )
+
+    active_ids = [tour.pk for tour in tours]
+    TourListing.objects.filter(tour__in=tour_ids).exclude(tour__in=active_ids).delete()
+    return len(tours)
+
+
+def refresh_listing_rating(tour):
+    """Chỉ rating / reviews_count đổi (signal review) -> UPDATE thẳng, không đọc lại tour."""
+    return TourListing.objects.filter(tour=tour.pk).update(
+        rating=tour.rating,
+        reviews_count=tour.reviews_count,
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_listing_ratings(tour_ids):
+    """rating / reviews_count của listing lấy thẳng từ tour trong 1 UPDATE (tour được cập nhật bằng F())."""
+    tour = Tour.objects.filter(pk=OuterRef("tour"))
+    return TourListing.objects.filter(tour__in=tour_ids).update(
+        rating=Subquery(tour.values("rating")[:1]),
+        reviews_count=Subquery(tour.values("reviews_count")[:1]),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_agency_listings(agency):
+    """Đổi tên agency -> cập nhật agency_name cho mọi listing của agency."""
+    return TourListing.objects.filter(agency=agency.pk).update(
+        agency_name=agency.agency_name,
+        updated_at=timezone.now(),
+    )
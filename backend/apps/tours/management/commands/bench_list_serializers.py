@@ -0,0 +1,121 @@
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.bookings.models import Booking
+from apps.bookings.serializers import AgencyBookingListFastSerializer
+from apps.customers.models import Customer
+from apps.tours.models import Tour, TourListing
+from apps.tours.serializers import TourListingFastSerializer
+from chat.models import Conversation, Message
+from chat.serializers import ConversationListFastSerializer
+from utils.renderers import UJSONRenderer
+
+User = get_user_model()
+
+
+def _resolve(obj, lookup):
+    for attr in lookup.split("__"):
+        if obj is None:
+            return None
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _listings(n):
+    now = timezone.now()
+    return [
+        TourListing(
+            tour_id=uuid.uuid4(), name=f"Tour Đà Nẵng {i}", description="Biển / núi " * 10,
+            departure_location="Hà Nội", destination="Đà Nẵng", categories=["sea", "family"],
+            adult_price=Decimal("1500000.00"), children_price=Decimal("750000.00"), discount=i % 30,
+            final_adult_price=Decimal("1275000.00"), final_children_price=Decimal("637500.00"),
+            duration_days=3, rating=Decimal("4.50"), reviews_count=i, created_at=now,
+            thumbnail_url=f"https://cdn.example.com/tours/{i}/thumb.png" if i % 2 else "",
+        )
+        for i in range(n)
+    ]
+
+
+def _bookings(n):
+    tour = Tour(tour_id=uuid.uuid4(), name="Tour Hạ Long 3N2Đ")
+    now = timezone.now()
+    return [
+        Booking(
+            booking_id=uuid.uuid4(), tour=tour, booking_date=now, travel_date=date.today(),
+            status=Booking.PENDING, total_price=Decimal("3000000.00"),
+            customer=Customer(user=User(username=f"khach{i}", email=f"khach{i}@example.com")),
+        )
+        for i in range(n)
+    ]
+
+
+def _conversations(n, me):
+    now = timezone.now()
+    rows = []
+    for i in range(n):
+        partner = User(user_id=uuid.uuid4(), username=f"agency{i}", full_name=f"Đại lý {i}",
+                       last_seen=now - timedelta(minutes=i % 5))
+        conv = Conversation(conversation_id=uuid.uuid4(), user1=me, user2=partner, updated_at=now)
+        if i % 10:
+            conv.last_message = Message(message_id=uuid.uuid4(), sender=partner, content="Xin chào",
+                                        created_at=now)
+        conv.unread_count = i % 3
+        rows.append(conv)
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo thời gian serialize + render (ms / 1k dòng) của serializer DRF so với "
+        "fast path (.values() + ujson) cho các list lớn. Không cần DB."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = max(1, options["rows"]), max(1, options["repeat"])
+        me = User(user_id=uuid.uuid4(), username="khach", full_name="Khách")
+        context = {"request": SimpleNamespace(user=me, method="GET", query_params={})}
+
+        cases = (
+            ("PublicTourListView", TourListingFastSerializer, _listings(rows)),
+            ("AgencyBookingListView", AgencyBookingListFastSerializer, _bookings(rows)),
+            ("ConversationListView", ConversationListFastSerializer, _conversations(rows, me)),
+        )
+        for name, fast_class, instances in cases:
+            fast = fast_class(context=context)
+            values = [{c: _resolve(obj, c) for c in fast.lookups} for obj in instances]
+
+            def slow_render():
+                data = fast.serializer_class(instances, many=True, context=context).data
+                return JSONRenderer().render({"data": data})
+
+            def fast_render():
+                return UJSONRenderer().render({"data": fast.serialize(values)})
+
+            if slow_render() != fast_render():
+                raise CommandError(f"{name}: output fast path khác serializer DRF.")
+
+            slow_ms, fast_ms = self._time(slow_render, repeat, rows), self._time(fast_render, repeat, rows)
+            self.stdout.write(
+                f"{name:<24} DRF {slow_ms:8.2f} ms/1k  fast {fast_ms:8.2f} ms/1k  x{slow_ms / fast_ms:.1f}"
+            )
+
+    def _time(self, fn, repeat, rows):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000 * 1000 / rows
@@ -0,0 +1,37 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tours.models import TourThumbnail
+from utils.media import media_url
+
+
+class Command(BaseCommand):
+    help = "So sánh FieldFile.url (storage.url) với utils.media.media_url (µs / URL). Không cần DB."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = max(1, options["rows"]), max(1, options["repeat"])
+        images = [TourThumbnail(thumbnail=f"tours/{uuid.uuid4()}/thumb.png").thumbnail for _ in range(rows)]
+
+        if [i.url for i in images] != [media_url(i) for i in images]:
+            raise CommandError("media_url khác FieldFile.url.")
+
+        storage_us = self._time(lambda: [i.url for i in images], repeat, rows)
+        media_us = self._time(lambda: [media_url(i) for i in images], repeat, rows)
+        self.stdout.write(
+            f"FieldFile.url {storage_us:6.2f} µs  media_url {media_us:6.2f} µs  x{storage_us / media_us:.1f}"
+        )
+
+    def _time(self, fn, repeat, rows):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000 * 1000 / rows
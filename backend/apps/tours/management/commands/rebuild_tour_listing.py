@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.tours.cache import bump_tour_cache
+from apps.tours.listing import refresh_tour_listings
+from apps.tours.models import Tour, TourListing
+
+
+class Command(BaseCommand):
+    help = "Dựng lại toàn bộ read-model TourListing từ Tour (backfill / sửa lệch)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        # listing của tour đã ẩn / không còn tồn tại
+        removed, _ = TourListing.objects.exclude(tour__is_active=True).delete()
+
+        ids = list(Tour.objects.filter(is_active=True).order_by("pk").values_list("pk", flat=True))
+        total = 0
+        for start in range(0, len(ids), batch_size):
+            total += refresh_tour_listings(ids[start:start + batch_size])
+            self.stdout.write(f"  {total}/{len(ids)}")
+
+        bump_tour_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã đồng bộ {total} listing, xoá {removed} listing thừa."
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.tours.models import Tour
+from apps.tours.search import update_search_vector
+
+
+class Command(BaseCommand):
+    help = "Tính lại search_vector cho toàn bộ tour (backfill / sửa lệch)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Chỉ tính cho tour chưa có search_vector.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        qs = Tour.objects.order_by("pk")
+        if options["only_missing"]:
+            qs = qs.filter(search_vector__isnull=True)
+
+        ids = list(qs.values_list("pk", flat=True))
+        total = 0
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            total += update_search_vector(Tour.objects.filter(pk__in=chunk))
+            self.stdout.write(f"  {total}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Đã cập nhật search_vector cho {total} tour."))
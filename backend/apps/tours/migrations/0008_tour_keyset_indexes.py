@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0006_remove_agency_uniq_agency_legal_id_not_null_and_more'),
+        ('tours', '0007_remove_tour_guide'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at', 'tour_id'], name='tour_keyset_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['adult_price', 'tour_id'], name='tour_keyset_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['duration_days', 'tour_id'], name='tour_keyset_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['rating', 'tour_id'], name='tour_keyset_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func
+
+
+def backfill_search_vector(apps, schema_editor):
+    # biểu thức chép cố định tại thời điểm migration (không import apps.tours.search)
+    def weighted(field, weight):
+        return SearchVector(Func(F(field), function='unaccent'), weight=weight, config='simple')
+
+    Tour = apps.get_model('tours', 'Tour')
+    Tour.objects.update(
+        search_vector=weighted('name', 'A') + weighted('destination', 'B') + weighted('description', 'C')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0008_tour_keyset_indexes'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='tour',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='tour_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
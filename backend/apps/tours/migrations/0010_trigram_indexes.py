@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:24
+
+import django.contrib.postgres.indexes
+import utils.postgres
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# unaccent() là STABLE nên không dùng được trong index -> bọc lại thành IMMUTABLE
+CREATE_IMMUTABLE_UNACCENT = """
+CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+"""
+
+DROP_IMMUTABLE_UNACCENT = "DROP FUNCTION IF EXISTS immutable_unaccent(text);"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0009_tour_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(CREATE_IMMUTABLE_UNACCENT, DROP_IMMUTABLE_UNACCENT),
+        migrations.AddIndex(
+            model_name='tour',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(utils.postgres.ImmutableUnaccent('departure_location'), name='gin_trgm_ops'), name='tour_departure_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(utils.postgres.ImmutableUnaccent('destination'), name='gin_trgm_ops'), name='tour_destination_trgm'),
+        ),
+    ]
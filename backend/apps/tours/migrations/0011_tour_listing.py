@@ -0,0 +1,96 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:35
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+import utils.postgres
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def final_price(price, discount):
+    # giá sau giảm, làm tròn 2 chữ số (chép cố định tại thời điểm migration, không import apps.tours)
+    price = Decimal(price or 0)
+    if discount:
+        price = price * (Decimal('100') - Decimal(discount)) / Decimal('100')
+    return price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def backfill_listing(apps, schema_editor):
+    Tour = apps.get_model('tours', 'Tour')
+    TourListing = apps.get_model('tours', 'TourListing')
+    now = timezone.now()
+
+    rows = []
+    tours = Tour.objects.filter(is_active=True).select_related('agency', 'thumbnail')
+    for tour in tours.iterator(chunk_size=1000):
+        thumb = getattr(tour, 'thumbnail', None)
+        rows.append(TourListing(
+            tour=tour,
+            agency=tour.agency,
+            agency_name=tour.agency.agency_name if tour.agency else '',
+            name=tour.name,
+            description=tour.description,
+            departure_location=tour.departure_location,
+            destination=tour.destination,
+            adult_price=tour.adult_price,
+            children_price=tour.children_price,
+            discount=tour.discount,
+            final_adult_price=final_price(tour.adult_price, tour.discount),
+            final_children_price=final_price(tour.children_price, tour.discount),
+            duration_days=tour.duration_days,
+            rating=tour.rating,
+            reviews_count=tour.reviews_count,
+            region=tour.region,
+            categories=tour.categories,
+            thumbnail_url=thumb.thumbnail.url if thumb and thumb.thumbnail else '',
+            search_vector=tour.search_vector,
+            created_at=tour.created_at,
+            updated_at=now,
+        ))
+    TourListing.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0007_trigram_indexes'),
+        ('tours', '0010_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourListing',
+            fields=[
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='tours.tour')),
+                ('agency_name', models.CharField(blank=True, default='', max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, default='')),
+                ('departure_location', models.CharField(max_length=255)),
+                ('destination', models.CharField(max_length=255)),
+                ('adult_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('children_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('final_adult_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('final_children_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('duration_days', models.PositiveSmallIntegerField()),
+                ('rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('reviews_count', models.PositiveIntegerField(default=0)),
+                ('region', models.IntegerField(choices=[(1, 'Miền Bắc'), (2, 'Miền Trung'), (3, 'Miền Nam')])),
+                ('categories', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(choices=[('sea', 'Biển'), ('mountain', 'Núi'), ('resort', 'Nghỉ dưỡng'), ('adventure', 'Khám phá'), ('cultural', 'Văn hoá'), ('history', 'Lịch sử')], max_length=30), blank=True, default=list, size=None)),
+                ('thumbnail_url', models.CharField(blank=True, default='', max_length=1024)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('agency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='agencies.agency')),
+            ],
+            options={
+                'db_table': 'tours_tour_listing',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['region'], name='listing_region_idx'), django.contrib.postgres.indexes.GinIndex(fields=['categories'], name='listing_categories_gin'), django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='listing_search_vector_gin'), django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(utils.postgres.ImmutableUnaccent('departure_location'), name='gin_trgm_ops'), name='listing_departure_trgm'), django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(utils.postgres.ImmutableUnaccent('destination'), name='gin_trgm_ops'), name='listing_destination_trgm'), django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(utils.postgres.ImmutableUnaccent('agency_name'), name='gin_trgm_ops'), name='listing_agency_name_trgm'), models.Index(fields=['created_at', 'tour'], name='listing_keyset_created_idx'), models.Index(fields=['adult_price', 'tour'], name='listing_keyset_price_idx'), models.Index(fields=['duration_days', 'tour'], name='listing_keyset_duration_idx'), models.Index(fields=['rating', 'tour'], name='listing_keyset_rating_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_listing, migrations.RunPython.noop),
+    ]
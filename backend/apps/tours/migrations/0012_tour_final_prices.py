@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:37
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0007_trigram_indexes'),
+        ('tours', '0011_tour_listing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='final_adult_price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('adult_price'), '*', django.db.models.expressions.CombinedExpression(models.Value(Decimal('100')), '-', django.db.models.functions.comparison.Coalesce(models.F('discount'), models.Value(Decimal('0'))))), '/', models.Value(Decimal('100'))), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='final_children_price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('children_price'), '*', django.db.models.expressions.CombinedExpression(models.Value(Decimal('100')), '-', django.db.models.functions.comparison.Coalesce(models.F('discount'), models.Value(Decimal('0'))))), '/', models.Value(Decimal('100'))), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['final_adult_price', 'tour_id'], name='tour_keyset_final_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourlisting',
+            index=models.Index(fields=['final_adult_price', 'tour'], name='listing_keyset_final_price_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0012_tour_final_prices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='tourlisting',
+            name='thumbnail_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='tourthumbnail',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:14
+
+from django.db import migrations, models
+
+
+# rating_sum / reviews_count / rating từ review hiện có (review đã ẩn vẫn tính điểm)
+BACKFILL_RATING = """
+UPDATE tours_tour t
+SET rating_sum = s.total, reviews_count = s.n, rating = ROUND(s.total::numeric / s.n, 2)
+FROM (
+    SELECT b.tour_id, SUM(r.rating) AS total, COUNT(*) AS n
+    FROM reviews_review r JOIN bookings_booking b ON b.booking_id = r.booking_id
+    GROUP BY b.tour_id
+) s
+WHERE t.tour_id = s.tour_id;
+
+UPDATE tours_tour_listing l
+SET rating = t.rating, reviews_count = t.reviews_count
+FROM tours_tour t
+WHERE l.tour_id = t.tour_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+        ('tours', '0013_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(BACKFILL_RATING, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+BACKFILL_STARS = """
+UPDATE tours_tour t
+SET stars_1 = s.s1, stars_2 = s.s2, stars_3 = s.s3, stars_4 = s.s4, stars_5 = s.s5
+FROM (
+    SELECT b.tour_id,
+           COUNT(*) FILTER (WHERE r.rating = 1) AS s1,
+           COUNT(*) FILTER (WHERE r.rating = 2) AS s2,
+           COUNT(*) FILTER (WHERE r.rating = 3) AS s3,
+           COUNT(*) FILTER (WHERE r.rating = 4) AS s4,
+           COUNT(*) FILTER (WHERE r.rating = 5) AS s5
+    FROM reviews_review r JOIN bookings_booking b ON b.booking_id = r.booking_id
+    GROUP BY b.tour_id
+) s
+WHERE t.tour_id = s.tour_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0014_tour_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(BACKFILL_STARS, migrations.RunSQL.noop),
+    ]
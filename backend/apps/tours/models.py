@@ -1,12 +1,27 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models.functions import Coalesce, Round
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
-from django.db.models import Q, CheckConstraint, UniqueConstraint
+from django.contrib.postgres.search import SearchVectorField
+from django.contrib.postgres.indexes import OpClass
+from utils.postgres import ImmutableUnaccent
+from utils.presigned import UploadSpec
+from django.db.models import F, Q, Value, CheckConstraint, UniqueConstraint
 import uuid
 import os
 
 
+def final_price_expression(field):
+    """price * (100 - discount) / 100, làm tròn 2 chữ số (ROUND của Postgres: half away from zero)."""
+    hundred = Value(Decimal("100"))
+    return Round(
+        F(field) * (hundred - Coalesce(F("discount"), Value(Decimal("0")))) / hundred,
+        2,
+    )
+
+
 class Tour(models.Model):
     tour_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
@@ -46,6 +61,18 @@ class Tour(models.Model):
         help_text="Giảm giá theo phần trăm (%)"
     )
 
+    # Giá sau giảm: cột generated STORED do Postgres tính -> filter/sort/tính tiền dùng chung 1 giá trị
+    final_adult_price = models.GeneratedField(
+        expression=final_price_expression("adult_price"),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    final_children_price = models.GeneratedField(
+        expression=final_price_expression("children_price"),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+
     duration_days = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
 
     # Rating 
@@ -55,6 +82,14 @@ class Tour(models.Model):
         default=0
     )
     reviews_count = models.PositiveIntegerField(default=0)
+    # tổng điểm các review: rating = rating_sum / reviews_count, cộng / trừ dần theo review (apps/reviews/rating.py)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # số review theo từng mức sao (histogram), cập nhật cùng lúc với rating_sum
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
 
     # Region
     NORTH, CENTRAL, SOUTH = 1, 2, 3
@@ -84,6 +119,10 @@ class Tour(models.Model):
     services_excluded = models.JSONField(default=list, blank=True)
     policy = models.JSONField(default=dict, blank=True)
 
+    # Full-text search (name > destination > description, đã unaccent)
+    # được cập nhật bởi signal post_save / lệnh rebuild_tour_search
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
     # Visibility 
     is_active = models.BooleanField(default=True)  # true: public/đặt được; false: pause/ẩn
 
@@ -102,6 +141,16 @@ class Tour(models.Model):
             models.Index(fields=['region']),
             models.Index(fields=['created_at']),
             GinIndex(name='tour_categories_gin', fields=['categories']),
+            GinIndex(name='tour_search_vector_gin', fields=['search_vector']),
+            # trigram (không dấu) cho filter departure_location / destination
+            GinIndex(OpClass(ImmutableUnaccent('departure_location'), name='gin_trgm_ops'), name='tour_departure_trgm'),
+            GinIndex(OpClass(ImmutableUnaccent('destination'), name='gin_trgm_ops'), name='tour_destination_trgm'),
+            # keyset pagination: (cột sắp xếp, tour_id) cho tour đang active
+            models.Index(fields=['created_at', 'tour_id'], name='tour_keyset_created_idx', condition=Q(is_active=True)),
+            models.Index(fields=['adult_price', 'tour_id'], name='tour_keyset_price_idx', condition=Q(is_active=True)),
+            models.Index(fields=['final_adult_price', 'tour_id'], name='tour_keyset_final_price_idx', condition=Q(is_active=True)),
+            models.Index(fields=['duration_days', 'tour_id'], name='tour_keyset_duration_idx', condition=Q(is_active=True)),
+            models.Index(fields=['rating', 'tour_id'], name='tour_keyset_rating_idx', condition=Q(is_active=True)),
         ]
         constraints = [
             # Discount must be null or between 0 and 100
@@ -139,6 +188,8 @@ class TourThumbnail(models.Model):
         primary_key=True
     )
     thumbnail = models.ImageField(upload_to=tour_thumbnail_upload_to)
+    # {variant: key} ảnh WebP thu nhỏ (utils.images), rỗng khi chưa sinh xong
+    variants = models.JSONField(default=dict, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -157,6 +208,15 @@ def tour_image_upload_to(instance, filename):
     return f"tours/{tour_id}/images/{unique_name}"
 
 
+# ảnh tour upload thẳng lên S3 (presigned POST)
+TOUR_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+TOUR_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp"]
+TOUR_UPLOADS = {
+    "thumbnail": UploadSpec("thumbnail", TOUR_IMAGE_MAX_SIZE, TOUR_IMAGE_EXTENSIONS),
+    "images": UploadSpec("images", TOUR_IMAGE_MAX_SIZE, TOUR_IMAGE_EXTENSIONS),
+}
+
+
 class TourImage(models.Model):
     img_id = models.BigAutoField(primary_key=True)
     tour = models.ForeignKey(
@@ -165,6 +225,7 @@ class TourImage(models.Model):
         related_name='images'
     )
     image = models.ImageField(upload_to=tour_image_upload_to)
+    variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -173,3 +234,77 @@ class TourImage(models.Model):
 
     def __str__(self):
         return f"Image {self.img_id} for {self.tour.tour_id}"
+
+
+# ===== Read-model danh sách public =====
+
+class TourListing(models.Model):
+    """
+    Bảng phẳng phục vụ danh sách / facets public: 1 dòng / tour đang active,
+    đã có sẵn giá sau giảm, tên agency, thumbnail URL, search_vector
+    => list không cần JOIN agency / thumbnail.
+    Đồng bộ bởi apps.tours.signals, dựng lại toàn bộ: lệnh rebuild_tour_listing.
+    """
+    tour = models.OneToOneField(
+        Tour,
+        on_delete=models.CASCADE,
+        related_name='listing',
+        primary_key=True
+    )
+    agency = models.ForeignKey(
+        'agencies.Agency',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    agency_name = models.CharField(max_length=255, blank=True, default="")
+
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True, default="")
+    departure_location = models.CharField(max_length=255)
+    destination = models.CharField(max_length=255)
+
+    adult_price = models.DecimalField(max_digits=10, decimal_places=2)
+    children_price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    final_adult_price = models.DecimalField(max_digits=10, decimal_places=2)
+    final_children_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    duration_days = models.PositiveSmallIntegerField()
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    region = models.IntegerField(choices=Tour.REGION_CHOICES)
+    categories = ArrayField(
+        models.CharField(max_length=30, choices=Tour.CATEGORY_CHOICES),
+        default=list,
+        blank=True,
+    )
+
+    thumbnail_url = models.CharField(max_length=1024, blank=True, default="")
+    thumbnail_variants = models.JSONField(default=dict, blank=True)   # {variant: URL}
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    created_at = models.DateTimeField()        # = tour.created_at (sắp xếp mặc định)
+    updated_at = models.DateTimeField()        # lần đồng bộ gần nhất (Last-Modified)
+
+    class Meta:
+        db_table = 'tours_tour_listing'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['region'], name='listing_region_idx'),
+            GinIndex(name='listing_categories_gin', fields=['categories']),
+            GinIndex(name='listing_search_vector_gin', fields=['search_vector']),
+            GinIndex(OpClass(ImmutableUnaccent('departure_location'), name='gin_trgm_ops'), name='listing_departure_trgm'),
+            GinIndex(OpClass(ImmutableUnaccent('destination'), name='gin_trgm_ops'), name='listing_destination_trgm'),
+            GinIndex(OpClass(ImmutableUnaccent('agency_name'), name='gin_trgm_ops'), name='listing_agency_name_trgm'),
+            # keyset pagination: (cột sắp xếp, tour_id)
+            models.Index(fields=['created_at', 'tour'], name='listing_keyset_created_idx'),
+            models.Index(fields=['adult_price', 'tour'], name='listing_keyset_price_idx'),
+            models.Index(fields=['final_adult_price', 'tour'], name='listing_keyset_final_price_idx'),
+            models.Index(fields=['duration_days', 'tour'], name='listing_keyset_duration_idx'),
+            models.Index(fields=['rating', 'tour'], name='listing_keyset_rating_idx'),
+        ]
+
+    def __str__(self):
+        return f"Listing {self.tour_id}"
@@ -0,0 +1,174 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class TourKeysetPagination(BasePagination):
+    """
+    Phân trang keyset (cursor) cho danh sách tour.
+
+    - Mỗi trang lọc theo (cột sắp xếp, tour_id) của phần tử cuối trang trước
+      => trang sâu tốn chi phí như trang đầu (không dùng OFFSET).
+    - Cursor là chuỗi base64 opaque, client chỉ việc gửi lại.
+    - Chỉ bật khi request có `cursor` hoặc `page_size` để không phá FE cũ.
+    - Khi có tìm kiếm full-text (annotate `search_rank`) và client không chọn
+      ordering thì mặc định xếp theo độ liên quan.
+    - Dùng được cho Tour và TourListing (cùng tên cột, khoá chính tour_id),
+      phần tử có thể là model instance hoặc dict của .values().
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+
+    page_size = 20
+    max_page_size = 100
+
+    # các cột cho phép sắp xếp (đều NOT NULL), tour_id dùng để phá hoà
+    ordering_fields = ("created_at", "adult_price", "final_adult_price", "duration_days", "rating")
+    default_ordering = "-created_at"
+    rank_field = "search_rank"
+    tiebreaker = "tour_id"
+
+    invalid_cursor_message = "Cursor không hợp lệ."
+
+    def is_enabled(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_enabled(request):
+            return None
+
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset)
+        field, descending = self._split(self.ordering)
+
+        position, reverse = self.decode_cursor(request)
+
+        # Trang trước = đi ngược chiều sắp xếp rồi đảo lại kết quả
+        query_desc = descending != reverse
+        if position is not None:
+            value, tour_id = position
+            if query_desc:
+                queryset = queryset.filter(**{f"{field}__lte": value}).filter(
+                    Q(**{f"{field}__lt": value})
+                    | Q(**{field: value, f"{self.tiebreaker}__lt": tour_id})
+                )
+            else:
+                queryset = queryset.filter(**{f"{field}__gte": value}).filter(
+                    Q(**{f"{field}__gt": value})
+                    | Q(**{field: value, f"{self.tiebreaker}__gt": tour_id})
+                )
+
+        prefix = "-" if query_desc else ""
+        queryset = queryset.order_by(f"{prefix}{field}", f"{prefix}{self.tiebreaker}")
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def empty_page(self, request):
+        """Trang rỗng khi đã biết không có phần tử nào: không query, cùng shape response với trang thường."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.page, self.has_next, self.has_previous = [], False, False
+        return self.page
+
+    # ---- helpers ----
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        try:
+            size = int(raw)
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, queryset):
+        raw = (request.query_params.get(self.ordering_query_param) or "").strip()
+        if raw.lstrip("-") in self.ordering_fields:
+            return raw
+        if self.rank_field in queryset.query.annotations:
+            return f"-{self.rank_field}"
+        return self.default_ordering
+
+    def _to_python(self, field, raw):
+        if field == self.rank_field:
+            return float(raw)
+        return self.model._meta.get_field(field).to_python(raw)
+
+    def _split(self, ordering):
+        return ordering.lstrip("-"), ordering.startswith("-")
+
+    def _get(self, obj, field):
+        return obj[field] if isinstance(obj, dict) else getattr(obj, field)
+
+    def encode_cursor(self, obj, reverse):
+        field, _ = self._split(self.ordering)
+        value = self._get(obj, field)
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        elif not isinstance(value, float):
+            value = str(value)  # Decimal/int giữ nguyên độ chính xác
+        payload = {
+            "o": self.ordering,
+            "v": value,
+            "id": str(self._get(obj, self.tiebreaker)),
+            "r": int(reverse),
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if payload["o"] != self.ordering:
+                raise ValueError("ordering mismatch")
+            field, _ = self._split(self.ordering)
+            value = self._to_python(field, payload["v"])
+            tour_id = self.model._meta.get_field(self.tiebreaker).to_python(payload["id"])
+            reverse = bool(payload.get("r"))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+        return (value, tour_id), reverse
+
+    def get_cursor_payload(self):
+        next_cursor = None
+        prev_cursor = None
+        if self.page:
+            if self.has_next:
+                next_cursor = self.encode_cursor(self.page[-1], reverse=False)
+            if self.has_previous:
+                prev_cursor = self.encode_cursor(self.page[0], reverse=True)
+        return {
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+            "page_size": self.page_size,
+        }
+
+    def get_paginated_response(self, data):
+        return Response({"data": data, **self.get_cursor_payload()})
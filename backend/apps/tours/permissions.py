@@ -29,18 +29,12 @@
 
 from rest_framework import permissions
 
+from apps.users.profiles import request_profiles
 
-def get_agency_profile(user):
-    """
-    Trả về agency_profile nếu có, nếu không có thì None.
-    Tránh hasattr() vì OneToOne reverse có thể raise RelatedObjectDoesNotExist.
-    """
-    if not user or not user.is_authenticated:
-        return None
-    try:
-        return user.agency_profile
-    except Exception:
-        return None
+
+def get_agency_id(request):
+    """agency_id của user đang gọi API (None nếu chưa đăng ký agency), dùng chung resolver của request."""
+    return request_profiles(request).agency_id
 
 
 class IsAgencyOwnerOrReadOnly(permissions.BasePermission):
@@ -49,7 +43,7 @@ class IsAgencyOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         if request.method == "POST":
-            return get_agency_profile(request.user) is not None
+            return get_agency_id(request) is not None
 
         return True
 
@@ -57,20 +51,19 @@ class IsAgencyOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        agency = get_agency_profile(request.user)
-        if agency is None:
+        agency_id = get_agency_id(request)
+        if agency_id is None:
             return False
 
         # tour.agency có thể null do SET_NULL
-        if not obj.agency:
+        if not obj.agency_id:
             return False
 
-        # so sánh bằng agency_id cho chắc (đỡ phụ thuộc user_id field)
-        return str(obj.agency.agency_id) == str(agency.agency_id)
+        return obj.agency_id == agency_id
 
 
 class IsAgencyUser(permissions.BasePermission):
     message = "Bạn chưa đăng ký agency."
 
     def has_permission(self, request, view):
-        return get_agency_profile(request.user) is not None
+        return get_agency_id(request) is not None
@@ -0,0 +1,75 @@
+import re
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+from utils.postgres import ILike, ImmutableUnaccent, Unaccent, like_contains_pattern
+
+# "simple" config: không stem, chỉ lowercase (phù hợp tiếng Việt đã bỏ dấu)
+SEARCH_CONFIG = "simple"
+
+# các cột ảnh hưởng tới search_vector (dùng để bỏ qua save không liên quan)
+SEARCH_FIELDS = ("name", "destination", "description")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tour_search_vector():
+    """
+    Vector có trọng số: name (A) > destination (B) > description (C).
+    Text được unaccent trước khi to_tsvector nên tìm có dấu/không dấu đều ra.
+    """
+    return (
+        SearchVector(Unaccent(F("name")), weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Unaccent(F("destination")), weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Unaccent(F("description")), weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def build_search_query(q):
+    """
+    Chuyển chuỗi người dùng nhập thành tsquery dạng prefix: "da nan" -> "da:* & nan:*".
+    Chỉ giữ ký tự chữ/số nên không lo lỗi cú pháp tsquery. Trả None nếu rỗng.
+    """
+    tokens = _TOKEN_RE.findall(q or "")
+    if not tokens:
+        return None
+    raw = " & ".join(f"{t}:*" for t in tokens)
+    return SearchQuery(Unaccent(Value(raw)), config=SEARCH_CONFIG, search_type="raw")
+
+
+def search_tours(queryset, q):
+    """
+    Lọc theo search_vector (GIN index) và annotate `search_rank` (ts_rank).
+    Không có token hợp lệ -> trả nguyên queryset.
+    """
+    query = build_search_query(q)
+    if query is None:
+        return queryset
+    # ts_rank trả real; ép double để giá trị trong cursor so sánh lại khớp đúng (không lặp dòng giữa 2 trang)
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
+
+
+def update_search_vector(queryset):
+    """Tính lại search_vector bằng 1 câu UPDATE cho cả queryset."""
+    return queryset.update(search_vector=tour_search_vector())
+
+
+MATCH_CONTAINS = "contains"
+MATCH_FUZZY = "fuzzy"
+
+
+def match_text(queryset, field, value, mode=MATCH_CONTAINS):
+    """
+    Lọc cột text không phân biệt dấu, dùng GIN trigram index trên immutable_unaccent(cột).
+    - contains: unaccent(cột) ILIKE %unaccent(value)%
+    - fuzzy: unaccent(cột) %> unaccent(value) (word_similarity >= pg_trgm.word_similarity_threshold)
+    """
+    lhs = ImmutableUnaccent(F(field))
+    if mode == MATCH_FUZZY:
+        return queryset.filter(TrigramWordSimilar(lhs, ImmutableUnaccent(Value(value))))
+    return queryset.filter(ILike(lhs, ImmutableUnaccent(Value(like_contains_pattern(value)))))
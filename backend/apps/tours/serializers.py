@@ -1,13 +1,33 @@
 from rest_framework import serializers
-from .models import Tour, TourImage, TourThumbnail
-import os, uuid, json
-from django.core.files.base import ContentFile
+from .models import TOUR_UPLOADS, Tour, TourImage, TourListing, TourThumbnail
+import json
+from contextlib import contextmanager
+from django.db import transaction
+from .cache import bump_tour_cache
+from .variants import schedule_tour_variants
+from utils.fieldsets import SparseFieldsetMixin
+from utils.fastpath import FastRowSerializer
+from utils.images import variant_urls
+from utils.media import MediaURLField, media_url
+from utils.presigned import StagedUploadField, promote_uploads
+from utils.uploads import delete_files, upload_files
+from apps.users.profiles import request_profiles
+
+
+def _upload_name(f):
+    return getattr(f, "name", None) or "upload"
 
 
 class TourImageSerializer(serializers.ModelSerializer):
+    image = MediaURLField(read_only=True)
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = TourImage
-        fields = ["img_id", "image"]
+        fields = ["img_id", "image", "variants"]
+
+    def get_variants(self, obj):
+        return variant_urls(obj.variants)
 
 class TourThumbnailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,7 +35,13 @@ class TourThumbnailSerializer(serializers.ModelSerializer):
         fields = ["thumbnail"]
 
 
-class TourSerializer(serializers.ModelSerializer):
+class TourSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    sparse_required_fields = ("tour_id",)
+    field_sources = {
+        "thumbnail_url": ("thumbnail__thumbnail",),
+        "thumbnail_variants": ("thumbnail__variants",),
+    }
+
     # agency infor
     agency_id = serializers.UUIDField(source="agency.agency_id", read_only=True)
     agency_name = serializers.CharField(source="agency.agency_name", read_only=True)
@@ -26,9 +52,15 @@ class TourSerializer(serializers.ModelSerializer):
     # upload
     thumbnail = serializers.ImageField(write_only=True, required=False)
     images = serializers.ListField(child=serializers.ImageField(), write_only=True, required=False)
+    # hoặc key file đã upload thẳng lên S3 (presigned POST, xem TourUploadPresignView)
+    thumbnail_key = StagedUploadField(TOUR_UPLOADS["thumbnail"], write_only=True, required=False)
+    image_keys = serializers.ListField(
+        child=StagedUploadField(TOUR_UPLOADS["images"]), write_only=True, required=False
+    )
 
     # urls
     thumbnail_url = serializers.SerializerMethodField(read_only=True)
+    thumbnail_variants = serializers.SerializerMethodField(read_only=True)
     image_urls = TourImageSerializer(source="images", many=True, read_only=True)
 
     # JSONFIELD
@@ -53,69 +85,111 @@ class TourSerializer(serializers.ModelSerializer):
             "itinerary", "transportation",
             "services_included", "services_excluded", "policy",
             "is_active", "created_at", "updated_at",
-            "thumbnail", "thumbnail_url",
-            "images", "image_urls",
+            "thumbnail", "thumbnail_key", "thumbnail_url", "thumbnail_variants",
+            "images", "image_keys", "image_urls",
         ]
 
         read_only_fields = [
             "tour_id", "agency_id", "agency_name", "email_agency", "hotline",
-            "created_at", "updated_at", "rating", "reviews_count", "thumbnail_url", "image_urls"
+            "created_at", "updated_at", "rating", "reviews_count", "thumbnail_url", "thumbnail_variants", "image_urls"
         ]
 
     def get_thumbnail_url(self, obj):
         thumb = getattr(obj, "thumbnail", None)
         if not thumb:
             return None
-        f = getattr(thumb, "thumbnail", None)
-        return getattr(f, "url", None)
+        return media_url(getattr(thumb, "thumbnail", None))
+
+    def get_thumbnail_variants(self, obj):
+        thumb = getattr(obj, "thumbnail", None)
+        return variant_urls(thumb.variants) if thumb else {}
 
     # IMAGE SAVE
-    def _save_gallery_image(self, instance, f):
+    @contextmanager
+    def _uploaded_media(self, instance, thumbnail, images, staged_thumbnail=None, staged_images=()):
+        """
+        Upload song song thumbnail + gallery (stream thẳng file lên storage), file đã upload
+        thẳng lên S3 thì copy từ vùng tạm sang key chính thức. Yield (key thumbnail, [TourImage chưa lưu]).
+        Khối bên trong lỗi -> xoá các file vừa upload / copy; thành công -> xoá bản trong vùng tạm.
+        """
+        image_field = TourImage._meta.get_field("image")
+        thumb_field = TourThumbnail._meta.get_field("thumbnail")
+        storage = image_field.storage
+        gallery = [TourImage(tour=instance) for _ in range(len(images) + len(staged_images))]
+
+        def thumb_name(name):
+            return thumb_field.generate_filename(TourThumbnail(tour=instance), name)
+
+        jobs = [(image_field.generate_filename(ti, _upload_name(f)), f) for ti, f in zip(gallery, images)]
+        if thumbnail:
+            jobs.append((thumb_name(_upload_name(thumbnail)), thumbnail))
+        keys = upload_files(jobs, storage=storage)
+
+        staged = [
+            (upload, image_field.generate_filename(ti, upload.filename))
+            for ti, upload in zip(gallery[len(images):], staged_images)
+        ]
+        if staged_thumbnail:
+            staged.append((staged_thumbnail, thumb_name(staged_thumbnail.filename)))
         try:
-            f.seek(0)
-        except Exception:
-            pass
-        _, ext = os.path.splitext(getattr(f, "name", "upload"))
-        safe_name = f"{uuid.uuid4().hex}{ext}"
-        data = f.read()
-        ti = TourImage(tour=instance)
-        ti.image.save(safe_name, ContentFile(data), save=True)
-    
-    def _save_thumbnail(self, instance, f):
+            promoted = promote_uploads(staged, storage=storage)
+        except BaseException:
+            delete_files(keys, storage=storage)
+            raise
+
+        # thứ tự: gallery (file, rồi key) + thumbnail
+        gallery_keys = keys[:len(images)] + promoted[:len(staged_images)]
+        for ti, key in zip(gallery, gallery_keys):
+            ti.image = key
+        thumbnail_key = keys[-1] if thumbnail else (promoted[-1] if staged_thumbnail else None)
         try:
-            f.seek(0)
-        except Exception:
-            pass
-        _, ext = os.path.splitext(getattr(f, "name", "upload"))
-        safe_name = f"{uuid.uuid4().hex}{ext}"
-        data = f.read()
-
-        thumb, _ = TourThumbnail.objects.get_or_create(tour=instance)
-        thumb.thumbnail.save(safe_name, ContentFile(data), save=True)
+            yield thumbnail_key, gallery
+        except BaseException:
+            delete_files(keys + promoted, storage=storage)
+            raise
+        delete_files([upload.key for upload, _ in staged], storage=storage)
+
+    def _save_media(self, instance, thumbnail_key, gallery):
+        if thumbnail_key:
+            # ảnh mới -> variant cũ không còn đúng, sinh lại sau commit
+            TourThumbnail.objects.update_or_create(
+                tour=instance, defaults={"thumbnail": thumbnail_key, "variants": {}}
+            )
+        if gallery:
+            TourImage.objects.bulk_create(gallery)
+        schedule_tour_variants(
+            thumbnail_tour_id=instance.tour_id if thumbnail_key else None,
+            image_ids=[ti.img_id for ti in gallery],
+        )
 
     def create(self, validated_data):
         images = validated_data.pop("images", [])
         thumbnail = validated_data.pop("thumbnail", None)
-        tour = Tour.objects.create(**validated_data)
-        if thumbnail:
-            self._save_thumbnail(tour, thumbnail)
-
-        for f in images:
-            self._save_gallery_image(tour, f)
+        staged_thumbnail = validated_data.pop("thumbnail_key", None)
+        staged_images = validated_data.pop("image_keys", [])
+        # tour_id có sẵn trước khi lưu -> upload trước, không giữ transaction trong lúc chờ S3
+        tour = Tour(**validated_data)
+        media = self._uploaded_media(tour, thumbnail, images, staged_thumbnail, staged_images)
+        with media as (thumbnail_key, gallery):
+            with transaction.atomic():
+                tour.save(force_insert=True)
+                self._save_media(tour, thumbnail_key, gallery)
+        bump_tour_cache(tour.tour_id)
         return tour
 
     def update(self, instance, validated_data):
         images = validated_data.pop("images", None)
         thumbnail = validated_data.pop("thumbnail", None)
+        staged_thumbnail = validated_data.pop("thumbnail_key", None)
+        staged_images = validated_data.pop("image_keys", None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
-        if thumbnail:
-            self._save_thumbnail(instance, thumbnail)
-
-        if images:
-            for f in images:
-                self._save_gallery_image(instance, f)
+        media = self._uploaded_media(instance, thumbnail, images or [], staged_thumbnail, staged_images or [])
+        with media as (thumbnail_key, gallery):
+            with transaction.atomic():
+                instance.save()
+                self._save_media(instance, thumbnail_key, gallery)
+        bump_tour_cache(instance.tour_id)
         return instance
 
 
@@ -157,6 +231,9 @@ class TourSerializer(serializers.ModelSerializer):
 
 
     def validate(self, attrs):
+        if attrs.get("thumbnail") and attrs.get("thumbnail_key"):
+            raise serializers.ValidationError({"thumbnail_key": "Chỉ gửi thumbnail hoặc thumbnail_key."})
+
         # Parse JSON strings → objects
         json_fields = [
             "itinerary", "transportation",
@@ -232,9 +309,9 @@ class TourSerializer(serializers.ModelSerializer):
 
         # Check trùng tour trong agency
         request = self.context.get("request")
-        agency = getattr(getattr(request, "user", None), "agency_profile", None)
+        agency_id = request_profiles(request).agency_id if request is not None else None
 
-        if agency:
+        if agency_id:
             name = attrs.get("name")
             dep = attrs.get("departure_location")
             dest = attrs.get("destination")
@@ -242,7 +319,7 @@ class TourSerializer(serializers.ModelSerializer):
 
             if all([name, dep, dest, duration]):
                 dup_qs = Tour.objects.filter(
-                    agency=agency,
+                    agency_id=agency_id,
                     name__iexact=name,
                     departure_location__iexact=dep,
                     destination__iexact=dest,
@@ -259,9 +336,16 @@ class TourSerializer(serializers.ModelSerializer):
 
 
 
-class TourListItemSerializer(serializers.ModelSerializer):
+class TourListItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    sparse_required_fields = ("tour_id",)
+    field_sources = {
+        "thumbnail_url": ("thumbnail__thumbnail",),
+        "thumbnail_variants": ("thumbnail__variants",),
+    }
+
     categories = serializers.ListField(child=serializers.CharField(), read_only=True)
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Tour
@@ -279,6 +363,7 @@ class TourListItemSerializer(serializers.ModelSerializer):
             "rating",
             "reviews_count",
             "thumbnail_url",
+            "thumbnail_variants",
             "is_active",
         ]
 
@@ -286,15 +371,32 @@ class TourListItemSerializer(serializers.ModelSerializer):
         thumb = getattr(obj, "thumbnail", None)
         if not thumb:
             return None
-        return getattr(getattr(thumb, "thumbnail", None), "url", None)
+        return media_url(getattr(thumb, "thumbnail", None))
+
+    def get_thumbnail_variants(self, obj):
+        thumb = getattr(obj, "thumbnail", None)
+        return variant_urls(thumb.variants) if thumb else {}
 
 
-class TourPublicListSerializer(serializers.ModelSerializer):
+# Danh sách public đọc từ read-model TourListing (giá sau giảm, tên agency, thumbnail URL có sẵn, không JOIN)
+class TourListingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    sparse_required_fields = ("tour_id",)
+    field_sources = {"thumbnail_url": ("thumbnail_url",), "is_active": ()}
+
+    tour_id = serializers.UUIDField(read_only=True)
     categories = serializers.ListField(child=serializers.CharField(), read_only=True)
+    final_adult_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True
+    )
+    final_children_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True
+    )
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_variants = serializers.JSONField(read_only=True)
+    is_active = serializers.SerializerMethodField()
 
     class Meta:
-        model = Tour
+        model = TourListing
         fields = [
             "tour_id",
             "name",
@@ -303,34 +405,60 @@ class TourPublicListSerializer(serializers.ModelSerializer):
             "adult_price",
             "children_price",
             "discount",
+            "final_adult_price",
+            "final_children_price",
             "duration_days",
             "departure_location",
             "destination",
             "rating",
             "reviews_count",
             "thumbnail_url",
-            "is_active",  
+            "thumbnail_variants",
+            "is_active",
         ]
         read_only_fields = fields
 
     def get_thumbnail_url(self, obj):
-        thumb = getattr(obj, "thumbnail", None)
-        if not thumb:
-            return None
-        return getattr(getattr(thumb, "thumbnail", None), "url", None)
+        return obj.thumbnail_url or None
+
+    def get_is_active(self, obj):
+        # listing chỉ chứa tour đang active
+        return True
+
 
+class TourListingFastSerializer(FastRowSerializer):
+    """TourListingSerializer bản đọc .values() cho PublicTourListView."""
+    serializer_class = TourListingSerializer
+    computed = {
+        "thumbnail_url": (("thumbnail_url",), lambda context, url: url or None),
+        "is_active": ((), lambda context: True),
+    }
+
+
+class TourPublicDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    sparse_required_fields = ("tour_id",)
+    field_sources = {
+        "thumbnail_url": ("thumbnail__thumbnail",),
+        "thumbnail_variants": ("thumbnail__variants",),
+        "agency_user_id": ("agency__user",),
+    }
 
-class TourPublicDetailSerializer(serializers.ModelSerializer):
     agency_id = serializers.UUIDField(source="agency.agency_id", read_only=True)
     agency_name = serializers.CharField(source="agency.agency_name", read_only=True)
     email_agency = serializers.EmailField(source="agency.email_agency", read_only=True)
     hotline = serializers.CharField(source="agency.hotline", read_only=True)
 
     thumbnail_url = serializers.SerializerMethodField()
+    thumbnail_variants = serializers.SerializerMethodField()
     image_urls = TourImageSerializer(source="images", many=True, read_only=True)
 
-    final_adult_price = serializers.SerializerMethodField()
-    final_children_price = serializers.SerializerMethodField()
+    # cột generated trong DB; giữ kiểu số trong JSON như trước
+    final_adult_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True
+    )
+    final_children_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True
+    )
     agency_user_id = serializers.SerializerMethodField()
 
     class Meta:
@@ -349,6 +477,7 @@ class TourPublicDetailSerializer(serializers.ModelSerializer):
             "services_included", "services_excluded", "policy",
             "is_active", "created_at", "updated_at",
             "thumbnail_url",
+            "thumbnail_variants",
             "image_urls",
         ]
         read_only_fields = fields
@@ -357,28 +486,19 @@ class TourPublicDetailSerializer(serializers.ModelSerializer):
         thumb = getattr(obj, "thumbnail", None)
         if not thumb:
             return None
-        return getattr(getattr(thumb, "thumbnail", None), "url", None)
+        return media_url(getattr(thumb, "thumbnail", None))
 
- 
-    # TÍNH GIÁ SAU GIẢM
-    def get_final_adult_price(self, obj):
-        if obj.discount:
-            return float(obj.adult_price) * (100 - float(obj.discount)) / 100
-        return float(obj.adult_price)
+    def get_thumbnail_variants(self, obj):
+        thumb = getattr(obj, "thumbnail", None)
+        return variant_urls(thumb.variants) if thumb else {}
 
-    def get_final_children_price(self, obj):
-        if obj.discount:
-            return float(obj.children_price) * (100 - float(obj.discount)) / 100
-        return float(obj.children_price)
 
     def get_agency_user_id(self, obj):
         agency = getattr(obj, "agency", None)
         if not agency:
             return None
-        user = getattr(agency, "user", None)
-        if not user:
-            return None
-        return getattr(user, "user_id", getattr(user, "pk", None))
+        # đọc FK trực tiếp, không cần query bảng user
+        return agency.user_id
 
 
 
@@ -0,0 +1,75 @@
+# signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from apps.agencies.models import Agency
+from .cache import bump_tours_cache
+from .listing import refresh_agency_listings, refresh_listing_rating, refresh_tour_listings
+from .models import Tour, TourListing, TourThumbnail
+from .search import SEARCH_FIELDS, update_search_vector
+import logging
+
+logger = logging.getLogger(__name__)
+
+# save chỉ đụng các cột này (signal review) -> cập nhật listing rẻ hơn
+RATING_FIELDS = {"rating", "reviews_count", "rating_sum"}
+
+
+@receiver(post_save, sender=Tour)
+def refresh_tour_search_vector(sender, instance, update_fields=None, **kwargs):
+    # bỏ qua save chỉ đụng cột khác (vd: rating, reviews_count)
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    try:
+        update_search_vector(Tour.objects.filter(pk=instance.pk))
+    except Exception:
+        logger.exception("refresh_tour_search_vector failed for tour %s", instance.pk)
+
+
+# ===== Read-model TourListing =====
+# (đăng ký sau refresh_tour_search_vector để đọc được search_vector mới)
+
+@receiver(post_save, sender=Tour)
+def sync_tour_listing(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and set(update_fields) <= RATING_FIELDS:
+        refresh_listing_rating(instance)
+    else:
+        refresh_tour_listings([instance.pk])
+
+
+@receiver(post_save, sender=TourThumbnail)
+def sync_listing_thumbnail(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_tour_listings([instance.tour_id])
+
+
+@receiver(post_delete, sender=TourThumbnail)
+def clear_listing_thumbnail(sender, instance, origin=None, **kwargs):
+    # xoá kèm theo tour (cascade) -> listing cũng bị xoá, không upsert lại
+    if getattr(origin, "model", type(origin)) is not TourThumbnail:
+        return
+    refresh_tour_listings([instance.tour_id])
+
+
+@receiver(post_save, sender=Agency)
+def sync_agency_listings(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    # so với giá trị lúc load (Agency.from_db): không đổi field nào hiện ở tour -> bỏ qua
+    old = getattr(instance, "_db_tour_detail", None)
+    current = {name: getattr(instance, name) for name in Agency.TOUR_DETAIL_FIELDS}
+    instance._db_tour_detail = current
+    if old == current:
+        return
+    if old is None or old.get("agency_name") != current["agency_name"]:
+        refresh_agency_listings(instance)
+    # chi tiết tour cache theo version từng tour -> bump mọi tour của agency (cả tour đang ẩn)
+    bump_tours_cache(Tour.objects.filter(agency=instance.pk).values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Agency)
+def clear_agency_listings(sender, instance, **kwargs):
+    # FK listing.agency là SET_NULL, tên agency cũng phải xoá theo
+    TourListing.objects.filter(agency=instance.pk).update(agency_name="")
@@ -1,3 +1,946 @@
-from django.test import TestCase
+import io
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import boto3
+import requests
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import InMemoryStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.agencies.models import Agency
+from apps.jobs.queue import run_pending
+from .models import Tour, TourImage, TourListing, TourThumbnail
+from .cache import public_detail_key, tour_version
+from .filters import normalize_filter_params
+from .pagination import TourKeysetPagination
+from .search import MATCH_CONTAINS, MATCH_FUZZY, match_text
+from utils.images import VARIANT_SIZES, build_variants, render_variants
+from utils.media import MediaURLField, media_url
+from utils.renderers import UJSONRenderer
+
+try:
+    from moto import mock_aws
+except ImportError:   # moto chỉ cần cho test upload thẳng lên S3
+    mock_aws = None
+
+User = get_user_model()
+
+
+def make_agency(username="agency", **kwargs):
+    user = make_user(username)
+    defaults = {
+        "agency_name": "Du Lịch Việt",
+        "license_number": f"LIC-{username}",
+        "legal_representative_name": "Nguyễn Văn A",
+        "legal_id_number": f"ID-{username}",
+        "legal_id_front": "agencies/x/front.png",
+        "legal_id_back": "agencies/x/back.png",
+        "bank_name": "VCB",
+        "bank_account_number": "0123456789",
+        "bank_account_holder": "NGUYEN VAN A",
+        "status": "approved",
+        "verified": True,
+    }
+    defaults.update(kwargs)
+    return Agency.objects.create(user=user, **defaults)
+
+
+def make_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="x", **kwargs
+    )
+
+
+def auth_client(user=None):
+    # đi qua JWTAuthentication thật để budget tính cả query load user
+    client = APIClient()
+    if user is not None:
+        token = AccessToken.for_user(user)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+def make_tour(agency=None, **kwargs):
+    defaults = {
+        "name": "Tour biển",
+        "departure_location": "Hà Nội",
+        "destination": "Đà Nẵng",
+        "adult_price": 1000000,
+        "children_price": 500000,
+        "duration_days": 3,
+        "region": Tour.CENTRAL,
+        "categories": ["sea"],
+    }
+    defaults.update(kwargs)
+    return Tour.objects.create(agency=agency, **defaults)
+
+
+def make_tour_with_media(agency, images=2, **kwargs):
+    tour = make_tour(agency, **kwargs)
+    TourThumbnail.objects.create(tour=tour, thumbnail=f"tours/{tour.tour_id}/thumb.png")
+    for i in range(images):
+        TourImage.objects.create(tour=tour, image=f"tours/{tour.tour_id}/img-{i}.png")
+    return tour
+
+
+def fast_and_slow(client, url, params=None):
+    """Body của cùng request khi bật / tắt fast path (FAST_LIST_SERIALIZERS)."""
+    bodies = []
+    for enabled in (True, False):
+        cache.clear()
+        with override_settings(FAST_LIST_SERIALIZERS=enabled):
+            res = client.get(url, params or {})
+        bodies.append(res.content)
+    return bodies
+
+
+class TrigramLocationMatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency(agency_name="Công ty Đà Lạt Xanh")
+        cls.danang = make_tour(cls.agency, name="Đà Nẵng - Hội An", destination="Đà Nẵng")
+        cls.hanoi = make_tour(
+            cls.agency, name="Sapa", departure_location="Đà Nẵng", destination="Lào Cai"
+        )
+
+    def _explain(self, qs):
+        # bảng nhỏ -> planner thích seq scan; tắt đi để kiểm tra index có dùng được
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        try:
+            return qs.explain()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+
+    def test_contains_is_accent_insensitive(self):
+        qs = match_text(Tour.objects.all(), "destination", "da nang", MATCH_CONTAINS)
+        self.assertEqual(list(qs), [self.danang])
+
+    def test_fuzzy_matches_without_diacritics(self):
+        qs = match_text(Tour.objects.all(), "destination", "Da Nang", MATCH_FUZZY)
+        self.assertIn(self.danang, qs)
+        self.assertNotIn(self.hanoi, qs)
+
+    def test_like_wildcards_are_escaped(self):
+        qs = match_text(Tour.objects.all(), "destination", "%", MATCH_CONTAINS)
+        self.assertFalse(qs.exists())
+
+    def test_destination_uses_trigram_index(self):
+        for mode in (MATCH_CONTAINS, MATCH_FUZZY):
+            plan = self._explain(match_text(Tour.objects.all(), "destination", "Da Nang", mode))
+            self.assertIn("tour_destination_trgm", plan)
+
+    def test_departure_location_uses_trigram_index(self):
+        for mode in (MATCH_CONTAINS, MATCH_FUZZY):
+            plan = self._explain(
+                match_text(Tour.objects.all(), "departure_location", "Da Nang", mode)
+            )
+            self.assertIn("tour_departure_trgm", plan)
+
+    def test_agency_name_uses_trigram_index(self):
+        for mode in (MATCH_CONTAINS, MATCH_FUZZY):
+            plan = self._explain(match_text(Agency.objects.all(), "agency_name", "Da Lat", mode))
+            self.assertIn("agency_name_trgm", plan)
+
+
+class TourSearchRankTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = make_agency()
+        # "Hạ Long" ở tên (A) > điểm đến (B) > mô tả (C); tạo theo thứ tự ngược để created_at không quyết định
+        cls.in_description = make_tour(agency, name="Tour biển", description="Ghé vịnh Hạ Long 1 ngày")
+        cls.in_destination = make_tour(agency, name="Tour đảo", destination="Hạ Long")
+        cls.in_name = make_tour(agency, name="Hạ Long 3 ngày")
+        make_tour(agency, name="Sapa", destination="Lào Cai")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ranked_by_weight_without_diacritics(self):
+        for q in ("ha long", "Hạ Long", "ha lo"):
+            res = auth_client().get(reverse("tour_public_list"), {"q": q})
+            self.assertEqual(
+                [str(row["tour_id"]) for row in res.data["data"]],
+                [str(t.tour_id) for t in (self.in_name, self.in_destination, self.in_description)],
+                q,
+            )
+
+    def test_rank_ordering_paginated(self):
+        params = {"q": "ha long", "page_size": 2}
+        first = auth_client().get(reverse("tour_public_list"), params)
+        rest = auth_client().get(reverse("tour_public_list"), {**params, "cursor": first.data["next_cursor"]})
+        self.assertEqual(
+            [str(row["tour_id"]) for row in first.data["data"] + rest.data["data"]],
+            [str(t.tour_id) for t in (self.in_name, self.in_destination, self.in_description)],
+        )
+
+
+class TourQueryBudgetTests(TestCase):
+    """
+    Số query cố định cho mỗi endpoint đọc, không phụ thuộc số tour/ảnh
+    (fixture có nhiều tour, mỗi tour nhiều ảnh để lộ N+1).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+        cls.tours = [
+            make_tour_with_media(cls.agency, name=f"Tour {i}", duration_days=i + 1)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.anon = auth_client()
+        self.owner = auth_client(self.agency.user)
+
+    def test_public_list(self):
+        # validators (count + max updated_at) + tour JOIN thumbnail
+        with self.assertNumQueries(2):
+            res = self.anon.get(reverse("tour_public_list"))
+        self.assertEqual(len(res.data["data"]), 3)
+
+    def test_public_list_paginated(self):
+        with self.assertNumQueries(2):
+            res = self.anon.get(reverse("tour_public_list"), {"page_size": 2})
+        self.assertEqual(len(res.data["data"]), 2)
+
+    def test_public_list_reads_flat_listing(self):
+        with self.assertNumQueries(2) as ctx:
+            self.anon.get(reverse("tour_public_list"), {"agency": "du lich"})
+        sql = ctx.captured_queries[-1]["sql"]
+        self.assertIn("tours_tour_listing", sql)
+        for token in ("JOIN", "search_vector"):
+            self.assertNotIn(token, sql)
+
+    def test_public_list_cached(self):
+        self.anon.get(reverse("tour_public_list"))
+        with self.assertNumQueries(0):
+            self.anon.get(reverse("tour_public_list"))
+
+    def test_public_list_etag_only(self):
+        url = reverse("tour_public_list")
+        res = self.anon.get(url)
+        # MAX(updated_at) không đổi khi xoá tour / đổi rating -> không gửi Last-Modified
+        self.assertNotIn("Last-Modified", res)
+        self.assertEqual(self.anon.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code, 200)
+        self.assertEqual(self.anon.get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 304)
+
+    def test_public_detail(self):
+        url = reverse("tour_detail_customer", args=[self.tours[0].tour_id])
+        # validators + tour JOIN agency/thumbnail + prefetch images
+        with self.assertNumQueries(3):
+            res = self.anon.get(url)
+        self.assertEqual(len(res.data["data"]["image_urls"]), 2)
+        self.assertEqual(res.data["data"]["agency_user_id"], self.agency.user_id)
+
+    def test_public_facets(self):
+        with self.assertNumQueries(1):
+            self.anon.get(reverse("tour_public_facets"))
+
+    def test_list_create_get(self):
+        # tour JOIN agency/thumbnail + prefetch images
+        with self.assertNumQueries(2):
+            res = self.anon.get(reverse("tour_list_create"))
+        self.assertEqual(len(res.data), 3)
+
+    def test_my_tours(self):
+        # user (JWT) + agency_profile + tour JOIN thumbnail
+        with self.assertNumQueries(3) as ctx:
+            res = self.owner.get(reverse("my_tours"))
+        self.assertEqual(len(res.data["data"]), 3)
+        self.assertNotIn("tours_tourimage", ctx.captured_queries[-1]["sql"])
+
+    def test_manage_detail(self):
+        url = reverse("tour_detail_agency", args=[self.tours[0].tour_id])
+        # user (JWT) + tour JOIN agency/thumbnail + prefetch images
+        with self.assertNumQueries(3):
+            res = self.owner.get(url)
+        self.assertEqual(len(res.data["data"]["image_urls"]), 2)
+
+
+class TourKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = make_agency()
+        # giá / số ngày / rating trùng nhau -> thứ tự trong nhóm trùng do tour_id quyết định
+        cls.tours = [
+            make_tour(agency, name=f"Tour {i}", adult_price=1000000 + (i % 2) * 500000, duration_days=3)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = auth_client()
+        self.url = reverse("tour_public_list")
+
+    def walk(self, params):
+        ids, cursor = [], None
+        for _ in range(10):
+            res = self.client.get(self.url, {**params, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(res.status_code, 200)
+            ids += [str(row["tour_id"]) for row in res.data["data"]]
+            cursor = res.data["next_cursor"]
+            if cursor is None:
+                return ids
+        self.fail("next_cursor không dừng")
+
+    def test_walk_each_ordering_with_ties(self):
+        for field in TourKeysetPagination.ordering_fields:
+            for ordering in (field, f"-{field}"):
+                prefix = "-" if ordering.startswith("-") else ""
+                expected = [
+                    str(pk) for pk in TourListing.objects.order_by(ordering, f"{prefix}tour_id").values_list("tour_id", flat=True)
+                ]
+                self.assertEqual(self.walk({"page_size": 2, "ordering": ordering}), expected, ordering)
+
+    def test_prev_cursor_goes_back(self):
+        params = {"page_size": 2, "ordering": "adult_price"}
+        first = self.client.get(self.url, params)
+        self.assertIsNone(first.data["prev_cursor"])
+        second = self.client.get(self.url, {**params, "cursor": first.data["next_cursor"]})
+        back = self.client.get(self.url, {**params, "cursor": second.data["prev_cursor"]})
+        self.assertEqual(back.data["data"], first.data["data"])
+        self.assertIsNone(back.data["prev_cursor"])
+        self.assertEqual(back.data["next_cursor"], first.data["next_cursor"])
+
+    def test_malformed_cursor_404(self):
+        first = self.client.get(self.url, {"page_size": 2})
+        for cursor in ("not-base64!", "eyJ4IjoxfQ==", first.data["next_cursor"]):
+            # cursor cuối: hợp lệ nhưng của ordering khác
+            params = {"page_size": 2, "cursor": cursor}
+            if cursor == first.data["next_cursor"]:
+                params["ordering"] = "adult_price"
+            self.assertEqual(self.client.get(self.url, params).status_code, 404, cursor)
+
+
+class TourFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = make_agency()
+        make_tour(agency, region=Tour.NORTH, categories=["sea"], adult_price=800000, duration_days=2)
+        # giá sau giảm 1.000.000 -> khoảng [1tr, 3tr)
+        make_tour(
+            agency, region=Tour.NORTH, categories=["mountain", "adventure"],
+            adult_price=2000000, discount=50, duration_days=3,
+        )
+        make_tour(agency, region=Tour.CENTRAL, categories=["sea", "resort"], adult_price=4000000, duration_days=5)
+        make_tour(agency, region=Tour.SOUTH, categories=["resort"], adult_price=12000000, duration_days=10)
+        make_tour(agency, region=Tour.NORTH, categories=["sea"], adult_price=500000, duration_days=1, is_active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, **params):
+        res = auth_client().get(reverse("tour_public_facets"), params)
+        self.assertEqual(res.status_code, 200)
+        data = res.data["data"]
+        return {
+            "total": data["total"],
+            "region": {r["value"]: r["count"] for r in data["region"]},
+            "categories": {c["value"]: c["count"] for c in data["categories"] if c["count"]},
+            "price": [p["count"] for p in data["price"]],
+            "duration_days": [d["count"] for d in data["duration_days"]],
+        }
+
+    def test_counts_active_tours(self):
+        self.assertEqual(self.facets(), {
+            "total": 4,
+            "region": {Tour.NORTH: 2, Tour.CENTRAL: 1, Tour.SOUTH: 1},
+            "categories": {"sea": 2, "mountain": 1, "resort": 2, "adventure": 1},
+            "price": [1, 1, 1, 0, 1],
+            "duration_days": [1, 1, 1, 1],
+        })
+
+    def test_counts_follow_filters(self):
+        self.assertEqual(self.facets(region="north"), {
+            "total": 2,
+            "region": {Tour.NORTH: 2, Tour.CENTRAL: 0, Tour.SOUTH: 0},
+            "categories": {"sea": 1, "mountain": 1, "adventure": 1},
+            "price": [1, 1, 0, 0, 0],
+            "duration_days": [1, 1, 0, 0],
+        })
+        # lọc theo giá sau giảm
+        self.assertEqual(self.facets(max_price="1000000")["total"], 2)
+        self.assertEqual(self.facets(category="resort", min_price="5000000")["region"][Tour.SOUTH], 1)
+
+    def test_case_variants_share_cache_and_rows(self):
+        # cùng cache key -> cùng kết quả, request nào chạy trước cũng vậy
+        self.assertEqual(
+            normalize_filter_params({"category": "Resort,SEA"}), normalize_filter_params({"category": "sea,resort"})
+        )
+        self.assertEqual(self.facets(category="Resort")["total"], 2)
+        cache.clear()
+        self.assertEqual(self.facets(category="RESORT"), self.facets(category="resort"))
+        # tên field phân biệt hoa thường -> key khác
+        self.assertNotEqual(public_detail_key(1, {"fields": "Name"}), public_detail_key(1, {"fields": "name"}))
+
+
+class TourListingSyncTests(TestCase):
+    def setUp(self):
+        self.agency = make_agency()
+        self.tour = make_tour(self.agency, adult_price=1000000, children_price=500000, discount=15)
+
+    def listing(self):
+        return TourListing.objects.get(tour=self.tour)
+
+    def test_created_with_final_prices(self):
+        listing = self.listing()
+        self.assertEqual(str(listing.final_adult_price), "850000.00")
+        self.assertEqual(str(listing.final_children_price), "425000.00")
+        self.assertEqual(listing.agency_name, "Du Lịch Việt")
+        self.assertIsNotNone(listing.search_vector)
+
+    def test_inactive_tour_removed(self):
+        self.tour.is_active = False
+        self.tour.save()
+        self.assertFalse(TourListing.objects.filter(tour=self.tour).exists())
+
+        self.tour.is_active = True
+        self.tour.save()
+        self.assertTrue(TourListing.objects.filter(tour=self.tour).exists())
+
+    def test_thumbnail_url(self):
+        thumb = TourThumbnail.objects.create(tour=self.tour, thumbnail="tours/x/thumb.png")
+        self.assertTrue(self.listing().thumbnail_url.endswith("tours/x/thumb.png"))
+        thumb.delete()
+        self.assertEqual(self.listing().thumbnail_url, "")
+
+    def test_agency_rename(self):
+        self.agency.agency_name = "Saigon Travel"
+        self.agency.save()
+        self.assertEqual(self.listing().agency_name, "Saigon Travel")
+
+    def test_agency_edit_invalidates_detail_cache(self):
+        cache.clear()
+        url = reverse("tour_detail_customer", args=[self.tour.tour_id])
+        hidden = make_tour(self.agency, name="Tour ẩn", is_active=False)
+        self.assertEqual(auth_client().get(url).data["data"]["hotline"], self.agency.hotline)
+        versions = tour_version(self.tour.pk), tour_version(hidden.pk)
+
+        # save không đổi field hiện ở tour -> giữ cache
+        agency = Agency.objects.get(pk=self.agency.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            agency.save()
+        self.assertEqual((tour_version(self.tour.pk), tour_version(hidden.pk)), versions)
+
+        # đổi hotline (không đổi tên) -> bump mọi tour của agency, kể cả tour đang ẩn
+        agency.hotline = "0909123456"
+        with self.captureOnCommitCallbacks(execute=True):
+            agency.save()
+        self.assertNotEqual(tour_version(self.tour.pk), versions[0])
+        self.assertNotEqual(tour_version(hidden.pk), versions[1])
+        self.assertEqual(auth_client().get(url).data["data"]["hotline"], "0909123456")
+
+    def test_detail_etag_follows_agency(self):
+        url = reverse("tour_detail_customer", args=[self.tour.tour_id])
+        etag = auth_client().get(url)["ETag"]
+        # cache đã hết hạn / bị evict: ETag vẫn phải đổi theo agency.updated_at
+        Agency.objects.filter(pk=self.agency.pk).update(updated_at=timezone.now() + timedelta(seconds=5))
+        cache.delete(public_detail_key(self.tour.tour_id))
+        res = auth_client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertEqual(
+            auth_client().get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 304
+        )
+
+    def test_rating_only_save(self):
+        self.tour.rating = 4.5
+        self.tour.reviews_count = 2
+        with self.assertNumQueries(2):  # UPDATE tour + UPDATE listing
+            self.tour.save(update_fields=["rating", "reviews_count"])
+        listing = self.listing()
+        self.assertEqual(str(listing.rating), "4.50")
+        self.assertEqual(listing.reviews_count, 2)
+
+    def test_tour_delete_cascades(self):
+        TourThumbnail.objects.create(tour=self.tour, thumbnail="tours/x/thumb.png")
+        self.tour.delete()
+        self.assertFalse(TourListing.objects.exists())
+        connection.check_constraints()  # FK deferred: không còn listing mồ côi
+
+
+class FinalPriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = make_agency()
+        cls.discounted = make_tour(agency, name="Giảm giá", adult_price=2000000, discount=60)
+        cls.full = make_tour(agency, name="Giá gốc", adult_price=1500000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generated_columns(self):
+        tour = Tour.objects.get(pk=self.discounted.pk)
+        self.assertEqual(str(tour.final_adult_price), "800000.00")
+        self.assertEqual(str(tour.final_children_price), "200000.00")
+        self.assertEqual(self.full.final_adult_price, self.full.adult_price)
+
+    def test_price_filter_uses_discounted_price(self):
+        res = auth_client().get(reverse("tour_public_list"), {"max_price": 1000000})
+        self.assertEqual([t["name"] for t in res.data["data"]], ["Giảm giá"])
+
+    def test_ordering_by_final_price(self):
+        res = auth_client().get(
+            reverse("tour_public_list"), {"page_size": 10, "ordering": "final_adult_price"}
+        )
+        self.assertEqual([t["name"] for t in res.data["data"]], ["Giảm giá", "Giá gốc"])
+        self.assertEqual(res.data["data"][0]["final_adult_price"], 800000)
+
+
+class PublicTourBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = make_agency()
+        cls.tours = [make_tour_with_media(agency, name=f"Tour {i}") for i in range(3)]
+        cls.hidden = make_tour(agency, name="Ẩn", is_active=False)
+
+    def get(self, ids, **params):
+        return auth_client().get(
+            reverse("tour_public_batch"), {"ids": ",".join(str(i) for i in ids), **params}
+        )
+
+    def test_compact_keeps_request_order_and_reports_missing(self):
+        unknown = uuid.uuid4()
+        ids = [self.tours[2].tour_id, unknown, self.tours[0].tour_id, self.hidden.tour_id]
+        with self.assertNumQueries(1):
+            res = self.get(ids)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [t["tour_id"] for t in res.data["data"]],
+            [str(self.tours[2].tour_id), str(self.tours[0].tour_id)],
+        )
+        self.assertEqual(res.data["missing"], [str(unknown), str(self.hidden.tour_id)])
+        self.assertNotIn("itinerary", res.data["data"][0])
+
+    def test_full_view(self):
+        ids = [t.tour_id for t in reversed(self.tours)]
+        with self.assertNumQueries(2):  # tour JOIN agency/thumbnail + prefetch images
+            res = self.get(ids, view="full")
+        self.assertEqual([t["name"] for t in res.data["data"]], ["Tour 2", "Tour 1", "Tour 0"])
+        self.assertEqual(len(res.data["data"][0]["image_urls"]), 2)
+
+    def test_duplicates_collapsed(self):
+        tour_id = self.tours[0].tour_id
+        res = self.get([tour_id, tour_id])
+        self.assertEqual(len(res.data["data"]), 1)
+
+    def test_invalid_or_too_many_ids(self):
+        self.assertEqual(self.get(["abc"]).status_code, 400)
+        self.assertEqual(self.get([]).status_code, 400)
+        self.assertEqual(self.get([uuid.uuid4() for _ in range(51)]).status_code, 400)
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+        cls.tours = [
+            make_tour_with_media(cls.agency, name=f"Tour {i}", itinerary=[{"day": 1}])
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_fields_trims_select_and_joins(self):
+        url = reverse("tour_detail_customer", args=[self.tours[0].tour_id])
+        with self.assertNumQueries(2) as ctx:  # validators + tour (không JOIN, không prefetch ảnh)
+            res = auth_client().get(url, {"fields": "name,final_adult_price"})
+        self.assertEqual(set(res.data["data"]), {"tour_id", "name", "final_adult_price"})
+        sql = ctx.captured_queries[-1]["sql"]
+        for token in ("itinerary", "policy", "JOIN", "description"):
+            self.assertNotIn(token, sql)
+
+    def test_detail_exclude(self):
+        url = reverse("tour_detail_customer", args=[self.tours[0].tour_id])
+        with self.assertNumQueries(3) as ctx:  # validators + tour JOIN agency/thumbnail + ảnh
+            res = auth_client().get(url, {"exclude": "itinerary,policy,transportation"})
+        self.assertNotIn("itinerary", res.data["data"])
+        self.assertIn("image_urls", res.data["data"])
+        self.assertNotIn("itinerary", ctx.captured_queries[1]["sql"])
+
+    def test_detail_cache_and_etag_per_shape(self):
+        url = reverse("tour_detail_customer", args=[self.tours[0].tour_id])
+        full = auth_client().get(url)
+        small = auth_client().get(url, {"fields": "name"})
+        self.assertNotEqual(full["ETag"], small["ETag"])
+        self.assertIn("itinerary", auth_client().get(url).data["data"])
+        self.assertEqual(set(auth_client().get(url, {"fields": "name"}).data["data"]), {"tour_id", "name"})
+
+    def test_public_list_fields_with_cursor(self):
+        params = {"fields": "name,thumbnail_url", "page_size": 2, "ordering": "duration_days"}
+        res = auth_client().get(reverse("tour_public_list"), params)
+        self.assertEqual(set(res.data["data"][0]), {"tour_id", "name", "thumbnail_url"})
+        with self.assertNumQueries(2):  # cột sắp xếp luôn được SELECT -> không query thêm khi tạo cursor
+            nxt = auth_client().get(
+                reverse("tour_public_list"), {**params, "cursor": res.data["next_cursor"]}
+            )
+        self.assertEqual(len(nxt.data["data"]), 1)
+
+    def test_manage_fields_and_unknown_names_ignored(self):
+        url = reverse("tour_detail_agency", args=[self.tours[0].tour_id])
+        res = auth_client(self.agency.user).get(url, {"fields": "name,agency_name,bogus"})
+        self.assertEqual(set(res.data["data"]), {"tour_id", "name", "agency_name"})
+        self.assertEqual(res.data["data"]["agency_name"], "Du Lịch Việt")
+
+
+class FastListSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+        make_tour_with_media(cls.agency, name="Tour \u2028 Hạ Long", description="a/b \"c\"", discount=15)
+        make_tour(cls.agency, name="Sapa", adult_price=1234567, discount=33, categories=["mountain", "trek"])
+        make_tour(cls.agency, name="Phú Quốc", description="", duration_days=5)
+
+    def test_public_list_identical(self):
+        url = reverse("tour_public_list")
+        for params in (
+            {},
+            {"fields": "name,final_adult_price,thumbnail_url"},
+            {"q": "ha long"},
+            {"page_size": 2, "ordering": "final_adult_price"},
+        ):
+            fast, slow = fast_and_slow(auth_client(), url, params)
+            self.assertEqual(fast, slow, params)
+
+    def test_public_list_cursor_from_rows(self):
+        params = {"page_size": 2, "ordering": "-rating"}
+        cache.clear()
+        first = auth_client().get(reverse("tour_public_list"), params)
+        fast, slow = fast_and_slow(
+            auth_client(), reverse("tour_public_list"), {**params, "cursor": first.data["next_cursor"]}
+        )
+        self.assertEqual(fast, slow)
+        self.assertIn(b"prev_cursor", fast)
+
+    def test_renderer_matches_json_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+
+        data = {
+            "id": uuid.uuid4(),
+            "price": Tour._meta.get_field("adult_price").to_python("1500000.50"),
+            "text": "Đà Nẵng </script> \u2029",
+            "nested": [{"a": None, "b": True, "c": 1.25}],
+        }
+        self.assertEqual(UJSONRenderer().render(data), JSONRenderer().render(data))
+        indented = "application/json; indent=2"
+        self.assertEqual(
+            UJSONRenderer().render(data, indented), JSONRenderer().render(data, indented)
+        )
+
+    def test_renderer_matches_json_renderer_for_floats(self):
+        from rest_framework.renderers import JSONRenderer
+
+        floats = [1e-7, 2.5e-5, 1e-4, 0.1, 1.0, -0.0, 1e15, 1e16, 1.5e300, 5e-324, 123456789.125]
+        for value in floats:
+            data = {"rating": value, "items": [{"score": value, "name": "Hạ Long"}]}
+            self.assertEqual(UJSONRenderer().render(data), JSONRenderer().render(data), value)
+
+
+class MediaURLTests(TestCase):
+    def image(self, name):
+        return TourThumbnail(thumbnail=name).thumbnail
+
+    def test_matches_storage_url(self):
+        for name in (
+            "tours/5f0c/thumb.png",
+            "tours/5f0c/ảnh đẹp (1).png",
+            "tours/a/../b/.hidden.png",
+            "tours//double.png",
+        ):
+            image = self.image(name)
+            self.assertEqual(media_url(image), image.url, name)
+            self.assertEqual(MediaURLField().to_representation(image), image.url, name)
+        self.assertIsNone(media_url(self.image("")))
+        self.assertIsNone(media_url(None))
+
+    def test_non_public_storage_falls_back(self):
+        storages = {
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }
+        with override_settings(STORAGES=storages, MEDIA_URL="/media/"):
+            self.assertEqual(media_url(self.image("tours/x/thumb.png")), "/media/tours/x/thumb.png")
+        self.assertTrue(media_url(self.image("tours/x/thumb.png")).startswith("https://"))
+
+
+def png(name, size=(2, 2)):
+    buf = io.BytesIO()
+    Image.new("RGB", size).save(buf, "PNG")
+    return SimpleUploadedFile(name, buf.getvalue(), content_type="image/png")
+
+
+IN_MEMORY_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES, MEDIA_URL="/media/", UPLOAD_MAX_WORKERS=4)
+class TourMediaUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+
+    def setUp(self):
+        cache.clear()
+        self.client = auth_client(self.agency.user)
+        self.threads = set()
+        original = InMemoryStorage.save
+        test = self
+
+        def save(storage, name, content, max_length=None):
+            test.threads.add(threading.current_thread().name)
+            if content.name == "bad.png":
+                raise OSError("S3 timeout")
+            return original(storage, name, content, max_length)
+
+        patcher = mock.patch.object(InMemoryStorage, "save", save)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_tour(self, images):
+        data = {
+            "name": "Tour ảnh", "departure_location": "Hà Nội", "destination": "Huế",
+            "adult_price": 1000000, "children_price": 500000, "duration_days": 2,
+            "region": Tour.CENTRAL, "categories": "sea", "thumbnail": png("thumb.png"), "images": images,
+        }
+        return self.client.post(reverse("tour_list_create"), data, format="multipart")
+
+    def stored_files(self):
+        # storage dùng chung cả class -> so sánh trước / sau request
+        if not default_storage.exists("tours"):
+            return set()
+        dirs, _ = default_storage.listdir("tours")
+        return {
+            f"{d}/{sub}/{name}"
+            for d in dirs
+            for sub in default_storage.listdir(f"tours/{d}")[0]
+            for name in default_storage.listdir(f"tours/{d}/{sub}")[1]
+        }
+
+    def test_gallery_uploaded_in_parallel_and_bulk_inserted(self):
+        before = self.stored_files()
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.post_tour([png(f"img-{i}.png") for i in range(5)])
+        self.assertEqual(res.status_code, 201, res.data)
+
+        tour = Tour.objects.get(pk=res.data["data"]["tour_id"])
+        self.assertEqual(tour.images.count(), 5)
+        self.assertTrue(tour.thumbnail.thumbnail.name.startswith(f"tours/{tour.tour_id}/thumbnail/"))
+        self.assertEqual(len(self.stored_files() - before), 6)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "tours_tour_image"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertTrue(all(name.startswith("upload") for name in self.threads))
+
+    def test_partial_failure_cleans_up(self):
+        before = self.stored_files()
+        res = self.post_tour([png("ok-1.png"), png("bad.png"), png("ok-2.png")])
+        self.assertEqual(res.status_code, 502)
+        self.assertEqual([f["name"] for f in res.data["errors"]["failed_files"]], ["bad.png"])
+        self.assertFalse(Tour.objects.filter(name="Tour ảnh").exists())
+        self.assertEqual(self.stored_files(), before)
+
+    def test_update_appends_gallery(self):
+        tour = make_tour_with_media(self.agency, images=1)
+        url = reverse("tour_detail_agency", args=[tour.tour_id])
+        res = self.client.patch(url, {"images": [png("a.png"), png("b.png")]}, format="multipart")
+        self.assertEqual(res.status_code, 200, res.data)
+        self.assertEqual(tour.images.count(), 3)
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES, MEDIA_URL="/media/")
+class TourImageVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+
+    def setUp(self):
+        cache.clear()
+        self.client = auth_client(self.agency.user)
+
+    def test_render_variants_bounded_webp(self):
+        key = default_storage.save("tours/x/gallery/wide.png", png("wide.png", size=(600, 400)))
+        keys = render_variants(default_storage, key)
+
+        self.assertEqual(set(keys), set(VARIANT_SIZES))
+        sizes = {}
+        for name, variant_key in keys.items():
+            self.assertTrue(variant_key.startswith("tours/x/gallery/wide_"))
+            with default_storage.open(variant_key) as f, Image.open(f) as img:
+                self.assertEqual(img.format, "WEBP")
+                sizes[name] = img.size
+        # không phóng to ảnh nhỏ hơn khung, giữ tỉ lệ
+        self.assertEqual(sizes, {"full": (600, 400), "detail": (600, 400), "card": (480, 320)})
+
+    def test_upload_records_variants_and_syncs_listing(self):
+        data = {
+            "name": "Tour variant", "departure_location": "Hà Nội", "destination": "Huế",
+            "adult_price": 1000000, "children_price": 500000, "duration_days": 2,
+            "region": Tour.CENTRAL, "categories": "sea",
+            "thumbnail": png("thumb.png"), "images": [png("a.png"), png("b.png")],
+        }
+        res = self.client.post(reverse("tour_list_create"), data, format="multipart")
+        self.assertEqual(res.status_code, 201, res.data)
+        # thumbnail + 2 ảnh gallery -> 3 job sinh variant
+        self.assertEqual(run_pending(), 3)
+
+        tour = Tour.objects.get(pk=res.data["data"]["tour_id"])
+        self.assertEqual(set(TourThumbnail.objects.get(pk=tour.pk).variants), set(VARIANT_SIZES))
+        for image in tour.images.all():
+            self.assertEqual(set(image.variants), set(VARIANT_SIZES))
+
+        listing = TourListing.objects.get(tour=tour)
+        self.assertTrue(listing.thumbnail_variants["card"].endswith("_card.webp"))
+
+        res = auth_client().get(reverse("tour_detail_customer", args=[tour.tour_id]))
+        body = res.json()["data"]
+        self.assertEqual(body["thumbnail_variants"], listing.thumbnail_variants)
+        self.assertTrue(all(set(img["variants"]) == set(VARIANT_SIZES) for img in body["image_urls"]))
+
+    def test_replaced_image_discards_variants(self):
+        tour = make_tour(self.agency)
+        key = default_storage.save(f"tours/{tour.tour_id}/thumbnail/old.png", png("old.png"))
+        TourThumbnail.objects.create(tour=tour, thumbnail=key)
+        rendered = {}
+
+        def render_then_replace(storage, name):
+            rendered.update(render_variants(storage, name))
+            # ảnh bị thay trong lúc worker đang xử lý
+            TourThumbnail.objects.filter(pk=tour.pk).update(thumbnail="tours/new.png")
+            return rendered
+
+        with mock.patch("utils.images.render_variants", render_then_replace):
+            self.assertIsNone(build_variants(TourThumbnail, tour.pk, "thumbnail"))
+
+        self.assertEqual(TourThumbnail.objects.get(pk=tour.pk).variants, {})
+        self.assertTrue(rendered)
+        self.assertFalse(any(default_storage.exists(k) for k in rendered.values()))
+
+
+# S3 giả (moto) cho luồng upload thẳng lên bucket bằng presigned POST
+S3_TEST_STORAGES = {
+    "default": {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "bucket_name": "test-bucket", "access_key": "testing", "secret_key": "testing",
+            "region_name": "ap-southeast-2", "custom_domain": None,
+        },
+    },
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def start_s3_mock(test):
+    mocked = mock_aws()
+    mocked.start()
+    test.addCleanup(mocked.stop)
+    boto3.client("s3", region_name="ap-southeast-2").create_bucket(
+        Bucket="test-bucket", CreateBucketConfiguration={"LocationConstraint": "ap-southeast-2"}
+    )
+
+
+def direct_upload(test, grant, body):
+    # client POST thẳng lên bucket bằng url + fields nhận được
+    res = requests.post(grant["url"], data=grant["fields"], files={"file": ("upload", body)})
+    test.assertEqual(res.status_code, 204, res.text)
+    return grant["key"]
+
+
+@skipUnless(mock_aws, "cần moto")
+@override_settings(STORAGES=S3_TEST_STORAGES)
+class TourDirectUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = make_agency()
+
+    def setUp(self):
+        cache.clear()
+        start_s3_mock(self)
+        self.client = auth_client(self.agency.user)
+
+    def presign(self, *files):
+        return self.client.post(reverse("tour_upload_presign"), {"files": list(files)}, format="json")
+
+    def post_tour(self, **media):
+        data = {
+            "name": "Tour S3", "departure_location": "Hà Nội", "destination": "Huế",
+            "adult_price": 1000000, "children_price": 500000, "duration_days": 2,
+            "region": Tour.CENTRAL, "categories": ["sea"], **media,
+        }
+        return self.client.post(reverse("tour_list_create"), data, format="json")
+
+    def test_presign_upload_then_create_with_keys(self):
+        body = png("a.png").read()
+        res = self.presign(
+            {"field": "thumbnail", "name": "thumb.png", "size": len(body)},
+            {"field": "images", "name": "a.png", "size": len(body)},
+            {"field": "images", "name": "b.png", "size": len(body)},
+        )
+        self.assertEqual(res.status_code, 200, res.data)
+        grants = res.data["data"]["uploads"]
+        self.assertTrue(all(g["key"].startswith(f"uploads/pending/{self.agency.user.pk}/") for g in grants))
+        self.assertEqual(grants[0]["fields"]["x-amz-server-side-encryption"], "AES256")
+        keys = [direct_upload(self, g, body) for g in grants]
+
+        res = self.post_tour(thumbnail_key=keys[0], image_keys=keys[1:])
+        self.assertEqual(res.status_code, 201, res.data)
+
+        tour = Tour.objects.get(pk=res.data["data"]["tour_id"])
+        self.assertTrue(tour.thumbnail.thumbnail.name.startswith(f"tours/{tour.tour_id}/thumbnail/"))
+        names = [img.image.name for img in tour.images.all()]
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+        # bản trong vùng tạm đã xoá sau khi xác nhận
+        self.assertFalse(any(default_storage.exists(key) for key in keys))
+
+    def test_presign_rejects_size_and_extension(self):
+        res = self.presign(
+            {"field": "images", "name": "a.gif", "size": 10},
+            {"field": "images", "name": "b.png", "size": 11 * 1024 * 1024},
+            {"field": "license_file", "name": "c.pdf", "size": 10},
+        )
+        self.assertEqual(res.status_code, 400)
+        errors = res.data["errors"]["files"]
+        self.assertIn("file", errors[0])
+        self.assertIn("file", errors[1])
+        self.assertIn("field", errors[2])
+
+    def test_confirm_checks_content_and_owner(self):
+        grants = self.presign(
+            {"field": "thumbnail", "name": "thumb.png", "size": 20},
+            {"field": "images", "name": "big.png", "size": 20},
+        ).data["data"]["uploads"]
+        fake = direct_upload(self, grants[0], b"<html>not a png</html>")
+        # moto không áp content-length-range -> server vẫn phải kiểm tra dung lượng
+        big = direct_upload(self, grants[1], b"\x89PNG\r\n\x1a\n" + b"0" * (11 * 1024 * 1024))
+
+        res = self.post_tour(thumbnail_key=fake, image_keys=[big])
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("thumbnail_key", res.data["errors"])
+        self.assertIn("image_keys", res.data["errors"])
+
+        other = make_user("other")
+        foreign = f"uploads/pending/{other.pk}/thumbnail/{uuid.uuid4().hex}.png"
+        missing = f"uploads/pending/{self.agency.user.pk}/thumbnail/{uuid.uuid4().hex}.png"
+        for key in (foreign, missing):
+            res = self.post_tour(thumbnail_key=key)
+            self.assertEqual(res.status_code, 400)
+            self.assertIn("thumbnail_key", res.data["errors"])
+        self.assertFalse(Tour.objects.filter(name="Tour S3").exists())
@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import TourListCreateView, TourDetailAgencyView, MyToursView, PublicTourListView, TourDetailCustomerView
+from .views import TourListCreateView, TourDetailAgencyView, MyToursView, PublicTourListView, TourDetailCustomerView, PublicTourFacetsView, PublicTourBatchView, TourUploadPresignView
 
 urlpatterns = [
     path('', TourListCreateView.as_view(), name='tour_list_create'),
     path('my-tours/', MyToursView.as_view(), name='my_tours'),
+    path('uploads/presign/', TourUploadPresignView.as_view(), name='tour_upload_presign'),
     path('manage/<uuid:tour_id>/', TourDetailAgencyView.as_view(), name='tour_detail_agency'),
     path('public/', PublicTourListView.as_view(), name='tour_public_list'),
+    path('public/facets/', PublicTourFacetsView.as_view(), name='tour_public_facets'),
+    path('public/batch/', PublicTourBatchView.as_view(), name='tour_public_batch'),
     path('public/<uuid:tour_id>/', TourDetailCustomerView.as_view(), name='tour_detail_customer'),
 ]
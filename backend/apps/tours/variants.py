@@ -0,0 +1,23 @@
+from apps.jobs.queue import enqueue
+
+from .cache import bump_tour_cache
+from .listing import refresh_tour_listings
+
+# Sinh ảnh WebP thu nhỏ cho thumbnail / gallery: job nền (apps/tours/jobs.py), không chạy trong request.
+
+
+def thumbnail_variants_done(thumb):
+    # listing giữ sẵn URL variant của thumbnail
+    refresh_tour_listings([thumb.tour_id])
+    bump_tour_cache(thumb.tour_id)
+
+
+def image_variants_done(image):
+    bump_tour_cache(image.tour_id)
+
+
+def schedule_tour_variants(thumbnail_tour_id=None, image_ids=()):
+    if thumbnail_tour_id is not None:
+        enqueue("tours.build_thumbnail_variants", key=f"variants:thumbnail:{thumbnail_tour_id}", tour_id=thumbnail_tour_id)
+    for img_id in image_ids:
+        enqueue("tours.build_image_variants", key=f"variants:image:{img_id}", img_id=img_id)
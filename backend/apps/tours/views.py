@@ -1,23 +1,58 @@
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework import generics, permissions, filters ,status
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied,ValidationError
-from .models import Tour
-from .serializers import TourSerializer, TourPublicDetailSerializer, TourListItemSerializer, TourPublicListSerializer
-from .permissions import IsAgencyOwnerOrReadOnly, IsAgencyUser
-import traceback, logging
+from .models import TOUR_UPLOADS, Tour, TourListing
+from .serializers import (
+    TourSerializer, TourPublicDetailSerializer, TourListItemSerializer, TourListingSerializer,
+    TourListingFastSerializer,
+)
+from .permissions import IsAgencyOwnerOrReadOnly, IsAgencyUser, get_agency_id
+from .pagination import TourKeysetPagination
+from .filters import compute_facets, filter_public_tours
+from .cache import (
+    DETAIL_TIMEOUT, FACETS_TIMEOUT, LIST_TIMEOUT,
+    bump_tour_cache, public_detail_key, public_facets_key, public_list_key,
+    detail_validators, list_validators,
+)
+from utils.conditional import not_modified, set_validators
+from utils.fieldsets import SparseFieldsetViewMixin
+from utils.fastpath import FastListViewMixin
+from utils.presigned import PresignUploadView
+from utils.uploads import UploadError
+from apps.users.profiles import request_profiles
+import traceback, logging, uuid
 from botocore.exceptions import ClientError
 from django.db import IntegrityError
-from django.db.models import Q
+from django.core.cache import cache
+
+
+def upload_error_response(e):
+    # upload ảnh lỗi: file đã lên đã được xoá, DB không đổi
+    failed = []
+    for name, exc in e.failed:
+        error = exc.response.get("Error", {}) if isinstance(exc, ClientError) else {}
+        failed.append({"name": name, "error_code": error.get("Code"), "error_msg": error.get("Message") or str(exc)})
+    return Response(
+        {"message": "Tải ảnh lên S3 thất bại, dữ liệu chưa được lưu.", "errors": {"failed_files": failed}},
+        status=status.HTTP_502_BAD_GATEWAY,
+    )
+
 
+# các cột lớn mà serializer danh sách không dùng -> không SELECT
+LIST_DEFERRED_FIELDS = (
+    "itinerary", "transportation", "services_included", "services_excluded", "policy",
+    "search_vector",
+)
 
 # API Lấy danh sách tất cả tour (public) + tạo tour (agency)
-class TourListCreateView(generics.ListCreateAPIView):
+class TourListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """
     GET: list public tours (is_active=true)
     POST: create tour (agency only)
     """
-    parser_classes = (MultiPartParser, FormParser)
+    # JSON: ảnh đã upload thẳng lên S3, gửi thumbnail_key / image_keys
+    parser_classes = (MultiPartParser, FormParser, JSONParser)
     serializer_class = TourSerializer
     permission_classes = [IsAgencyOwnerOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -28,19 +63,21 @@ class TourListCreateView(generics.ListCreateAPIView):
         "agency__agency_name",
     ]
 
-    ordering_fields = ["adult_price", "children_price", "created_at", "duration_days"]
+    ordering_fields = ["adult_price", "children_price", "final_adult_price", "created_at", "duration_days"]
 
     def get_queryset(self):
         # public list mặc định chỉ lấy active
-        return (
+        qs = (
             Tour.objects.filter(is_active=True)
             .select_related("agency", "thumbnail")
-            .prefetch_related("images")
+            .prefetch_related("images")   # TourSerializer trả image_urls + JSON
+            .defer("search_vector")
             .order_by("-created_at")
         )
+        return self.shape_queryset(qs)
 
     def perform_create(self, serializer):
-        agency = getattr(self.request.user, "agency_profile", None)
+        agency = request_profiles(self.request).agency
         if not agency:
             raise PermissionDenied("Bạn chưa đăng ký agency.")
         if agency.status != "approved" or not agency.verified:
@@ -77,6 +114,9 @@ class TourListCreateView(generics.ListCreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        except UploadError as e:
+            return upload_error_response(e)
+
         except ClientError as e:
             return Response(
                 {
@@ -98,16 +138,20 @@ class TourListCreateView(generics.ListCreateAPIView):
 
 
 # API Chi tiết / sửa / xoá tour
-class TourDetailAgencyView(generics.RetrieveUpdateDestroyAPIView):
+class TourDetailAgencyView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = (
         Tour.objects.all()
         .select_related("agency", "thumbnail")
         .prefetch_related("images")
+        .defer("search_vector")
     )
     serializer_class = TourSerializer
     permission_classes = [IsAgencyOwnerOrReadOnly]
     lookup_field = 'tour_id'
-    parser_classes = (MultiPartParser, FormParser)   # nhận multipart form-data
+    parser_classes = (MultiPartParser, FormParser, JSONParser)   # multipart form-data hoặc JSON (thumbnail_key / image_keys)
+
+    def get_queryset(self):
+        return self.shape_queryset(super().get_queryset())
 
     # GET /api/tours/manage/<tour_id>
     def retrieve(self, request, *args, **kwargs):
@@ -152,6 +196,9 @@ class TourDetailAgencyView(generics.RetrieveUpdateDestroyAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        except UploadError as e:
+            return upload_error_response(e)
+
         except ClientError as e:
             # lỗi AWS S3
             return Response(
@@ -176,31 +223,39 @@ class TourDetailAgencyView(generics.RetrieveUpdateDestroyAPIView):
     # DELETE tour
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        tour_id = instance.tour_id
         self.perform_destroy(instance)
+        bump_tour_cache(tour_id)
         return Response(
             {"message": "Xóa tour thành công."},
             status=status.HTTP_200_OK
         )
 
+# API Xin presigned POST để upload ảnh tour thẳng lên S3 (không đi qua server)
+class TourUploadPresignView(PresignUploadView):
+    permission_classes = [permissions.IsAuthenticated, IsAgencyUser]
+    upload_specs = TOUR_UPLOADS
+
+
 # API Lấy danh sách tour của chính agency (tiện cho dashboard) gồm cả active/inactive
 logger = logging.getLogger(__name__)
 
-class MyToursView(generics.ListAPIView):
+class MyToursView(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = TourListItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsAgencyUser]
 
     def get_queryset(self):
-        try:
-            agency = self.request.user.agency_profile
-        except Exception:
+        agency_id = get_agency_id(self.request)
+        if agency_id is None:
             raise PermissionDenied("Bạn chưa đăng ký agency.")
 
-        return (
-            Tour.objects.filter(agency=agency)
-            .select_related("agency", "thumbnail")   # OK khi không dùng .only()
-            .prefetch_related("images")
+        qs = (
+            Tour.objects.filter(agency_id=agency_id)
+            .select_related("thumbnail")
+            .defer(*LIST_DEFERRED_FIELDS)
             .order_by("-created_at")
         )
+        return self.shape_queryset(qs)
 
     def list(self, request, *args, **kwargs):
         qs = self.get_queryset()  # nếu PermissionDenied -> DRF trả 403, không 500
@@ -210,121 +265,235 @@ class MyToursView(generics.ListAPIView):
                 "data": data,
                 "message": (
                     "Bạn chưa có tour nào được tạo."
-                    if not qs.exists()
+                    if not data
                     else "Lấy danh sách tour của bạn thành công."
                 ),
             },
             status=status.HTTP_200_OK,
         )
 
+def public_listings(params, queryset=None):
+    """Tour public đã filter, đọc từ read-model TourListing (không JOIN)."""
+    if queryset is None:
+        queryset = TourListing.objects.all()
+    return filter_public_tours(queryset, params, agency_field="agency_name")
+
+
 # API Lấy, tìm kiếm danh sách public tour
-class PublicTourListView(generics.ListAPIView):
-    serializer_class = TourPublicListSerializer
+class PublicTourListView(FastListViewMixin, SparseFieldsetViewMixin, generics.ListAPIView):
+    serializer_class = TourListingSerializer
+    fast_serializer_class = TourListingFastSerializer
     permission_classes = [permissions.AllowAny]
+    # bật khi client gửi ?page_size= hoặc ?cursor= (hỗ trợ ?ordering=)
+    pagination_class = TourKeysetPagination
+    # cursor đọc cột sắp xếp của phần tử đầu/cuối trang
+    sparse_always_fields = TourKeysetPagination.ordering_fields
 
     def get_queryset(self):
-        qs = (
-            Tour.objects.filter(is_active=True)
-            .select_related("agency", "thumbnail")
-            .prefetch_related("images")
-            .order_by("-created_at")
-        )
-
-        # filter agency name
-        agency = self.request.query_params.get("agency")
-        if agency:
-            qs = qs.filter(agency__agency_name__icontains=agency)
-
-        # filter price (ép kiểu để chắc)
-        min_price = self.request.query_params.get("min_price")
-        max_price = self.request.query_params.get("max_price")
-
-        try:
-            if min_price not in (None, ""):
-                qs = qs.filter(adult_price__gte=float(min_price))
-        except (ValueError, TypeError):
-            pass
-
-        try:
-            if max_price not in (None, ""):
-                qs = qs.filter(adult_price__lte=float(max_price))
-        except (ValueError, TypeError):
-            pass
-
-        # filter departure_location / destination
-        departure_location = self.request.query_params.get("departure_location")
-        if departure_location:
-            qs = qs.filter(departure_location__icontains=departure_location)
-
-        destination = self.request.query_params.get("destination")
-        if destination:
-            qs = qs.filter(destination__icontains=destination)
-
-        # filter region
-        region_param = self.request.query_params.get("region")
-        if region_param:
-            alias = {"north": Tour.NORTH, "central": Tour.CENTRAL, "south": Tour.SOUTH}
-            raw = [p.strip().lower() for p in region_param.split(",") if p.strip()]
-
-            vals = []
-            for p in raw:
-                if p.isdigit():
-                    vals.append(int(p))
-                elif p in alias:
-                    vals.append(alias[p])
-
-            if vals:
-                qs = qs.filter(region__in=vals)
-
-        # filter categories overlap
-        cat_param = self.request.query_params.get("category") or self.request.query_params.get("categories")
-        if cat_param:
-            cats = [c.strip() for c in cat_param.split(",") if c.strip()]
-            if cats:
-                qs = qs.filter(categories__overlap=cats)
-
-        # search q
-        q = self.request.query_params.get("q")
-        if q:
-            qs = qs.filter(
-                Q(name__icontains=q)
-                | Q(description__icontains=q)
-                | Q(destination__icontains=q)
-            )
-
-        return qs
+        qs = TourListing.objects.defer("search_vector").order_by("-created_at")
+        return public_listings(self.request.query_params, self.shape_queryset(qs))
 
     def list(self, request, *args, **kwargs):
+        # entry cache: {"etag", "body"}; chỉ ETag, không Last-Modified (xem list_validators)
+        cache_key = public_list_key(request.query_params)
+        entry = cache.get(cache_key)
+        if entry is None:
+            etag = list_validators(public_listings(request.query_params), request.query_params)
+
+            # client đã có bản mới nhất -> 304, không cần serialize
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+            entry = {"etag": etag, "body": self._build_payload()}
+            cache.set(cache_key, entry, LIST_TIMEOUT)
+        else:
+            response = not_modified(request, entry["etag"])
+            if response is not None:
+                return response
+
+        response = Response(entry["body"], status=status.HTTP_200_OK)
+        return set_validators(response, entry["etag"])
+
+    def _build_payload(self):
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        fast = self.get_fast_serializer() if self.use_fast_path() else None
+        if fast is not None:
+            queryset = fast.values(queryset, *self._cursor_columns(queryset))
 
-        return Response(
-            {
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return {
                 "message": "Lấy danh sách tour thành công",
-                "data": serializer.data,
-            },
-            status=status.HTTP_200_OK,
-        )
+                "data": self._serialize(page, fast),
+                **self.paginator.get_cursor_payload(),
+            }
+
+        return {
+            "message": "Lấy danh sách tour thành công",
+            "data": self._serialize(queryset, fast),
+        }
+
+    def _serialize(self, rows, fast):
+        if fast is not None:
+            return fast.serialize(rows)
+        return self.get_serializer(rows, many=True).data
+
+    def _cursor_columns(self, queryset):
+        # cursor cần cột sắp xếp + tour_id của phần tử đầu/cuối trang
+        paginator = self.paginator
+        if paginator is None or not paginator.is_enabled(self.request):
+            return ()
+        columns = [*paginator.ordering_fields, paginator.tiebreaker]
+        if paginator.rank_field in queryset.query.annotations:
+            columns.append(paginator.rank_field)
+        return columns
 
 # API chọn xem chi tiết tour
-class TourDetailCustomerView(generics.RetrieveAPIView):
+class TourDetailCustomerView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = (
         Tour.objects
         .filter(is_active=True)
         .select_related("agency", "thumbnail")
         .prefetch_related("images")
+        .defer("search_vector")
     )
     serializer_class = TourPublicDetailSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = "tour_id"
 
+    def get_queryset(self):
+        return self.shape_queryset(super().get_queryset())
+
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
+        tour_id = kwargs[self.lookup_field]
+        cache_key = public_detail_key(tour_id, request.query_params)
+        entry = cache.get(cache_key)
+        if entry is None:
+            etag, last_modified = detail_validators(tour_id, request.query_params)
+            if etag is not None:
+                response = not_modified(request, etag, last_modified)
+                if response is not None:
+                    return response
+
+            instance = self.get_object()  # 404 nếu không tồn tại / inactive
+            serializer = self.get_serializer(instance)
+            entry = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "body": {
+                    "data": serializer.data,
+                    "message": "Lấy chi tiết tour thành công."
+                },
+            }
+            cache.set(cache_key, entry, DETAIL_TIMEOUT)
+        else:
+            response = not_modified(request, entry["etag"], entry["last_modified"])
+            if response is not None:
+                return response
+
+        response = Response(entry["body"], status=status.HTTP_200_OK)
+        return set_validators(response, entry["etag"], entry["last_modified"])
+
+
+# API Đếm số tour theo region / category / khoảng giá / số ngày (sidebar filter)
+class PublicTourFacetsView(generics.GenericAPIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        return public_listings(self.request.query_params)
+
+    def get(self, request, *args, **kwargs):
+        cache_key = public_facets_key(request.query_params)
+        data = cache.get(cache_key)
+        if data is None:
+            data = compute_facets(self.get_queryset())
+            cache.set(cache_key, data, FACETS_TIMEOUT)
+
+        return Response(
+            {"data": data, "message": "Lấy thống kê bộ lọc tour thành công."},
+            status=status.HTTP_200_OK,
+        )
+
+
+# API Lấy nhiều tour theo danh sách id trong 1 request (wishlist, đã xem gần đây, giỏ hàng)
+class PublicTourBatchView(SparseFieldsetViewMixin, generics.GenericAPIView):
+    """
+    GET /api/tours/public/batch/?ids=<id1>,<id2>,...&view=compact|full
+    - compact (mặc định): field như danh sách public, đọc từ TourListing (1 query)
+    - full: field như chi tiết tour (1 query + 1 prefetch ảnh)
+    Giữ nguyên thứ tự id gửi lên, id không tồn tại / đã ẩn trả trong `missing`.
+    """
+    permission_classes = [permissions.AllowAny]
+    max_ids = 50
+
+    VIEW_COMPACT = "compact"
+    VIEW_FULL = "full"
+
+    def get_view_mode(self):
+        return self.VIEW_FULL if self.request.query_params.get("view") == self.VIEW_FULL else self.VIEW_COMPACT
+
+    def get_serializer_class(self):
+        if self.get_view_mode() == self.VIEW_FULL:
+            return TourPublicDetailSerializer
+        return TourListingSerializer
+
+    def get_queryset(self):
+        if self.get_view_mode() == self.VIEW_FULL:
+            qs = (
+                Tour.objects.filter(is_active=True)
+                .select_related("agency", "thumbnail")
+                .prefetch_related("images")
+                .defer("search_vector")
+            )
+        else:
+            qs = TourListing.objects.defer("search_vector")
+        return self.shape_queryset(qs)
+
+    def parse_ids(self):
+        raw = self.request.query_params.get("ids") or ""
+        ids, invalid = [], []
+        for part in raw.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                tour_id = uuid.UUID(part)
+            except ValueError:
+                invalid.append(part)
+                continue
+            if tour_id not in ids:
+                ids.append(tour_id)
+        return ids, invalid
+
+    def get(self, request, *args, **kwargs):
+        ids, invalid = self.parse_ids()
+        if invalid:
+            return Response(
+                {"message": "tour_id không hợp lệ.", "errors": {"ids": invalid}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ids:
+            return Response(
+                {"message": "Thiếu danh sách ids.", "data": None},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(ids) > self.max_ids:
+            return Response(
+                {"message": f"Tối đa {self.max_ids} tour mỗi lần.", "data": None},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        found = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=ids)}
+        tours = [found[tour_id] for tour_id in ids if tour_id in found]
+        missing = [str(tour_id) for tour_id in ids if tour_id not in found]
+
+        serializer = self.get_serializer(tours, many=True)
         return Response(
             {
                 "data": serializer.data,
-                "message": "Lấy chi tiết tour thành công."
+                "missing": missing,
+                "message": "Lấy danh sách tour thành công.",
             },
-            status=status.HTTP_200_OK
-        )
\ No newline at end of file
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import User
+
+# Cache user theo access token (user_id + jti) vài chục giây: reconnect WebSocket hàng loạt
+# (sau deploy ...) không dồn thành 1 query users_user mỗi kết nối.
+# Chỉ cache vài field (USER_FIELDS, không có password hash ...), dựng lại User "nhẹ": field khác
+# deferred, đọc tới mới query.
+# Đổi mật khẩu / đăng xuất / khoá tài khoản / đổi quyền -> invalidate_user() tăng "generation"
+# của user, mọi bản cache cũ bỏ. Token mang generation lúc cấp (claim auth_gen, authentication.py):
+# lệch generation hiện tại -> claim trong token đã cũ, đọc lại user từ DB.
+# Generation khởi tạo theo thời gian (ms) như version cache tour: key bị evict rồi tạo lại
+# không quay về giá trị cũ -> không đọc nhầm bản cache từ trước lần invalidate.
+
+CACHE_PREFIX = "auth:"
+
+# field consumer chat cần: quyền, thông tin sender trong tin nhắn (serialize_message)
+USER_FIELDS = ("user_id", "username", "full_name", "roles", "is_active", "last_seen")
+
+
+def _generation_key(user_id):
+    return f"{CACHE_PREFIX}gen:{user_id}"
+
+
+def _new_generation():
+    return int(time.time() * 1000)
+
+
+def _user_key(user_id, token):
+    return f"{CACHE_PREFIX}user:{user_id}:{token.get(api_settings.JTI_CLAIM) or token.get('iat')}"
+
+
+def generation(user_id):
+    """Generation hiện tại của user (1 lần cache.get), chưa có -> khởi tạo."""
+    key = _generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _new_generation(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def _light_user(values):
+    """User từ dict field đã cache; các field còn lại deferred."""
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(User.objects.db, names, [values[name] for name in names])
+
+
+def user_for_token(raw_token):
+    """Access token -> User đang active, None nếu token sai / hết hạn / user không còn."""
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    user_id = token.get(settings.SIMPLE_JWT["USER_ID_CLAIM"])
+    if not user_id:
+        return None
+
+    user_key, generation_key = _user_key(user_id, token), _generation_key(user_id)
+    cached = cache.get_many([user_key, generation_key])
+    generation = cached.get(generation_key)
+    hit = cached.get(user_key)
+    if generation is None:
+        # chưa có / bị evict: tạo mới, bản cache đang có (nếu còn) coi như cũ
+        cache.add(generation_key, _new_generation(), timeout=None)
+        generation = cache.get(generation_key)
+    elif hit is not None and hit[0] == generation:
+        return _light_user(hit[1])
+
+    values = User.objects.filter(user_id=user_id, is_active=True).values(*USER_FIELDS).first()
+    if values is None:
+        return None
+    # không giữ lâu hơn thời hạn còn lại của token
+    ttl = min(settings.AUTH_USER_CACHE_TTL, int(token["exp"] - time.time()))
+    if ttl > 0 and generation is not None:
+        cache.set(user_key, (generation, values), ttl)
+    return _light_user(values)
+
+
+def invalidate_user(user_id):
+    """Bỏ mọi user đã cache của user_id (đổi mật khẩu, đăng xuất, khoá tài khoản ...)."""
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:   # chưa có / bị evict: mốc thời gian mới luôn khác generation cũ
+        cache.set(key, _new_generation(), timeout=None)
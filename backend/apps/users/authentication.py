@@ -0,0 +1,119 @@
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .auth_cache import generation
+from .models import User
+
+# Claim thêm vào token lúc đăng nhập / refresh: đủ cho phần lớn API (quyền, lọc theo agency / customer)
+# mà không phải đọc bảng users_user mỗi request.
+# auth_gen: generation của user lúc cấp token (apps/users/auth_cache.py); khoá tài khoản / đổi quyền /
+# duyệt agency tăng generation -> claim cũ không dùng nữa.
+PROFILE_CLAIMS = ("roles", "agency_id", "customer_id", "auth_gen")
+
+
+def profile_claims(user_id):
+    """
+    {roles, agency_id, customer_id, auth_gen} của user đang active, 1 query (join agency + customer).
+    None nếu user không còn / bị vô hiệu hóa.
+    """
+    # đọc generation trước DB: thay đổi xen giữa làm lệch generation, không lọt claim cũ
+    auth_gen = generation(user_id)
+    row = (
+        User.objects.filter(pk=user_id, is_active=True)
+        .values_list("roles", "agency_profile__agency_id", "customer__customer_id")
+        .first()
+    )
+    if row is None:
+        return None
+    roles, agency_id, customer_id = row
+    return {
+        "roles": list(roles or []),
+        "agency_id": str(agency_id) if agency_id else None,
+        "customer_id": str(customer_id) if customer_id else None,
+        "auth_gen": auth_gen,
+    }
+
+
+def add_profile_claims(token, claims):
+    """Ghi claims vào refresh token; access token sinh từ nó (token.access_token) copy theo."""
+    for name in PROFILE_CLAIMS:
+        token[name] = claims[name]
+    return token
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    User dựng từ claim của access token. user_id / pk / roles / agency_id / customer_id đọc thẳng
+    từ token; truy cập thuộc tính khác (email, save(), isinstance(..., User), gán FK ...) mới
+    load dòng User (1 query, nhớ lại cho cả request).
+    Lọc queryset nên dùng user.pk (`sender_id=user.pk`): truyền cả object vào filter() cũng làm load.
+    """
+
+    def __init__(self, token):
+        user_id = token[api_settings.USER_ID_CLAIM]
+
+        def load():
+            user = User.objects.filter(pk=user_id, is_active=True).first()
+            if user is None:
+                raise AuthenticationFailed("Tài khoản không tồn tại hoặc đã bị vô hiệu hóa.", code="user_inactive")
+            return user
+
+        super().__init__(load)
+        # LazyObject chuyển mọi setattr sang object thật -> ghi thẳng vào __dict__
+        self.__dict__["_user_id"] = User._meta.pk.to_python(user_id)
+        self.__dict__["_claims"] = {name: token.get(name) for name in PROFILE_CLAIMS}
+
+    @property
+    def pk(self):
+        return self._user_id
+
+    user_id = pk
+
+    @property
+    def roles(self):
+        return self._claims["roles"]
+
+    @property
+    def agency_id(self):
+        return self._claims["agency_id"]
+
+    @property
+    def customer_id(self):
+        return self._claims["customer_id"]
+
+    # token chỉ cấp cho user active; user bị khoá giữa chừng -> load() raise khi cần tới dòng User
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        return getattr(other, "pk", None) == self.pk
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication không query user: token có đủ PROFILE_CLAIMS và auth_gen còn khớp generation
+    trong cache -> ClaimsUser.
+    Token cũ (cấp trước khi có claim) hoặc generation đã đổi (khoá tài khoản, đổi quyền ...) -> đọc User
+    từ DB như JWTAuthentication (user bị khoá -> 401).
+    """
+
+    def get_user(self, validated_token):
+        if (
+            api_settings.USER_ID_CLAIM in validated_token
+            and all(name in validated_token for name in PROFILE_CLAIMS)
+            and validated_token["auth_gen"] == generation(validated_token[api_settings.USER_ID_CLAIM])
+        ):
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
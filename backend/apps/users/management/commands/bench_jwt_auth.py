@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.users.authentication import ClaimsJWTAuthentication, add_profile_claims, profile_claims
+from apps.users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_view(authentication_class):
+    # API chỉ cần user_id + roles (kiểu đọc tour public / poll chat)
+    class View(APIView):
+        authentication_classes = [authentication_class]
+        permission_classes = [IsAuthenticated]
+
+        def get(self, request):
+            return Response({"user_id": str(request.user.pk), "roles": request.user.roles})
+
+    return View.as_view()
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh JWTAuthentication (query user mỗi request) với ClaimsJWTAuthentication (user từ claim): "
+        "request/giây qua DRF + số query / request. User tạo trong transaction và rollback khi xong."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        n = max(1, options["requests"])
+        try:
+            with transaction.atomic():
+                suffix = time.time_ns()
+                user = User.objects.create_user(username=f"bench-auth-{suffix}", email=f"u{suffix}@bench.local")
+                token = add_profile_claims(RefreshToken.for_user(user), profile_claims(user.pk)).access_token
+                request = APIRequestFactory().get("/bench/", HTTP_AUTHORIZATION=f"Bearer {token}")
+                results = [
+                    (cls.__name__, *self._run(make_view(cls), request, n))
+                    for cls in (JWTAuthentication, ClaimsJWTAuthentication)
+                ]
+                raise Rollback()
+        except Rollback:
+            pass
+
+        base = results[0][1]
+        for name, rps, queries in results:
+            self.stdout.write(f"{name:24} {rps:8.0f} req/s  {queries:.1f} query/req  x{rps / base:.2f}")
+
+    def _run(self, view, request, n):
+        view(request)   # warm-up
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            for _ in range(n):
+                response = view(request)
+                assert response.status_code == 200, response.data
+            elapsed = time.perf_counter() - start
+        return n / elapsed, len(ctx.captured_queries) / n
@@ -1,12 +1,12 @@
-from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib.auth import get_user_model
 
-User = get_user_model()
+from . import presence
 
 class UpdateLastSeenMiddleware(MiddlewareMixin):
-    def process_view(self, request, view_func, view_args, view_kwargs):
+    # process_response: lúc này request.user đã là user DRF xác thực (JWT), không chỉ session
+    def process_response(self, request, response):
         user = getattr(request, "user", None)
-        if user and user.is_authenticated:
-            User.objects.filter(pk=user.pk).update(last_seen=timezone.now())
-        return None
+        if user is not None and user.is_authenticated:
+            # chỉ ghi buffer / cache, DB được cập nhật theo lô (apps/users/presence.py)
+            presence.touch(user.pk)
+        return response
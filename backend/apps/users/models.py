@@ -31,5 +31,16 @@ class User(AbstractUser):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # đổi các field này -> bỏ user đã cache / claim trong token (apps/users/auth_cache.py)
+    AUTH_FIELDS = ("is_active", "roles")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # giá trị đang lưu trong DB -> signal biết field xác thực có đổi không
+        if all(name in field_names for name in cls.AUTH_FIELDS):
+            instance._db_auth = {name: getattr(instance, name) for name in cls.AUTH_FIELDS}
+        return instance
+
     def __str__(self):
         return f"{self.username} ({self.roles})"
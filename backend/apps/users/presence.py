@@ -0,0 +1,209 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Theo dõi hoạt động (last_seen) không ghi DB mỗi request / mỗi frame WebSocket:
+# - touch(): mỗi user tối đa 1 lần / LAST_SEEN_INTERVAL giây mỗi process được ghi nhận
+#   vào cache (đọc online nhanh, dùng chung giữa các process nếu có Redis) + buffer trong process;
+# - flush(): buffer -> 1 câu UPDATE ... FROM (VALUES ...) cho cả lô, do 1 thread nền mỗi process
+#   chạy sau mỗi LAST_SEEN_FLUSH_INTERVAL giây (sớm hơn nếu buffer đủ LAST_SEEN_FLUSH_SIZE user)
+#   và khi process thoát -> request / frame WebSocket không bao giờ chờ ghi DB.
+# Kết nối WebSocket đếm riêng (connect / disconnect), consumer báo online / offline cho partner.
+# Đọc trạng thái online: online_users() (bulk) thay cho so last_seen trong DB.
+
+CACHE_PREFIX = "presence:"
+
+_lock = threading.Lock()
+_recorded = {}      # user_id -> lần ghi nhận gần nhất trong process (throttle)
+_pending = {}       # user_id -> last_seen chưa ghi DB
+_wake = threading.Event()
+_flusher_pid = None
+
+
+def _cache_key(user_id):
+    return f"{CACHE_PREFIX}{user_id}"
+
+
+def touch(user_id, now=None):
+    """Ghi nhận user vừa hoạt động. Không truy cập DB nhưng gọi cache sync: trong code async bọc sync_to_async."""
+    now = now or timezone.now()
+    with _lock:
+        last = _recorded.get(user_id)
+        if last is not None and (now - last).total_seconds() < settings.LAST_SEEN_INTERVAL:
+            return False
+        _recorded[user_id] = now
+        _pending[user_id] = now
+        if len(_pending) >= settings.LAST_SEEN_FLUSH_SIZE:
+            _wake.set()
+        _ensure_flusher()
+
+    cache.set(_cache_key(user_id), now.timestamp(), timeout=settings.ONLINE_WINDOW + settings.LAST_SEEN_INTERVAL)
+    return True
+
+
+def _ensure_flusher():
+    # gọi khi đang giữ _lock; theo pid để process con sau fork (gunicorn) tự chạy thread riêng
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="presence-flush", daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        interval = settings.LAST_SEEN_FLUSH_INTERVAL
+        _wake.wait(interval if interval > 0 else 1)
+        _wake.clear()
+        if settings.LAST_SEEN_FLUSH_INTERVAL <= 0:
+            continue   # 0: tắt flush nền, tự gọi flush() (test)
+        try:
+            flush()
+        except Exception:
+            pass   # đã log trong flush(), lô được giữ lại cho lần sau
+        finally:
+            connection.close()
+
+
+def flush():
+    """Ghi toàn bộ buffer vào users_user.last_seen trong 1 câu UPDATE. Trả số user trong lô."""
+    with _lock:
+        batch = list(_pending.items())
+        _pending.clear()
+        # bỏ các mốc throttle đã hết hạn để dict không phình mãi
+        cutoff = timezone.now() - timedelta(seconds=settings.LAST_SEEN_INTERVAL)
+        for user_id in [u for u, seen in _recorded.items() if seen < cutoff]:
+            del _recorded[user_id]
+    if not batch:
+        return 0
+
+    try:
+        _write(batch)
+    except Exception:
+        # giữ lại để lần flush sau ghi tiếp (mốc mới hơn thì thắng)
+        logger.exception("flush last_seen thất bại (%s user)", len(batch))
+        with _lock:
+            for user_id, seen in batch:
+                if _pending.get(user_id) is None or _pending[user_id] < seen:
+                    _pending[user_id] = seen
+        raise
+    return len(batch)
+
+
+def _write(batch):
+    from .models import User
+
+    table = connection.ops.quote_name(User._meta.db_table)
+    pk = connection.ops.quote_name(User._meta.pk.column)
+    values = ", ".join(["(%s::uuid, %s::timestamptz)"] * len(batch))
+    params = [value for pair in batch for value in pair]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} AS u SET last_seen = v.seen "
+            f"FROM (VALUES {values}) AS v(user_id, seen) "
+            f"WHERE u.{pk} = v.user_id AND (u.last_seen IS NULL OR u.last_seen < v.seen)",
+            params,
+        )
+
+
+# ---- Kết nối WebSocket đang mở: đếm theo user trong cache (nhiều tab = nhiều kết nối) ----
+
+def _conn_key(user_id):
+    return f"{CACHE_PREFIX}conn:{user_id}"
+
+
+def group_name(user_id):
+    """Group channel layer riêng của user: nhận thay đổi online / offline của các partner."""
+    return f"presence_{user_id}"
+
+
+def connect(user_id):
+    """Thêm 1 kết nối WebSocket của user. True nếu là kết nối đầu tiên (user vừa online)."""
+    key = _conn_key(user_id)
+    ttl = settings.PRESENCE_CONNECTION_TTL
+    cache.add(key, 0, timeout=ttl)
+    try:
+        count = cache.incr(key)
+    except ValueError:   # key hết hạn giữa add và incr
+        cache.set(key, 1, timeout=ttl)
+        count = 1
+    cache.touch(key, ttl)
+    touch(user_id)
+    return count == 1
+
+
+def refresh_connection(user_id):
+    """Gia hạn bộ đếm kết nối (process chết không kịp disconnect -> tự hết hạn sau TTL)."""
+    cache.touch(_conn_key(user_id), settings.PRESENCE_CONNECTION_TTL)
+
+
+def disconnect(user_id):
+    """Bớt 1 kết nối. True nếu user không còn kết nối nào (vừa offline)."""
+    key = _conn_key(user_id)
+    try:
+        count = cache.decr(key)
+    except ValueError:
+        return True
+    if count <= 0:
+        cache.delete(key)
+        return True
+    return False
+
+
+# ---- Đọc trạng thái online ----
+
+def online_users(user_ids, last_seen=None):
+    """
+    Tập user_id đang online: còn kết nối WebSocket hoặc hoạt động trong ONLINE_WINDOW giây.
+    Xem mốc mới hơn giữa buffer trong process và `last_seen` ({user_id: giá trị DB} nếu đã đọc sẵn)
+    trước, phần còn lại 1 lần cache.get_many cho cả danh sách.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    last_seen = last_seen or {}
+    cutoff = timezone.now() - timedelta(seconds=settings.ONLINE_WINDOW)
+
+    online = set()
+    with _lock:
+        for user_id in user_ids:
+            # buffer chỉ có mốc của process này: process khác có thể đã ghi DB mốc mới hơn
+            seen = max(filter(None, (_recorded.get(user_id), last_seen.get(user_id))), default=None)
+            if seen is not None and seen > cutoff:
+                online.add(user_id)
+
+    keys = {}
+    for user_id in user_ids - online:
+        keys[_conn_key(user_id)] = (user_id, True)
+        keys[_cache_key(user_id)] = (user_id, False)
+    if keys:
+        for key, value in cache.get_many(list(keys)).items():
+            user_id, is_connection = keys[key]
+            if (value > 0) if is_connection else (value > cutoff.timestamp()):
+                online.add(user_id)
+    return online
+
+
+def is_online(user_id, stored=None, online=None):
+    """
+    1 user. `stored`: last_seen trong DB nếu có; `online`: kết quả online_users() đã tính sẵn
+    cho cả trang (serializer list) -> không đọc cache thêm.
+    """
+    if online is not None:
+        return user_id in online
+    return user_id in online_users([user_id], {user_id: stored})
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
@@ -0,0 +1,78 @@
+import uuid
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import User
+
+# hồ sơ agency / customer của user đang gọi API, tính 1 lần cho cả request:
+# view, serializer (context["request"]) và permission dùng chung qua request_profiles(request)
+_ATTR = "_profiles"
+
+
+def _related(obj, name):
+    # OneToOne ngược đã select_related: không có dòng -> RelatedObjectDoesNotExist
+    try:
+        return getattr(obj, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def _uuid(value):
+    return uuid.UUID(str(value)) if value else None
+
+
+class RequestProfiles:
+    """
+    agency_id / customer_id: lấy từ claim của token nếu có (không query);
+    claim rỗng (token cấp trước khi đăng ký agency ...) hoặc cần cả object -> load(), 1 query
+    join user + agency + customer.
+    """
+
+    def __init__(self, user):
+        self.owner = user
+        self.user = user if user is not None and user.is_authenticated else None
+        self._agency = self._customer = None
+        self._loaded = self.user is None
+
+    def load(self):
+        if self._loaded:
+            return
+        row = User.objects.select_related("agency_profile", "customer").filter(pk=self.user.pk).first()
+        if row is not None:
+            self._agency, self._customer = _related(row, "agency_profile"), _related(row, "customer")
+        self._loaded = True
+
+    @property
+    def agency(self):
+        self.load()
+        return self._agency
+
+    @property
+    def customer(self):
+        self.load()
+        return self._customer
+
+    @property
+    def agency_id(self):
+        claim = getattr(self.user, "agency_id", None)   # chỉ ClaimsUser có
+        if claim:
+            return _uuid(claim)
+        return self.agency.pk if self.agency else None
+
+    @property
+    def customer_id(self):
+        claim = getattr(self.user, "customer_id", None)
+        if claim:
+            return _uuid(claim)
+        return self.customer.pk if self.customer else None
+
+
+def request_profiles(request):
+    """RequestProfiles của request.user, nhớ trên HttpRequest (DRF Request và view con dùng chung)."""
+    http_request = getattr(request, "_request", request)
+    user = getattr(request, "user", None)
+    profiles = getattr(http_request, _ATTR, None)
+    if profiles is None or profiles.owner is not user:
+        profiles = RequestProfiles(user)
+        setattr(http_request, _ATTR, profiles)
+    return profiles
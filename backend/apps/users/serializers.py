@@ -4,6 +4,7 @@ from django.contrib.auth.password_validation import validate_password
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import add_profile_claims, profile_claims
 from django.db.models import Q
 from django.db import IntegrityError
 from datetime import date
@@ -125,7 +126,8 @@ class LoginSerializer(serializers.Serializer):
             })
 
         # Nếu mọi thứ hợp lệ
-        refresh = RefreshToken.for_user(user)
+        # roles / agency_id / customer_id đi theo token -> API không phải đọc lại user mỗi request
+        refresh = add_profile_claims(RefreshToken.for_user(user), profile_claims(user.pk))
         attrs['user'] = user
         attrs['refresh'] = str(refresh)
         attrs['access'] = str(refresh.access_token)
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .auth_cache import invalidate_user
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def invalidate_auth_cache(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Khoá tài khoản / đổi quyền (User.AUTH_FIELDS) -> bỏ user đã cache và claim trong token,
+    không chờ hết AUTH_USER_CACHE_TTL / hạn access token.
+    """
+    if created or (update_fields is not None and not set(update_fields) & set(User.AUTH_FIELDS)):
+        return
+    current = {name: getattr(instance, name) for name in User.AUTH_FIELDS}
+    old, instance._db_auth = getattr(instance, "_db_auth", None), current
+    if old == current:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user(user_id))
@@ -1,3 +1,240 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import site
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.agencies.models import Agency
+from apps.customers.models import Customer
+from apps.tours.tests import auth_client, make_agency, make_user
+from . import presence
+from .auth_cache import USER_FIELDS, _generation_key, _user_key, invalidate_user, user_for_token
+from .authentication import ClaimsJWTAuthentication, ClaimsUser
+from .models import User
+from .presence import is_online
+
+
+class UserQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("khach", full_name="Trần Thị B")
+
+    def test_profile(self):
+        # user (JWT)
+        with self.assertNumQueries(1):
+            res = auth_client(self.user).get(reverse("profile"))
+        self.assertEqual(res.data["data"]["username"], "khach")
+
+
+@override_settings(LAST_SEEN_FLUSH_INTERVAL=0, LAST_SEEN_INTERVAL=60)
+class PresenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        presence.flush()
+        presence._recorded.clear()
+        self.users = [make_user(f"khach{i}") for i in range(3)]
+
+    def test_requests_do_not_write_last_seen(self):
+        client = auth_client(self.users[0])
+        for _ in range(3):
+            # chỉ query load user (JWT), không UPDATE last_seen
+            with self.assertNumQueries(1):
+                client.get(reverse("profile"))
+
+        self.assertIsNone(User.objects.get(pk=self.users[0].pk).last_seen)
+        self.assertTrue(is_online(self.users[0].pk, None))
+        self.assertFalse(is_online(self.users[1].pk, None))
+
+    def test_flush_batches_and_throttles(self):
+        now = timezone.now()
+        for user in self.users:
+            self.assertTrue(presence.touch(user.pk, now))
+        # trong LAST_SEEN_INTERVAL: không ghi nhận lại
+        self.assertFalse(presence.touch(self.users[0].pk, now + timedelta(seconds=30)))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(presence.flush(), 3)
+        self.assertEqual(set(User.objects.values_list("last_seen", flat=True)), {now})
+        self.assertEqual(presence.flush(), 0)
+
+        # không ghi lùi last_seen
+        later = now + timedelta(seconds=90)
+        User.objects.filter(pk=self.users[1].pk).update(last_seen=later + timedelta(minutes=1))
+        presence.touch(self.users[0].pk, later)
+        presence.touch(self.users[1].pk, later)
+        presence.flush()
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).last_seen, later)
+        self.assertEqual(User.objects.get(pk=self.users[1].pk).last_seen, later + timedelta(minutes=1))
+
+    def test_connection_refcount_and_bulk_lookup(self):
+        a, b, c = self.users
+        self.assertTrue(presence.connect(a.pk))
+        self.assertFalse(presence.connect(a.pk))   # tab thứ 2
+        presence._recorded.clear()
+        cache.delete(presence._cache_key(a.pk))
+
+        stale = timezone.now() - timedelta(minutes=10)
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            online = presence.online_users([a.pk, b.pk, c.pk], {b.pk: timezone.now(), c.pk: stale})
+        self.assertEqual(online, {a.pk, b.pk})
+        get_many.assert_called_once()
+
+        self.assertFalse(presence.disconnect(a.pk))
+        self.assertTrue(presence.disconnect(a.pk))
+        self.assertEqual(presence.online_users([a.pk]), set())
+
+    def test_db_last_seen_newer_than_buffer(self):
+        a = self.users[0]
+        # process này ghi nhận từ lâu, process khác vừa ghi DB mốc mới
+        presence.touch(a.pk, timezone.now() - timedelta(minutes=10))
+        cache.delete(presence._cache_key(a.pk))
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            self.assertEqual(presence.online_users([a.pk], {a.pk: timezone.now()}), {a.pk})
+        get_many.assert_not_called()
+
+
+class AuthUserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("khach")
+        self.token = str(AccessToken.for_user(self.user))
+
+    def test_cached_until_password_change(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(user_for_token(self.token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_for_token(self.token), self.user)
+
+        res = auth_client(self.user).put(
+            reverse("change_password"),
+            {"current_password": "x", "new_password": "Mk-moi-2026!"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 200, res.data)
+        with self.assertNumQueries(1):
+            user = user_for_token(self.token)
+        # password không nằm trong cache -> deferred, đọc từ DB
+        self.assertTrue(user.check_password("Mk-moi-2026!"))
+
+    def test_caches_only_light_fields(self):
+        user_for_token(self.token)
+        _, values = cache.get(_user_key(self.user.pk, AccessToken(self.token)))
+        self.assertEqual(set(values), set(USER_FIELDS))   # không có password hash
+
+        with self.assertNumQueries(0):
+            user = user_for_token(self.token)
+            self.assertEqual((user.pk, user.username, user.roles), (self.user.pk, "khach", [User.CUSTOMER]))
+        self.assertIn("password", user.get_deferred_fields())
+
+    def test_deactivation_invalidates_cached_user(self):
+        user_for_token(self.token)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertIsNone(user_for_token(self.token))
+
+    def test_evicted_generation_does_not_revive_stale_user(self):
+        with self.assertNumQueries(1):
+            user_for_token(self.token)
+        # generation bị evict -> bản cache đang có coi như cũ, không quay về mốc cố định
+        cache.delete(_generation_key(self.user.pk))
+        with self.assertNumQueries(1):
+            user_for_token(self.token)
+        with self.assertNumQueries(0):
+            user_for_token(self.token)
+
+        cache.delete(_generation_key(self.user.pk))
+        invalidate_user(self.user.pk)
+        self.assertGreater(cache.get(_generation_key(self.user.pk)), 1)
+        with self.assertNumQueries(1):
+            user_for_token(self.token)
+
+    def test_rejects_invalid_token_and_inactive_user(self):
+        self.assertIsNone(user_for_token("not-a-token"))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(user_for_token(self.token))
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = make_user("khach")
+
+    def login(self):
+        res = APIClient().post(reverse("login"), {"login": "khach", "password": "x"}, format="json")
+        self.assertEqual(res.status_code, 200, res.data)
+        return res
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_claims_without_user_query(self):
+        customer = Customer.objects.get(user=self.user)
+        access = self.login().data["data"]["access"]
+
+        with self.assertNumQueries(0):
+            user = self.authenticate(access)
+            self.assertTrue(user and user.is_authenticated)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.roles, [User.CUSTOMER])
+            self.assertEqual(user.customer_id, str(customer.pk))
+            self.assertIsNone(user.agency_id)
+        # field ngoài claim -> load user 1 lần
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.user.email)
+            self.assertIsInstance(user, User)
+
+    def test_token_without_claims_loads_user(self):
+        with self.assertNumQueries(1):
+            user = self.authenticate(AccessToken.for_user(self.user))
+        self.assertIs(type(user), User)
+
+    def test_deactivation_and_role_change_revoke_claims(self):
+        access = self.login().data["data"]["access"]
+        user = User.objects.get(pk=self.user.pk)
+        user.roles = [User.CUSTOMER, User.PROVIDER]
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        # generation đổi -> bỏ claim roles cũ, đọc lại user từ DB
+        with self.assertNumQueries(1):
+            fresh = self.authenticate(access)
+        self.assertIs(type(fresh), User)
+        self.assertEqual(fresh.roles, [User.CUSTOMER, User.PROVIDER])
+
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_agency_approval_revokes_claims(self):
+        agency = make_agency("khach2", status="pending", verified=False)
+        res = APIClient().post(reverse("login"), {"login": "khach2", "password": "x"}, format="json")
+        access = res.data["data"]["access"]
+        self.assertIs(type(self.authenticate(access)), ClaimsUser)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            site._registry[Agency]._approve([agency.pk])
+        user = self.authenticate(access)
+        self.assertIs(type(user), User)
+        self.assertIn(User.PROVIDER, user.roles)
+
+    def test_refresh_reloads_claims(self):
+        client = APIClient()
+        client.cookies["refresh_token"] = self.login().cookies["refresh_token"].value
+        User.objects.filter(pk=self.user.pk).update(roles=[User.CUSTOMER, User.PROVIDER])
+
+        res = client.post(reverse("token_refresh"))
+        self.assertEqual(res.status_code, 200, res.data)
+        self.assertEqual(AccessToken(res.data["access"])["roles"], [User.CUSTOMER, User.PROVIDER])
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(client.post(reverse("token_refresh")).status_code, 401)
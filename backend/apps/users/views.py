@@ -4,9 +4,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from django.core.exceptions import ValidationError
 from rest_framework.exceptions import ValidationError as DRFValidationError
+from .auth_cache import invalidate_user
+from .authentication import add_profile_claims, profile_claims
 from .models import User
 from .serializers import (
     UserRegisterSerializer,
@@ -150,7 +153,11 @@ class RefreshTokenView(APIView):
 
         try:
             refresh = RefreshToken(refresh_token)
-            new_access = str(refresh.access_token)
+            # đọc lại claim từ DB: quyền / agency thay đổi có hiệu lực từ access token kế tiếp
+            claims = profile_claims(refresh[api_settings.USER_ID_CLAIM])
+            if claims is None:
+                raise TokenError("User không còn hoạt động.")
+            new_access = str(add_profile_claims(refresh, claims).access_token)
 
             resp = Response(
                 {
@@ -220,6 +227,8 @@ class ChangePasswordView(APIView):
         ser.is_valid(raise_exception=True)
         request.user.set_password(ser.validated_data["new_password"])
         request.user.save()
+        # user cache cho WebSocket (apps/users/auth_cache.py)
+        invalidate_user(request.user.pk)
         return Response(
             {"message": "Đổi mật khẩu thành công."},
             status=status.HTTP_200_OK,
@@ -248,6 +257,8 @@ class LogoutView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        invalidate_user(request.user.pk)
+
         response = Response(
             {"message": "Đăng xuất thành công."},
             status=status.HTTP_200_OK,
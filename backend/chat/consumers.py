@@ -1,11 +1,11 @@
 import json
-from datetime import timedelta
 
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from django.utils import timezone
+from django.db.models import Q
 
+from apps.users import presence
 from .models import Conversation, Message
 
 User = get_user_model()
@@ -20,6 +20,13 @@ def user_in_conversation(user, conversation_id):
         return False
 
 
+@database_sync_to_async
+def partner_ids(user):
+    """user_id của mọi người đang có cuộc trò chuyện với user (nhận thông báo online / offline)."""
+    pairs = Conversation.objects.filter(Q(user1=user) | Q(user2=user)).values_list("user1_id", "user2_id")
+    return {u2 if u1 == user.pk else u1 for u1, u2 in pairs}
+
+
 @database_sync_to_async
 def create_message(conversation_id, user, content: str):
     conversation = Conversation.objects.get(conversation_id=conversation_id)
@@ -33,17 +40,26 @@ def create_message(conversation_id, user, content: str):
     return message
 
 
+# presence gọi cache sync (Redis: I/O mạng) -> chạy trong thread pool, không chặn event loop
+presence_connect = database_sync_to_async(presence.connect)
+presence_disconnect = database_sync_to_async(presence.disconnect)
+
+
+@database_sync_to_async
+def presence_touch(user_id):
+    # gia hạn bộ đếm kết nối cùng nhịp throttle của touch()
+    if presence.touch(user_id):
+        presence.refresh_connection(user_id)
+
+
 @database_sync_to_async
 def serialize_message(message: Message):
     """
     Trả về JSON message dùng chung cho cả API & WebSocket.
-    Thêm is_online dựa trên last_seen của sender.
+    Thêm is_online dựa trên last_seen của sender (buffer presence trước, rồi tới DB).
     """
     sender = message.sender
-
-    is_online = False
-    if sender.last_seen:
-        is_online = timezone.now() - sender.last_seen < timedelta(minutes=2)
+    is_online = presence.is_online(sender.pk, sender.last_seen)
 
     return {
         "message_id": str(message.message_id),
@@ -59,14 +75,6 @@ def serialize_message(message: Message):
     }
 
 
-@database_sync_to_async
-def update_last_seen(user: User):
-    """
-    Cập nhật thời gian hoạt động gần nhất của user.
-    Dùng để tính trạng thái online.
-    """
-    User.objects.filter(pk=user.pk).update(last_seen=timezone.now())
-
 @database_sync_to_async
 def mark_message_read(message_id: str):
     """
@@ -95,16 +103,38 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             await self.close()
             return
 
-        # Cập nhật last_seen khi connect
-        await update_last_seen(user)
-
-        # Join group
+        # Join group (phòng chat + group presence riêng của user)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.channel_layer.group_add(presence.group_name(user.pk), self.channel_name)
+        # token gửi qua Sec-WebSocket-Protocol -> phải chọn lại protocol đó, không trình duyệt đóng kết nối
+        await self.accept(subprotocol=self.scope.get("auth_subprotocol"))
+
+        # Đếm kết nối (nhiều tab), kết nối đầu tiên -> báo partner user vừa online
+        self.presence_user = user
+        if await presence_connect(user.pk):
+            await self.broadcast_presence(user, True)
 
     async def disconnect(self, close_code):
         # Rời group khi disconnect
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+        user = getattr(self, "presence_user", None)
+        if user is None:
+            return
+        await self.channel_layer.group_discard(presence.group_name(user.pk), self.channel_name)
+        # đóng tab cuối cùng -> báo partner user offline
+        if await presence_disconnect(user.pk):
+            await self.broadcast_presence(user, False)
+
+    async def broadcast_presence(self, user, online):
+        event = {"type": "presence.update", "user_id": str(user.pk), "is_online": online}
+        for partner_id in await partner_ids(user):
+            await self.channel_layer.group_send(presence.group_name(partner_id), event)
+
+    async def presence_update(self, event):
+        """Partner vừa online / offline -> gửi xuống client."""
+        await self.send_json({"type": "presence", "user_id": event["user_id"], "is_online": event["is_online"]})
 
     async def receive_json(self, content, **kwargs):
         """
@@ -119,8 +149,8 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             await self.close()
             return
 
-        # Mỗi lần user gửi tin → cũng coi là đang active
-        await update_last_seen(user)
+        # Mỗi lần user gửi tin → cũng coi là đang active (+ gia hạn bộ đếm kết nối)
+        await presence_touch(user.pk)
 
         msg_type = content.get("type")
         if msg_type == "message":
@@ -1,37 +1,55 @@
+from http.cookies import SimpleCookie
 from urllib.parse import parse_qs
 
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
-from django.conf import settings
-from django.contrib.auth import get_user_model
+
+# client gửi token qua header Sec-WebSocket-Protocol: new WebSocket(url, ["access_token", token]);
+# server phải chọn lại đúng protocol này khi accept (ChatConsumer đọc scope["auth_subprotocol"])
+TOKEN_SUBPROTOCOL = "access_token"
+TOKEN_COOKIE = "access_token"
 
 
 @database_sync_to_async
 def get_user_from_token(token: str):
-    from rest_framework_simplejwt.tokens import AccessToken
+    from apps.users.auth_cache import user_for_token
 
     try:
-        access = AccessToken(token)
-        user_id = access.get(settings.SIMPLE_JWT["USER_ID_CLAIM"], None)
-        if not user_id:
-            return None
-
-        User = get_user_model()  
-        return User.objects.get(user_id=user_id)
+        return user_for_token(token)
     except Exception:
         return None
 
 
+def get_token(scope):
+    """
+    Access token của handshake, theo thứ tự: Sec-WebSocket-Protocol, cookie access_token,
+    query ?token= (cách cũ, token dễ lọt vào log). Trả (token, subprotocol cần chọn khi accept).
+    Cookie trình duyệt gửi kèm cả từ trang khác: config/asgi.py kiểm tra Origin trước middleware này.
+    """
+    subprotocols = scope.get("subprotocols") or []
+    if TOKEN_SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(TOKEN_SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], TOKEN_SUBPROTOCOL
+
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(TOKEN_COOKIE)
+            if morsel is not None and morsel.value:
+                return morsel.value, None
+
+    token_list = parse_qs(scope.get("query_string", b"").decode()).get("token", [])
+    return (token_list[0] if token_list else None), None
+
+
 class JWTAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
-        query_string = scope.get("query_string", b"").decode()
-        params = parse_qs(query_string)
-        token_list = params.get("token", [])
+        token, subprotocol = get_token(scope)
 
         scope["user"] = None
+        scope["auth_subprotocol"] = subprotocol
 
-        if token_list:
-            token = token_list[0]
+        if token:
             user = await get_user_from_token(token)
             if user is not None:
                 scope["user"] = user
@@ -1,14 +1,15 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Conversation, Message
-from datetime import timedelta
-from django.utils import timezone
+
+from apps.users.presence import is_online
+from utils.fastpath import FastRowSerializer
 
 User = get_user_model()
 
 
 class SimpleUserSerializer(serializers.ModelSerializer):
-    """User rút gọn để hiển thị partner."""
+    """User rút gọn để hiển thị partner. is_online: context["online_users"] (view tính sẵn cho cả list) nếu có."""
 
     is_online = serializers.SerializerMethodField()
     class Meta:
@@ -16,9 +17,7 @@ class SimpleUserSerializer(serializers.ModelSerializer):
         fields = ("user_id", "full_name", "username","is_online")
 
     def get_is_online(self, obj):
-        if not obj.last_seen:
-            return False
-        return timezone.now() - obj.last_seen < timedelta(minutes=2)  # online nếu hoạt động trong 2p gần đây
+        return is_online(obj.pk, obj.last_seen, self.context.get("online_users"))
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -53,7 +52,7 @@ class ConversationListSerializer(serializers.ModelSerializer):
         if current_user is None or not getattr(current_user, "is_authenticated", False):
             return None
 
-        if obj.user1 == current_user:
+        if obj.user1_id == current_user.pk:
             partner = obj.user2
         else:
             partner = obj.user1
@@ -68,7 +67,58 @@ class ConversationListSerializer(serializers.ModelSerializer):
         if current_user is None or not getattr(current_user, "is_authenticated", False):
             return 0
 
-        return obj.messages.filter(is_read=False).exclude(sender=current_user).count()
+        # ConversationListView đã annotate sẵn -> không query thêm
+        annotated = getattr(obj, "unread_count", None)
+        if annotated is not None:
+            return annotated
+
+        return obj.messages.filter(is_read=False).exclude(sender_id=current_user.pk).count()
+
+
+_PARTNER_COLUMNS = ("user_id", "full_name", "username", "last_seen")
+
+
+def _fast_partner(context, *values):
+    request = context.get("request", None)
+    current_user = getattr(request, "user", None)
+    if current_user is None or not getattr(current_user, "is_authenticated", False):
+        return None
+
+    user1, user2 = values[:4], values[4:]
+    user_id, full_name, username, last_seen = user2 if user1[0] == current_user.pk else user1
+    return {
+        "user_id": str(user_id),
+        "full_name": full_name,
+        "username": username,
+        "is_online": is_online(user_id, last_seen, context.get("online_users")),
+    }
+
+
+def _fast_unread_count(context, unread_count):
+    request = context.get("request", None)
+    current_user = getattr(request, "user", None)
+    if current_user is None or not getattr(current_user, "is_authenticated", False):
+        return 0
+    return unread_count
+
+
+class ConversationListFastSerializer(FastRowSerializer):
+    """
+    ConversationListSerializer bản đọc .values() cho ConversationListView
+    (queryset phải annotate `unread_count`).
+    """
+    serializer_class = ConversationListSerializer
+    computed = {
+        "partner": (
+            tuple(f"user1__{c}" for c in _PARTNER_COLUMNS) + tuple(f"user2__{c}" for c in _PARTNER_COLUMNS),
+            _fast_partner,
+        ),
+        "unread_count": (("unread_count",), _fast_unread_count),
+        "last_message.sender.is_online": (
+            ("user_id", "last_seen"),
+            lambda context, user_id, last_seen: is_online(user_id, last_seen, context.get("online_users")),
+        ),
+    }
 
 
 class MessageListSerializer(serializers.ModelSerializer):
@@ -1,3 +1,138 @@
-from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from channels.routing import URLRouter
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.tours.tests import auth_client, fast_and_slow, make_user
+from apps.users.presence import online_users
+from .middleware import JWTAuthMiddlewareStack
+from .models import Conversation, Message
+from .routing import websocket_urlpatterns
+
+try:
+    from channels.testing import WebsocketCommunicator
+except ImportError:   # channels.testing cần daphne
+    WebsocketCommunicator = None
+
+
+class ChatQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user("khach")
+        cls.conversations = []
+        for i in range(3):
+            partner = make_user(f"agency{i}")
+            conv = Conversation.get_or_create_conversation(cls.user, partner)
+            for sender in (cls.user, partner, partner):
+                msg = Message.objects.create(conversation=conv, sender=sender, content="Xin chào")
+            conv.last_message = msg
+            conv.save(update_fields=["last_message", "updated_at"])
+            cls.conversations.append(conv)
+        # partner đang online + 1 cuộc trò chuyện chưa có tin nhắn
+        partner.last_seen = timezone.now()
+        partner.save(update_fields=["last_seen"])
+        Conversation.get_or_create_conversation(make_user("moi", full_name="Lê Văn C"), cls.user)
+
+    def setUp(self):
+        self.client = auth_client(self.user)
+
+    def test_conversation_list(self):
+        # user (JWT) + conversation JOIN users/last_message/sender + unread_count
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("conversation-list"))
+        self.assertEqual(len(res.data["data"]), 4)
+        self.assertEqual({row["unread_count"] for row in res.data["data"]}, {0, 2})
+
+    def test_conversation_list_fast_path_identical(self):
+        fast, slow = fast_and_slow(self.client, reverse("conversation-list"))
+        self.assertEqual(fast, slow)
+        self.assertIn(b'"is_online":true', fast)
+        self.assertIn(b'"last_message":null', fast)
+
+    def test_conversation_detail(self):
+        url = reverse("conversation-detail", args=[self.conversations[0].conversation_id])
+        # user (JWT) + conversation JOIN user1/user2
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_messages(self):
+        url = reverse("conversation-messages", args=[self.conversations[0].conversation_id])
+        # user (JWT) + conversation + mark read + messages JOIN sender
+        with self.assertNumQueries(4):
+            res = self.client.get(url)
+        self.assertEqual(len(res.data["data"]), 3)
+
+
+@skipUnless(WebsocketCommunicator, "cần channels.testing (daphne)")
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class PresenceWebSocketTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("khach")
+        self.partner = make_user("agency")
+        self.conversation = Conversation.get_or_create_conversation(self.user, self.partner)
+
+    def communicator(self, user):
+        token = str(AccessToken.for_user(user))
+        path = f"/ws/chat/{self.conversation.conversation_id}/?token={token}"
+        return WebsocketCommunicator(JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns)), path)
+
+    async def test_partner_notified_once_per_user(self):
+        partner = self.communicator(self.partner)
+        self.assertTrue((await partner.connect())[0])
+        await partner.receive_nothing()   # user chưa online -> không có gì
+
+        tabs = [self.communicator(self.user), self.communicator(self.user)]
+        for tab in tabs:
+            self.assertTrue((await tab.connect())[0])
+        # 2 tab -> chỉ 1 thông báo online
+        self.assertEqual(
+            await partner.receive_json_from(),
+            {"type": "presence", "user_id": str(self.user.pk), "is_online": True},
+        )
+        await partner.receive_nothing()
+        self.assertIn(self.user.pk, online_users([self.user.pk, self.partner.pk]))
+
+        await tabs[0].disconnect()
+        await partner.receive_nothing()   # vẫn còn 1 tab
+        await tabs[1].disconnect()
+        self.assertEqual(
+            await partner.receive_json_from(),
+            {"type": "presence", "user_id": str(self.user.pk), "is_online": False},
+        )
+        await partner.disconnect()
+
+    async def test_token_from_cookie_or_subprotocol(self):
+        token = str(AccessToken.for_user(self.user))
+        app = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        path = f"/ws/chat/{self.conversation.conversation_id}/"
+
+        by_cookie = WebsocketCommunicator(app, path, headers=[(b"cookie", f"access_token={token}".encode())])
+        self.assertTrue((await by_cookie.connect())[0])
+        await by_cookie.disconnect()
+
+        by_protocol = WebsocketCommunicator(app, path, subprotocols=["access_token", token])
+        connected, subprotocol = await by_protocol.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, "access_token")
+        await by_protocol.disconnect()
+
+        anonymous = WebsocketCommunicator(app, path)
+        self.assertFalse((await anonymous.connect())[0])
+
+    async def test_cookie_from_foreign_origin_rejected(self):
+        from config.asgi import application
+
+        cookie = (b"cookie", f"access_token={AccessToken.for_user(self.user)}".encode())
+        path = f"/ws/chat/{self.conversation.conversation_id}/"
+
+        foreign = WebsocketCommunicator(application, path, headers=[cookie, (b"origin", b"https://evil.example")])
+        self.assertFalse((await foreign.connect())[0])
+
+        own = WebsocketCommunicator(application, path, headers=[cookie, (b"origin", b"http://localhost:3000")])
+        self.assertTrue((await own.connect())[0])
+        await own.disconnect()
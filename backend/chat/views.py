@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status, generics
@@ -8,9 +8,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 
+from apps.users.presence import online_users
+from utils.fastpath import FastListViewMixin
+
 from .models import Conversation, Message
 from .serializers import (
     ConversationListSerializer,
+    ConversationListFastSerializer,
     MessageListSerializer,
     ConversationDetailSerializer,
 )
@@ -18,18 +22,31 @@ from .serializers import (
 User = get_user_model()
 
 
+def page_online_users(users):
+    """[(user_id, last_seen)] -> tập user online (presence.online_users) cho serializer context."""
+    last_seen = {user_id: seen for user_id, seen in users if user_id is not None}
+    return online_users(last_seen, last_seen)
+
+
 # =====================================
 # 1) LẤY DANH SÁCH CONVERSATION
 # =====================================
-class ConversationListView(generics.ListAPIView):
+class ConversationListView(FastListViewMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ConversationListSerializer
+    fast_serializer_class = ConversationListFastSerializer
 
     def get_queryset(self):
         user = self.request.user
         return (
-            Conversation.objects.filter(Q(user1=user) | Q(user2=user))
-            .select_related("user1", "user2", "last_message")
+            Conversation.objects.filter(Q(user1_id=user.pk) | Q(user2_id=user.pk))
+            .select_related("user1", "user2", "last_message__sender")
+            .annotate(
+                unread_count=Count(
+                    "messages",
+                    filter=Q(messages__is_read=False) & ~Q(messages__sender_id=user.pk),
+                )
+            )
             .order_by("-updated_at")
         )
 
@@ -44,12 +61,31 @@ class ConversationListView(generics.ListAPIView):
         Trả về: { message, data: [...] }
         """
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        if self.use_fast_path():
+            fast = self.get_fast_serializer()
+            rows = list(fast.values(queryset))
+            # online của mọi user trong list: 1 lần tra presence
+            fast.context["online_users"] = page_online_users(
+                (row[f"{prefix}__user_id"], row[f"{prefix}__last_seen"])
+                for row in rows
+                for prefix in ("user1", "user2", "last_message__sender")
+            )
+            data = fast.serialize(rows)
+        else:
+            conversations = list(queryset)
+            online = page_online_users(
+                (user.pk, user.last_seen)
+                for conv in conversations
+                for user in (conv.user1, conv.user2, conv.last_message.sender if conv.last_message else None)
+                if user is not None
+            )
+            context = {**self.get_serializer_context(), "online_users": online}
+            data = self.get_serializer(conversations, many=True, context=context).data
 
         return Response(
             {
                 "message": "Lấy danh sách cuộc trò chuyện thành công.",
-                "data": serializer.data,
+                "data": data,
             },
             status=status.HTTP_200_OK,
         )
@@ -67,7 +103,7 @@ class ConversationMessagesView(generics.ListCreateAPIView):
         conversation = get_object_or_404(Conversation, conversation_id=conv_id)
 
         user = self.request.user
-        if conversation.user1 != user and conversation.user2 != user:
+        if user.pk not in (conversation.user1_id, conversation.user2_id):
             raise PermissionDenied("Bạn không thuộc cuộc trò chuyện này.")
 
         return conversation
@@ -79,7 +115,7 @@ class ConversationMessagesView(generics.ListCreateAPIView):
         # Auto mark read
         conversation.messages.filter(
             is_read=False
-        ).exclude(sender=user).update(is_read=True)
+        ).exclude(sender_id=user.pk).update(is_read=True)
 
         return conversation.messages.select_related("sender").order_by("created_at")
 
@@ -87,8 +123,11 @@ class ConversationMessagesView(generics.ListCreateAPIView):
         """
         GET /api/chat/conversations/<id>/messages/
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        messages = list(self.get_queryset())
+        online = page_online_users((m.sender.pk, m.sender.last_seen) for m in messages)
+        serializer = self.get_serializer(
+            messages, many=True, context={**self.get_serializer_context(), "online_users": online}
+        )
 
         return Response(
             {
@@ -194,13 +233,16 @@ class ConversationDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Conversation.objects.filter(Q(user1=user) | Q(user2=user))
+        return (
+            Conversation.objects.filter(Q(user1_id=user.pk) | Q(user2_id=user.pk))
+            .select_related("user1", "user2")
+        )
 
     def get_object(self):
         conversation = super().get_object()
         user = self.request.user
 
-        if conversation.user1 != user and conversation.user2 != user:
+        if user.pk not in (conversation.user1_id, conversation.user2_id):
             raise PermissionDenied("Bạn không thuộc cuộc trò chuyện này.")
 
         return conversation
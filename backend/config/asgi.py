@@ -2,6 +2,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
 
 # 1) SET DJANGO_SETTINGS_MODULE TRƯỚC
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
@@ -18,9 +19,13 @@ from chat import routing as chat_routing
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
-        "websocket": JWTAuthMiddlewareStack(
-            URLRouter(
-                chat_routing.websocket_urlpatterns
+        # handshake xác thực được bằng cookie access_token -> chặn trang lạ mở socket thay user
+        # (cross-site WebSocket hijacking): chỉ nhận Origin thuộc ALLOWED_HOSTS
+        "websocket": AllowedHostsOriginValidator(
+            JWTAuthMiddlewareStack(
+                URLRouter(
+                    chat_routing.websocket_urlpatterns
+                )
             )
         ),
     }
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     'storages',
     'allauth',
     'allauth.account',
@@ -61,7 +62,8 @@ INSTALLED_APPS = [
     'apps.bookings',
     'apps.reviews',
     'apps.chat_messages',
-    'apps.payments'
+    'apps.payments',
+    'apps.jobs',
 ]
 STORAGES = {
     "default": {"BACKEND": "storages.backends.s3boto3.S3Boto3Storage"},
@@ -157,10 +159,31 @@ DATABASES = {
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'OPTIONS': {
+            # ngưỡng cho toán tử %> (so khớp gần đúng địa điểm / tên agency)
+            'options': f"-c pg_trgm.word_similarity_threshold={os.getenv('TRGM_WORD_SIMILARITY_THRESHOLD', '0.5')}",
+        },
     }
 }
 
+# Cache: Redis nếu có REDIS_URL, không thì local-memory (mỗi process 1 bản)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'travel-ecommerce',
+        }
+    }
+
 AUTH_USER_MODEL = 'users.User'
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -180,6 +203,9 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# user đã xác thực bằng access token được cache bao lâu (giây), apps/users/auth_cache.py
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -189,11 +215,32 @@ SIMPLE_JWT = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # user dựng từ claim của access token, chỉ query users_user khi cần field ngoài claim
+        'apps.users.authentication.ClaimsJWTAuthentication',
     ),
     'EXCEPTION_HANDLER': 'utils.custom_exception_handler.custom_exception_handler',
 }
 
+# List lớn (tour public, booking agency, conversation) đọc .values() + encode ujson
+FAST_LIST_SERIALIZERS = os.getenv('FAST_LIST_SERIALIZERS', 'True') == 'True'
+
+# last_seen / online (apps/users/presence.py): mỗi user ghi nhận tối đa 1 lần / LAST_SEEN_INTERVAL giây,
+# DB cập nhật theo lô mỗi LAST_SEEN_FLUSH_INTERVAL giây; online = hoạt động trong ONLINE_WINDOW giây
+LAST_SEEN_INTERVAL = int(os.getenv('LAST_SEEN_INTERVAL', 60))
+LAST_SEEN_FLUSH_INTERVAL = float(os.getenv('LAST_SEEN_FLUSH_INTERVAL', 10))
+LAST_SEEN_FLUSH_SIZE = int(os.getenv('LAST_SEEN_FLUSH_SIZE', 500))
+ONLINE_WINDOW = int(os.getenv('ONLINE_WINDOW', 120))
+# bộ đếm kết nối WebSocket / user trong cache, gia hạn khi client còn gửi frame
+PRESENCE_CONNECTION_TTL = int(os.getenv('PRESENCE_CONNECTION_TTL', 3600))
+
+# Job nền (apps.jobs): worker = `manage.py run_jobs`
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BACKOFF = int(os.getenv('JOB_RETRY_BACKOFF', 10))            # giây, nhân đôi sau mỗi lần lỗi
+JOB_RETRY_BACKOFF_MAX = int(os.getenv('JOB_RETRY_BACKOFF_MAX', 3600))
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', 300))              # giây, quá hạn -> job được worker khác lấy lại; @job(timeout=) đặt riêng
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))
+JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -222,6 +269,11 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# mail thông báo gửi theo lô trong job nền: số mail / job (1 kết nối SMTP) và tối đa mail / giây
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+EMAIL_RATE_LIMIT = float(os.getenv('EMAIL_RATE_LIMIT', 5))
+# giây / thao tác SMTP: không để 1 mail treo job gửi mail quá timeout của job
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
 
 # AWS
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
@@ -244,6 +296,11 @@ AWS_S3_OBJECT_PARAMETERS = {
     'ServerSideEncryption': 'AES256',   # SSE-S3
     'CacheControl': 'max-age=86400',
 }
+# số thread upload ảnh song song trong 1 request
+UPLOAD_MAX_WORKERS = int(os.getenv('UPLOAD_MAX_WORKERS', 4))
+# upload thẳng lên S3 (presigned POST): vùng tạm trước khi xác nhận, nên đặt lifecycle rule xoá sau 1 ngày
+DIRECT_UPLOAD_PREFIX = os.getenv('DIRECT_UPLOAD_PREFIX', 'uploads/pending')
+DIRECT_UPLOAD_EXPIRES = int(os.getenv('DIRECT_UPLOAD_EXPIRES', 900))   # giây
 
 MOMO_PARTNER_CODE = os.getenv("MOMO_PARTNER_CODE")
 MOMO_ACCESS_KEY = os.getenv("MOMO_ACCESS_KEY")
@@ -0,0 +1,34 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag từ các thành phần fingerprint (version, updated_at, count ...)."""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def to_timestamp(dt):
+    return int(dt.timestamp()) if dt else None
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Trả về 304 (HttpResponseNotModified) nếu If-None-Match / If-Modified-Since khớp,
+    ngược lại None. Chỉ áp dụng cho GET/HEAD.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -0,0 +1,152 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from .renderers import UJSONRenderer
+
+
+class FastRowSerializer:
+    """
+    Serializer chỉ-đọc cho danh sách lớn: đọc `.values()` thay vì dựng model instance,
+    mỗi field có sẵn accessor (cột + to_representation của field DRF tương ứng).
+
+    - serializer_class: serializer DRF gốc; dùng lại chính field của nó để format
+      => output giống hệt serializer gốc (kể cả ?fields= / ?exclude=).
+    - computed: field tính toán (SerializerMethodField ...) -> (lookups, fn(context, *values)),
+      field lồng ghi dạng "a.b", lookup tính từ model của serializer con.
+    Serializer con (FK) được làm phẳng thành lookup "a__b", FK null -> None.
+    """
+    serializer_class = None
+    computed = {}
+
+    def __init__(self, context=None):
+        serializer = self.serializer_class(context=context or {})
+        self.context = serializer.context
+        self.lookups = []
+        self.accessors = self._plan(serializer, prefix="", path="")
+
+    def _column(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return lookup
+
+    def _plan(self, serializer, prefix, path):
+        accessors = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            key = path + name
+
+            if key in self.computed:
+                lookups, fn = self.computed[key]
+                columns = [self._column(prefix + lookup) for lookup in lookups]
+                accessors.append((name, _computed(fn, columns, self.context)))
+                continue
+
+            if isinstance(field, (serializers.SerializerMethodField, serializers.ListSerializer)) or field.source == "*":
+                raise ImproperlyConfigured(f"{type(self).__name__}: field '{key}' cần khai báo trong computed.")
+
+            source = prefix + field.source.replace(".", "__")
+            if isinstance(field, serializers.BaseSerializer):
+                nested = self._plan(field, prefix=source + "__", path=key + ".")
+                accessors.append((name, _nested(self._column(source), nested)))
+            else:
+                accessors.append((name, _plain(self._column(source), _converter(field))))
+        return accessors
+
+    def values(self, queryset, *extra):
+        """queryset.values() đúng các cột cần; `extra`: cột thêm (vd: cột sắp xếp cho cursor)."""
+        columns = list(self.lookups)
+        columns += [c for c in extra if c not in columns]
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+
+    def to_representation(self, row):
+        return {name: get(row) for name, get in self.accessors}
+
+    def serialize(self, rows):
+        accessors = self.accessors
+        return [{name: get(row) for name, get in accessors} for row in rows]
+
+
+# field DRF mà to_representation = ép kiểu: giá trị đã đúng kiểu thì trả thẳng
+_PASSTHROUGH = {
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.IntegerField: int,
+}
+
+
+def _converter(field):
+    """
+    to_representation tính sẵn theo loại field: giá trị đọc từ DB đã đúng kiểu
+    thì trả thẳng, còn lại mới gọi field DRF (kết quả như nhau).
+    """
+    to_representation = field.to_representation
+
+    kind = _PASSTHROUGH.get(type(field))
+    if kind is not None:
+        return lambda value: value if type(value) is kind else to_representation(value)
+
+    if (
+        type(field) is serializers.DecimalField
+        and field.decimal_places is not None
+        and not (field.localize or field.normalize_output)
+    ):
+        exponent, max_digits = -field.decimal_places, field.max_digits
+        coerce = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+
+        def decimal_value(value):
+            # cột NUMERIC trả về Decimal đúng scale -> quantize không đổi giá trị
+            if type(value) is Decimal:
+                _, digits, exp = value.as_tuple()
+                if exp == exponent and (max_digits is None or len(digits) <= max_digits):
+                    return "{:f}".format(value) if coerce else value
+            return to_representation(value)
+        return decimal_value
+
+    return to_representation
+
+
+def _plain(column, to_representation):
+    def get(row):
+        value = row[column]
+        return None if value is None else to_representation(value)
+    return get
+
+
+def _nested(column, accessors):
+    def get(row):
+        if row[column] is None:
+            return None
+        return {name: sub(row) for name, sub in accessors}
+    return get
+
+
+def _computed(fn, columns, context):
+    def get(row):
+        return fn(context, *[row[c] for c in columns])
+    return get
+
+
+class FastListViewMixin:
+    """
+    View danh sách dùng FastRowSerializer + UJSONRenderer khi bật settings.FAST_LIST_SERIALIZERS.
+    Tắt -> chạy serializer DRF như cũ (output như nhau).
+    """
+    fast_serializer_class = None
+
+    def use_fast_path(self):
+        return self.fast_serializer_class is not None and getattr(settings, "FAST_LIST_SERIALIZERS", False)
+
+    def get_fast_serializer(self):
+        return self.fast_serializer_class(context=self.get_serializer_context())
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.use_fast_path():
+            return renderers
+        return [UJSONRenderer() if type(r) is JSONRenderer else r for r in renderers]
@@ -0,0 +1,99 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+# Sparse fieldset: ?fields=a,b (chỉ lấy a, b) / ?exclude=c,d (bỏ c, d)
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+SHAPE_PARAMS = (FIELDS_PARAM, EXCLUDE_PARAM)
+
+
+def _split(raw):
+    return [p.strip() for p in (raw or "").split(",") if p.strip()]
+
+
+def has_shape_params(request):
+    if request is None or request.method not in SAFE_METHODS:
+        return False
+    return any(request.query_params.get(p) for p in SHAPE_PARAMS)
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin cho serializer: bỏ các field không được yêu cầu qua ?fields= / ?exclude=
+    (chỉ với GET/HEAD, tên field lạ bị bỏ qua).
+
+    - sparse_required_fields: luôn giữ (vd: khoá chính)
+    - field_sources: field tính toán (SerializerMethodField ...) -> lookup model cần
+      để shape_queryset() biết phải SELECT/JOIN gì, vd {"thumbnail_url": ("thumbnail__thumbnail",)}
+    """
+    sparse_required_fields = ()
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if not has_shape_params(request):
+            return
+
+        only = set(_split(request.query_params.get(FIELDS_PARAM)))
+        exclude = set(_split(request.query_params.get(EXCLUDE_PARAM))) - set(self.sparse_required_fields)
+        for name in list(self.fields):
+            if name in self.sparse_required_fields:
+                continue
+            if (only and name not in only) or name in exclude:
+                self.fields.pop(name)
+
+    def get_field_lookups(self):
+        """Các lookup model (dạng "a__b") mà field đang giữ cần đọc."""
+        lookups = []
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in self.field_sources:
+                lookups.extend(self.field_sources[name])
+            elif field.source != "*":
+                lookups.append(field.source.replace(".", "__"))
+        return lookups
+
+
+class SparseFieldsetViewMixin:
+    """Mixin cho view: áp shape_queryset khi request có ?fields= / ?exclude=."""
+    sparse_always_fields = ()
+
+    def shape_queryset(self, queryset):
+        if not has_shape_params(self.request):
+            return queryset
+        return shape_queryset(queryset, self.get_serializer(), self.sparse_always_fields)
+
+
+def shape_queryset(queryset, serializer, always=()):
+    """
+    Thu gọn queryset theo field serializer đang giữ: .only() cột cần đọc,
+    select_related / prefetch_related đúng các quan hệ còn dùng.
+    `always`: cột luôn phải có (vd: cột sắp xếp của keyset pagination).
+    """
+    model = queryset.model
+    only, select, prefetch = [], set(), set()
+
+    for lookup in [*always, *serializer.get_field_lookups()]:
+        head, *rest = lookup.split("__")
+        try:
+            field = model._meta.get_field(head)
+        except FieldDoesNotExist:
+            continue  # property / giá trị tính, không phải cột
+
+        if field.one_to_many or field.many_to_many:
+            prefetch.add(field.name)
+            continue
+        if field.is_relation and rest:
+            select.add(field.name)
+        elif not field.concrete:
+            continue  # quan hệ ngược 1-1 không có cột bên này
+        only.append("__".join([field.name, *rest]))
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset.only(model._meta.pk.name, *only)
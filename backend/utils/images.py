@@ -0,0 +1,67 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .media import media_url
+from .uploads import delete_files
+
+# tên variant -> khung tối đa (rộng, cao), giữ tỉ lệ, ảnh nhỏ hơn không phóng to
+VARIANT_SIZES = {
+    "full": (1920, 1280),
+    "detail": (1024, 683),
+    "card": (480, 320),
+}
+WEBP_QUALITY = 80
+
+
+def variant_urls(variants):
+    """{variant: key} -> {variant: URL} cho serializer."""
+    return {name: media_url(key) for name, key in (variants or {}).items()}
+
+
+def render_variants(storage, key, sizes=VARIANT_SIZES):
+    """Đọc ảnh gốc trên storage, lưu các bản WebP thu nhỏ cạnh ảnh gốc. Trả {variant: key}."""
+    with storage.open(key, "rb") as f, Image.open(f) as src:
+        width, height = max(sizes.values())
+        src.draft("RGB", (width, height))  # JPEG: decode luôn ở độ phân giải nhỏ hơn
+        image = ImageOps.exif_transpose(src)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    base, _ = os.path.splitext(key)
+    keys = {}
+    try:
+        # từ lớn tới nhỏ, bản sau thu nhỏ từ bản trước
+        for name, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            image.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+            keys[name] = storage.save(f"{base}_{name}.webp", ContentFile(buf.getvalue()))
+    except Exception:
+        delete_files(keys.values(), storage)
+        raise
+    return keys
+
+
+def build_variants(model, pk, field, target="variants", after=None):
+    """
+    Sinh variant cho ảnh `field` của 1 dòng rồi ghi {variant: key} vào cột JSON `target`.
+    Ảnh đã bị thay trong lúc xử lý -> bỏ kết quả (xoá file vừa sinh).
+    `after(obj)`: chạy sau khi ghi (đồng bộ listing, bump cache ...).
+    """
+    obj = model.objects.filter(pk=pk).first()
+    image = getattr(obj, field, None)
+    if not image:
+        return None
+
+    keys = render_variants(image.storage, image.name)
+    updated = model.objects.filter(pk=pk, **{field: image.name}).update(**{target: keys})
+    if not updated:
+        delete_files(keys.values(), image.storage)
+        return None
+    if after is not None:
+        after(obj)
+    return keys
+
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+
+class PartialSendError(Exception):
+    """send_batch lỗi giữa chừng: `sent` mail đầu list đã gửi xong, `error` là lỗi gốc."""
+
+    def __init__(self, sent, error):
+        self.sent = sent
+        self.error = error
+        super().__init__(f"Gửi được {sent} mail rồi lỗi: {error}")
+
+
+def chunked(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def batch_timeout(size=None):
+    """Thời gian chạy lâu nhất của send_batch 1 lô: mỗi mail chờ rate limit + EMAIL_TIMEOUT (+ mở kết nối)."""
+    size = settings.EMAIL_BATCH_SIZE if size is None else size
+    rate = settings.EMAIL_RATE_LIMIT
+    return int((size + 1) * (settings.EMAIL_TIMEOUT + (1 / rate if rate else 0))) + 1
+
+
+def send_batch(messages, rate=None, connection=None):
+    """
+    Gửi list EmailMessage qua 1 kết nối SMTP (mở 1 lần, đóng khi xong).
+    rate: tối đa bao nhiêu mail / giây (mặc định EMAIL_RATE_LIMIT, 0 = không giới hạn).
+    Lỗi khi gửi mail thứ i -> raise PartialSendError(sent=i): i mail đầu đã gửi, đừng gửi lại.
+    Trả số mail đã gửi.
+    """
+    rate = settings.EMAIL_RATE_LIMIT if rate is None else rate
+    interval = 1 / rate if rate else 0
+    connection = connection or get_connection(fail_silently=False)
+
+    sent = 0
+    with connection:
+        for i, message in enumerate(messages):
+            start = time.monotonic()
+            try:
+                sent += connection.send_messages([message]) or 0
+            except Exception as exc:
+                raise PartialSendError(i, exc) from exc
+            wait = interval - (time.monotonic() - start)
+            if wait > 0:
+                time.sleep(wait)
+    return sent
@@ -0,0 +1,70 @@
+import re
+from functools import lru_cache
+
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+# key không cần normalize / quote: chỉ ký tự an toàn trong URL, không có segment "." / ".."
+_PLAIN_KEY_RE = re.compile(r"[A-Za-z0-9_~-][A-Za-z0-9_.~-]*(?:/[A-Za-z0-9_~-][A-Za-z0-9_.~-]*)*")
+
+_STORAGE_SETTINGS = {"STORAGES", "MEDIA_URL", "AWS_QUERYSTRING_AUTH", "AWS_S3_CUSTOM_DOMAIN", "AWS_LOCATION"}
+
+
+@lru_cache(maxsize=None)
+def _public_prefix():
+    """
+    Prefix URL public của default storage, đọc config 1 lần / process.
+    None nếu URL không ghép chuỗi được (querystring auth / presigned, không có custom domain, có location).
+    """
+    domain = getattr(default_storage, "custom_domain", None)
+    if not domain or getattr(default_storage, "querystring_auth", True) or getattr(default_storage, "location", ""):
+        return None
+    return f"{default_storage.url_protocol}//{domain}/"
+
+
+@receiver(setting_changed)
+def _reset_public_prefix(setting, **kwargs):
+    if setting in _STORAGE_SETTINGS:
+        _public_prefix.cache_clear()
+
+
+def public_media_url(name):
+    """
+    URL public của key bằng ghép chuỗi (giống S3Storage.url() khi AWS_QUERYSTRING_AUTH=False).
+    None nếu storage không public hoặc key cần normalize -> gọi storage.url().
+    """
+    prefix = _public_prefix()
+    if prefix is None or not name or not _PLAIN_KEY_RE.fullmatch(name):
+        return None
+    return prefix + name
+
+
+def media_url(file):
+    """
+    URL của FieldFile (hoặc key) trên default storage, rỗng -> None.
+    Storage public: ghép chuỗi, không đi qua storage; còn lại (presigned ...) dùng storage.url().
+    """
+    name = getattr(file, "name", file)
+    if not name:
+        return None
+    storage = getattr(file, "storage", default_storage)
+    if storage is default_storage:
+        url = public_media_url(name)
+        if url is not None:
+            return url
+    return storage.url(name)
+
+
+class MediaURLField(serializers.ImageField):
+    """ImageField trả URL qua public_media_url(), output như ImageField của DRF."""
+
+    def to_representation(self, value):
+        use_url = getattr(self, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+        url = public_media_url(getattr(value, "name", None)) if value and use_url else None
+        if url is None or getattr(value, "storage", default_storage) is not default_storage:
+            return super().to_representation(value)
+        # URL tuyệt đối, ASCII an toàn -> build_absolute_uri() không đổi gì
+        return url
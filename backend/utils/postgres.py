@@ -0,0 +1,36 @@
+from django.db.models import Func, Lookup
+
+
+class Unaccent(Func):
+    """unaccent() của Postgres: "Đà Nẵng" -> "Da Nang"."""
+    function = "unaccent"
+
+
+class ImmutableUnaccent(Func):
+    """
+    Wrapper IMMUTABLE của unaccent() (tạo ở migration tours 0010).
+    unaccent() gốc là STABLE nên không dùng được trong expression index;
+    index trigram và câu query phải dùng cùng hàm này thì mới khớp index.
+    """
+    function = "immutable_unaccent"
+
+
+class ArrayAppend(Func):
+    """array_append(array, phần tử) – thêm phần tử vào cột ArrayField ngay trong UPDATE."""
+    function = "array_append"
+
+
+class ILike(Lookup):
+    """`lhs ILIKE rhs` – dùng trực tiếp trong .filter(), gin_trgm_ops phục vụ được."""
+    lookup_name = "ilike"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def like_contains_pattern(value):
+    """Escape ký tự đặc biệt của LIKE rồi bọc %...%."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
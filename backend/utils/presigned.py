@@ -0,0 +1,268 @@
+import mimetypes
+import os
+import re
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from rest_framework import permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .uploads import delete_files
+
+# số byte đầu file đọc để kiểm tra magic bytes
+HEAD_BYTES = 16
+
+_SIGNATURES = {
+    ".jpg": lambda head: head.startswith(b"\xff\xd8\xff"),
+    ".jpeg": lambda head: head.startswith(b"\xff\xd8\xff"),
+    ".png": lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"),
+    ".webp": lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP",
+    ".pdf": lambda head: head.startswith(b"%PDF-"),
+}
+
+# AWS_S3_OBJECT_PARAMETERS -> field của presigned POST
+_POST_OBJECT_FIELDS = {
+    "ServerSideEncryption": "x-amz-server-side-encryption",
+    "CacheControl": "Cache-Control",
+}
+
+
+class DirectUploadUnavailable(Exception):
+    """Storage hiện tại không phải S3 -> không tạo được presigned POST."""
+
+
+class UploadSpec:
+    """
+    Giới hạn cho 1 loại file upload thẳng lên S3: dung lượng, đuôi file và validator
+    của model field (validate_avatar ...), dùng cả lúc cấp presigned POST lẫn lúc xác nhận.
+    """
+
+    def __init__(self, name, max_size, extensions, validators=()):
+        self.name = name
+        self.max_size = max_size
+        self.extensions = tuple(extensions)
+        self.validators = tuple(validators)
+
+    def validate(self, file):
+        """file: object có .name, .size. Raise django ValidationError như validator của model."""
+        for validator in self.validators:
+            validator(file)
+        if file.size > self.max_size:
+            raise DjangoValidationError(f"File tối đa {self.max_size // (1024 * 1024)}MB.")
+        if os.path.splitext(file.name)[1].lower() not in self.extensions:
+            raise DjangoValidationError(f"Chỉ nhận file {', '.join(e.lstrip('.') for e in self.extensions)}.")
+
+
+class StagedUpload:
+    """Object client đã upload vào vùng tạm (DIRECT_UPLOAD_PREFIX), đã kiểm tra xong."""
+
+    def __init__(self, key, size):
+        self.key = key
+        self.name = key
+        self.size = size
+
+    @property
+    def filename(self):
+        # tên đưa cho upload_to (upload_to tự thêm uuid), ngắn cho vừa max_length của FileField
+        return f"upload{os.path.splitext(self.key)[1]}"
+
+
+def staging_prefix(user, spec):
+    # mỗi user 1 prefix riêng -> không xác nhận được key của người khác
+    return f"{settings.DIRECT_UPLOAD_PREFIX}/{user.pk}/{spec.name}/"
+
+
+def _s3_key(storage, key):
+    return storage._normalize_name(key)
+
+
+def presign_upload(user, spec, name, size, storage=None):
+    """
+    Presigned POST cho 1 file: key mới trong vùng tạm của user, policy giới hạn đúng key,
+    Content-Type và dung lượng (1..max_size). Client POST thẳng lên bucket bằng url + fields.
+    """
+    storage = storage or default_storage
+    bucket = getattr(storage, "bucket", None)
+    if bucket is None:
+        raise DirectUploadUnavailable()
+
+    ext = os.path.splitext(name)[1].lower()
+    spec.validate(StagedUpload(name, size))
+
+    key = f"{staging_prefix(user, spec)}{uuid.uuid4().hex}{ext}"
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    fields = {"Content-Type": content_type}
+    object_parameters = getattr(storage, "object_parameters", {})
+    for param, field in _POST_OBJECT_FIELDS.items():
+        if param in object_parameters:
+            fields[field] = object_parameters[param]
+    conditions = [{k: v} for k, v in fields.items()]
+    conditions.append(["content-length-range", 1, spec.max_size])
+
+    post = bucket.meta.client.generate_presigned_post(
+        Bucket=bucket.name,
+        Key=_s3_key(storage, key),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=settings.DIRECT_UPLOAD_EXPIRES,
+    )
+    return {"field": spec.name, "key": key, "url": post["url"], "fields": post["fields"], "max_size": spec.max_size}
+
+
+def _stat(storage, key):
+    """(dung lượng, HEAD_BYTES byte đầu) của object, None nếu chưa có. S3: 1 GET có Range."""
+    bucket = getattr(storage, "bucket", None)
+    if bucket is None:
+        if not storage.exists(key):
+            return None
+        with storage.open(key, "rb") as f:
+            return storage.size(key), f.read(HEAD_BYTES)
+
+    try:
+        resp = bucket.Object(_s3_key(storage, key)).get(Range=f"bytes=0-{HEAD_BYTES - 1}")
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            return None
+        if code == "InvalidRange":   # object rỗng
+            return 0, b""
+        raise
+    return int(resp["ContentRange"].rsplit("/", 1)[1]), resp["Body"].read()
+
+
+def resolve_upload(user, spec, key, storage=None):
+    """
+    Kiểm tra key client gửi lên sau khi upload xong: đúng vùng tạm của user, object tồn tại,
+    dung lượng / đuôi file theo spec và magic bytes khớp đuôi file. Trả StagedUpload.
+    """
+    storage = storage or default_storage
+    prefix = staging_prefix(user, spec)
+    if not isinstance(key, str) or not re.fullmatch(re.escape(prefix) + r"[0-9a-f]{32}\.[a-z0-9]+", key):
+        raise DjangoValidationError("Key upload không hợp lệ.")
+
+    stat = _stat(storage, key)
+    if stat is None:
+        raise DjangoValidationError("File chưa được upload lên storage.")
+
+    upload = StagedUpload(key, stat[0])
+    spec.validate(upload)
+    ext = os.path.splitext(key)[1]
+    check = _SIGNATURES.get(ext)
+    if check is not None and not check(stat[1]):
+        raise DjangoValidationError(f"Nội dung file không đúng định dạng {ext.lstrip('.')}.")
+    return upload
+
+
+def promote_upload(upload, dst, storage=None):
+    """Chuyển object từ vùng tạm sang key chính thức `dst`. S3: copy phía server, không tải file về."""
+    storage = storage or default_storage
+    bucket = getattr(storage, "bucket", None)
+    if bucket is None:
+        with storage.open(upload.key, "rb") as f:
+            return storage.save(dst, f)
+
+    bucket.Object(_s3_key(storage, dst)).copy_from(
+        CopySource={"Bucket": bucket.name, "Key": _s3_key(storage, upload.key)},
+        MetadataDirective="COPY",
+    )
+    return dst
+
+
+def promote_uploads(jobs, storage=None):
+    """[(StagedUpload, key đích)] -> list key đích. Lỗi giữa chừng -> xoá các bản đã copy."""
+    storage = storage or default_storage
+    keys = []
+    try:
+        for upload, dst in jobs:
+            keys.append(promote_upload(upload, dst, storage))
+    except BaseException:
+        delete_files(keys, storage)
+        raise
+    return keys
+
+
+def attach_upload(fieldfile, upload):
+    """Gán file đã upload thẳng cho FileField (chưa save model), key theo upload_to của field."""
+    dst = fieldfile.field.generate_filename(fieldfile.instance, upload.filename)
+    fieldfile.name = promote_upload(upload, dst, fieldfile.storage)
+    return fieldfile.name
+
+
+class StagedUploadField(serializers.CharField):
+    """Key của file đã upload thẳng lên S3 -> StagedUpload (đã kiểm tra dung lượng, định dạng)."""
+
+    def __init__(self, spec, **kwargs):
+        self.spec = spec
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        key = super().to_internal_value(data)
+        try:
+            return resolve_upload(self.context["request"].user, self.spec, key)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+
+
+class PresignFileSerializer(serializers.Serializer):
+    field = serializers.CharField()
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+
+
+class PresignUploadView(APIView):
+    """
+    POST {"files": [{"field", "name", "size"}]} -> presigned POST cho từng file.
+    Sau khi upload xong, client gửi `key` vào API tạo / sửa tương ứng (<field>_key).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    upload_specs = {}
+    max_files = 20
+
+    def post(self, request, *args, **kwargs):
+        files = request.data.get("files")
+        if not isinstance(files, list) or not files or len(files) > self.max_files:
+            return Response(
+                {"message": f"files phải là danh sách 1..{self.max_files} file."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = PresignFileSerializer(data=files, many=True)
+        if not serializer.is_valid():
+            return Response(
+                {"message": "Dữ liệu không hợp lệ.", "errors": {"files": serializer.errors}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        uploads, errors = [], [{} for _ in files]
+        try:
+            for i, item in enumerate(serializer.validated_data):
+                spec = self.upload_specs.get(item["field"])
+                if spec is None:
+                    errors[i]["field"] = [f"Chỉ nhận: {', '.join(self.upload_specs)}."]
+                    continue
+                try:
+                    uploads.append(presign_upload(request.user, spec, item["name"], item["size"]))
+                except DjangoValidationError as e:
+                    errors[i]["file"] = e.messages
+        except DirectUploadUnavailable:
+            return Response(
+                {"message": "Storage hiện tại không hỗ trợ upload trực tiếp."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        if any(errors):
+            return Response(
+                {"message": "Dữ liệu không hợp lệ.", "errors": {"files": errors}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {
+                "data": {"uploads": uploads, "expires_in": settings.DIRECT_UPLOAD_EXPIRES},
+                "message": "Tạo link upload thành công.",
+            },
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,42 @@
+import re
+
+import ujson
+from rest_framework.renderers import JSONRenderer
+
+# ujson và json khác nhau chỉ ở float dạng mũ (1e-7 / 1e-07, 1e16 / 1e+16)
+_EXPONENT = re.compile(r"\de[-+]?\d")
+
+
+class UJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encode bằng ujson, output giống hệt JSONRenderer mặc định
+    (UNICODE_JSON, COMPACT_JSON, STRICT_JSON của DRF).
+
+    - Kiểu ujson không hiểu (Decimal, UUID, datetime, lazy str ...) đi qua encoder của DRF.
+    - Client xin indent (Accept: application/json; indent=4) hoặc tắt COMPACT_JSON
+      -> dùng JSONRenderer gốc.
+    - Float ghi dạng mũ (|x| < 1e-4 hoặc >= 1e16) ujson viết khác json (1e-7 / 1e-07)
+      -> output có dạng mũ thì render lại bằng JSONRenderer gốc. Chuỗi tình cờ khớp (vd "2e5")
+      chỉ làm chậm, không sai.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if not self.compact or self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = ujson.dumps(
+            data,
+            ensure_ascii=self.ensure_ascii,
+            escape_forward_slashes=False,
+            allow_nan=not self.strict,
+            default=self.encoder_class().default,
+        )
+        if _EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # giống DRF: escape U+2028/U+2029 để chèn được vào <script>
+        ret = ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+        return ret.encode()
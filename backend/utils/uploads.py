@@ -0,0 +1,76 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    """
+    Upload thất bại (một phần). Các file đã lên storage trong cùng lượt đã bị xoá.
+    failed: [(tên file gốc, exception)]
+    """
+
+    def __init__(self, failed):
+        self.failed = failed
+        super().__init__("; ".join(f"{name}: {exc}" for name, exc in failed))
+
+
+def upload_files(jobs, storage=None, max_workers=None):
+    """
+    Upload song song [(key, file)] bằng thread pool giới hạn (UPLOAD_MAX_WORKERS).
+    File object (UploadedFile ...) được stream thẳng qua storage.save(), không đọc vào RAM.
+    Trả list key đã lưu theo đúng thứ tự jobs. Có file lỗi -> xoá các file đã lên rồi raise UploadError.
+    """
+    storage = storage or default_storage
+    if not jobs:
+        return []
+
+    def upload(job):
+        key, f = job
+        try:
+            f.seek(0)
+        except Exception:
+            pass
+        return storage.save(key, f)
+
+    workers = max(1, min(len(jobs), max_workers or settings.UPLOAD_MAX_WORKERS))
+    keys, failed = [None] * len(jobs), []
+    if workers == 1:
+        outcomes = [_call(upload, job) for job in jobs]
+    else:
+        # S3Storage giữ connection theo thread nên dùng chung storage được
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+            outcomes = list(pool.map(lambda job: _call(upload, job), jobs))
+
+    for i, ((key, f), (saved, exc)) in enumerate(zip(jobs, outcomes)):
+        if exc is None:
+            keys[i] = saved
+        else:
+            failed.append((getattr(f, "name", None) or key, exc))
+
+    if failed:
+        for name, exc in failed:
+            logger.warning("Upload %s thất bại: %s", name, exc)
+        delete_files([k for k in keys if k], storage)
+        raise UploadError(failed)
+    return keys
+
+
+def _call(fn, arg):
+    try:
+        return fn(arg), None
+    except Exception as exc:
+        return None, exc
+
+
+def delete_files(keys, storage=None):
+    """Xoá các object mồ côi (đã upload nhưng không có dòng DB), lỗi chỉ log."""
+    storage = storage or default_storage
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception:
+            logger.exception("Không xoá được file %s", key)